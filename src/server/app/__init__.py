@@ -1,5 +1,8 @@
 from flask import Flask
 from flask_cors import CORS
+from app.compression import init_compression
+from app.metrics import init_metrics
+from app.serialisation import init_json_provider
 
 
 def create_app(config):
@@ -24,6 +27,15 @@ def create_app(config):
     # Enable CORS
     CORS(flaskApp)
 
+    # Serialise the responses with the configured JSON provider
+    init_json_provider(flaskApp)
+
+    # Record the latency and size of the responses (after the other hooks, which run in reverse order)
+    init_metrics(flaskApp)
+
+    # Compress large JSON responses
+    init_compression(flaskApp)
+
     from app.blueprints import main, ctrl
 
     # Register main blueprint
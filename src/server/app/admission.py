@@ -0,0 +1,107 @@
+import threading
+from functools import wraps
+from flask import current_app, jsonify
+
+
+class AdmissionLimiter:
+    """
+    Limits the number of concurrent requests of an expensive kind, so that a burst of them cannot
+    starve the cheap requests served by the same worker.
+
+    Up to `<PREFIX>_MAX_CONCURRENT` requests run at once. Up to `<PREFIX>_MAX_QUEUE` more wait for
+    a slot, for at most `<PREFIX>_QUEUE_TIMEOUT` seconds. Any other request is rejected at once.
+    The limits are read from the configuration of the app for every request.
+
+    Args:
+        prefix (str): Prefix of the configuration of the limits (e.g. 'SEARCH').
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, max_concurrent: int, max_queue: int, timeout: float) -> bool:
+        """
+        Waits for a slot to run a request.
+
+        Args:
+            max_concurrent (int): Maximum number of requests running at once.
+            max_queue (int): Maximum number of requests waiting for a slot.
+            timeout (float): Maximum number of seconds to wait for a slot.
+
+        Returns:
+            bool: True if the request can run (`release` must then be called), False if it is rejected.
+        """
+        with self._condition:
+            if self.running >= max_concurrent:
+                if self.queued >= max_queue:
+                    self.rejected += 1
+                    return False
+
+                self.queued += 1
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: self.running < max_concurrent, timeout
+                    )
+                finally:
+                    self.queued -= 1
+
+                if not admitted:
+                    self.rejected += 1
+                    return False
+
+            self.running += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.running -= 1
+            self._condition.notify()
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "running": self.running,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+search_limiter = AdmissionLimiter("SEARCH")
+
+
+def admission_controlled(limiter: AdmissionLimiter):
+    """
+    Decorator for expensive routes, running them under the limits of the limiter.
+    Rejected requests get `429 Too Many Requests`, with a `Retry-After` header.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            admitted = limiter.acquire(
+                max_concurrent=config[f"{limiter.prefix}_MAX_CONCURRENT"],
+                max_queue=config[f"{limiter.prefix}_MAX_QUEUE"],
+                timeout=config[f"{limiter.prefix}_QUEUE_TIMEOUT"],
+            )
+            if not admitted:
+                response = jsonify({"error": "Too many requests, retry later"})
+                response.status_code = 429
+                response.headers["Retry-After"] = "1"
+                return response
+
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+
+        return wrapper
+
+    return decorator
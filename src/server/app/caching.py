@@ -0,0 +1,369 @@
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, g, request
+from app.compression import (
+    compress,
+    negotiate_encoding,
+    representation_etags,
+)
+from app.config import Config
+from app.index import get_graph_index
+
+# Names of the views whose responses are kept in the response cache (see `cached`)
+_cached_views = set()
+
+
+class ResponseCache:
+    """
+    Size-bounded cache of the serialised JSON responses of hot read requests.
+
+    Entries are evicted least recently used first once their total size exceeds the limit. The
+    cache belongs to one generation of the graph, and is emptied as soon as another one is used.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self.size = 0  # Total bytes of the cached bodies
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> body (bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self, generation=None):
+        with self._lock:
+            self._clear(generation)
+
+    def _clear(self, generation):
+        self.generation = generation
+        self.size = 0
+        self._entries.clear()
+
+    def get(self, generation, key):
+        with self._lock:
+            body = self._entries.get(key) if generation == self.generation else None
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, generation, key, body, max_bytes):
+        if len(body) > max_bytes:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                self._clear(generation)
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class AccessStats:
+    """
+    Number of requests per (endpoint, path, query) served by the read routes, used to choose the
+    responses to warm the cache with. Only the most requested keys are kept once there are too many.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, key, max_keys):
+        with self._lock:
+            self._counts[key] += 1
+            if len(self._counts) > 2 * max_keys:
+                self._counts = Counter(dict(self._counts.most_common(max_keys)))
+
+    def most_common(self, n=None):
+        with self._lock:
+            return self._counts.most_common(n)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations: the first caller of a key (the leader) runs the
+    computation, and the callers arriving while it is in flight wait for it and share its result
+    (or its exception) instead of computing it again.
+
+    Counts the computations run by leaders and the calls coalesced into them.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.computations = 0
+        self.coalesced = 0
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        """
+        Runs `compute()`, or waits for the identical computation in flight.
+
+        Args:
+            key (hashable): Identifies identical computations.
+            compute (callable): The computation, without arguments.
+
+        Returns:
+            any: The result of the computation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.computations += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            # Also recorded when the leader is interrupted, so the callers waiting for it
+            # do not take the missing result for a successful one
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "computations": self.computations,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+response_cache = ResponseCache()
+access_stats = AccessStats()
+single_flight = SingleFlight()
+
+
+def request_key() -> tuple:
+    """
+    Normalised key of the current request: its path and its query parameters, sorted so that
+    their order in the URL does not matter.
+    """
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def compute_etag(generation: str) -> str:
+    """
+    Computes the strong ETag of a read request: a hash of the generation of the loaded graph,
+    the path and the query parameters.
+
+    Args:
+        generation (str): Identifier of the content of the loaded graph.
+
+    Returns:
+        str: The ETag (unquoted).
+    """
+    path, query = request_key()
+    key = "\n".join([generation, path] + [f"{k}={v}" for k, v in query])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def conditional(view):
+    """
+    Decorator for read routes, whose responses only depend on the URL and the loaded database.
+
+    Successful responses are sent with an ETag and a `Cache-Control` header. A request whose
+    `If-None-Match` matches the ETag gets `304 Not Modified` without running the route, so the
+    response is neither recomputed nor sent again until another database is loaded.
+    Every request is also counted in the access statistics.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Without a graph, the route reports the error itself
+        if not hasattr(current_app, "graph"):
+            return view(*args, **kwargs)
+
+        if not g.get("cache_warming"):
+            access_stats.record(
+                (request.endpoint, *request_key()),
+                current_app.config["ACCESS_STATS_MAX_KEYS"],
+            )
+
+        etag = compute_etag(get_graph_index(current_app.graph).generation)
+
+        # The client may hold any representation (identity or compressed) of the response
+        cached_etag = next(
+            (tag for tag in representation_etags(etag) if tag in request.if_none_match),
+            None,
+        )
+        if cached_etag:
+            response = current_app.response_class(
+                status=304, mimetype="application/json"
+            )
+            etag = cached_etag
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.cache_control.no_store:
+                return response
+
+        response.set_etag(etag)
+        response.cache_control.public = True
+        max_age = int(current_app.config.get("CACHE_MAX_AGE", 0))
+        if max_age > 0:
+            response.cache_control.max_age = max_age
+        else:
+            response.cache_control.no_cache = True
+
+        return response
+
+    return wrapper
+
+
+def cached(view):
+    """
+    Decorator for hot read routes, keeping their successful JSON responses (as serialised bytes)
+    in the response cache, for the generation of the graph they were computed from.
+    """
+    _cached_views.add(view.__name__)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not hasattr(current_app, "graph"):
+            return view(*args, **kwargs)
+
+        generation = get_graph_index(current_app.graph).generation
+        key = request_key()
+
+        body = response_cache.get(generation, key)
+        if body is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+
+            body = response.get_data()
+            response_cache.put(
+                generation, key, body, current_app.config["RESPONSE_CACHE_MAX_BYTES"]
+            )
+            if not current_app.config["RESPONSE_CACHE_PRECOMPRESS"]:
+                return response
+
+        # Keep the compressed body too, so it is not compressed again for every client
+        encoding = negotiate_encoding(request.accept_encodings)
+        if (
+            current_app.config["RESPONSE_CACHE_PRECOMPRESS"]
+            and encoding is not None
+            and len(body) >= current_app.config["COMPRESS_MIN_SIZE"]
+        ):
+            encoded_key = key + (encoding,)
+            encoded_body = response_cache.get(generation, encoded_key)
+            if encoded_body is None:
+                encoded_body = compress(
+                    body, encoding, current_app.config["COMPRESS_LEVEL"]
+                )
+                response_cache.put(
+                    generation,
+                    encoded_key,
+                    encoded_body,
+                    current_app.config["RESPONSE_CACHE_MAX_BYTES"],
+                )
+
+            response = current_app.response_class(
+                encoded_body, mimetype="application/json"
+            )
+            response.content_encoding = encoding
+            return response
+
+        return current_app.response_class(body, mimetype="application/json")
+
+    return wrapper
+
+
+def coalesced(view):
+    """
+    Decorator for expensive read routes: identical requests arriving while one is being computed
+    (for the same generation of the graph) wait for it and share its response body, instead of
+    running the controllers again on another thread.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not hasattr(current_app, "graph"):
+            return view(*args, **kwargs)
+
+        generation = get_graph_index(current_app.graph).generation
+        key = (request.endpoint, generation, *request_key())
+
+        def compute():
+            response = current_app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers)
+
+        # Every request gets its own response object, as later hooks modify it
+        body, status, headers = single_flight.do(key, compute)
+        return current_app.response_class(body, status=status, headers=headers)
+
+    return wrapper
+
+
+def warm_response_cache(app) -> int:
+    """
+    Empties the response cache and fills it with the responses of the root node, the children of
+    the root node and the most requested cached routes, for the graph currently loaded in the app.
+    Called after a database is loaded, so the first clients do not pay for computing them.
+
+    Args:
+        app (flask.Flask): The application, with the loaded graph.
+
+    Returns:
+        int: The number of responses in the cache.
+    """
+    if not hasattr(app, "graph"):
+        return 0
+
+    response_cache.clear(get_graph_index(app.graph).generation)
+
+    # The root node and its children are requested by every client session
+    targets = {
+        ("/node/root", ()): None,
+        (f"/node/children/{Config.ROOT_NODE_URI}", ()): None,
+    }
+    for (endpoint, path, query), _ in access_stats.most_common():
+        if len(targets) >= app.config["RESPONSE_CACHE_WARM_SIZE"]:
+            break
+        if endpoint and endpoint.rsplit(".", 1)[-1] in _cached_views:
+            targets[(path, query)] = None
+
+    for path, query in targets:
+        try:
+            with app.test_request_context(path, query_string=list(query)):
+                g.cache_warming = True  # Not counted as an access
+                app.full_dispatch_request()
+        except Exception as e:
+            print(f"Warning: Could not warm the response cache for '{path}': {e}")
+
+    return len(response_cache)
@@ -0,0 +1,106 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Supported content codings, in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encodings) -> str | None:
+    """
+    Chooses the content coding of a response from the `Accept-Encoding` header of the request.
+
+    Args:
+        accept_encodings (werkzeug.datastructures.MIMEAccept): The parsed `Accept-Encoding` header.
+
+    Returns:
+        str | None: The preferred supported coding accepted by the client, or None for identity.
+    """
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compresses a response body.
+
+    Args:
+        body (bytes): The body to compress.
+        encoding (str): The content coding ('br' or 'gzip').
+        level (int): The gzip compression level (1-9), scaled to the brotli quality (0-11).
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=round(level * 11 / 9))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def representation_etag(etag: str, encoding: str | None) -> str:
+    """
+    ETag of a representation of a response: each content coding gets its own strong ETag,
+    as the bytes sent differ.
+    """
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def representation_etags(etag: str) -> list:
+    """
+    ETags of all the representations (identity and every supported coding) of a response.
+    """
+    return [etag] + [representation_etag(etag, encoding) for encoding in ENCODINGS]
+
+
+def compress_response(response):
+    """
+    `after_request` hook compressing the JSON responses at least `COMPRESS_MIN_SIZE` bytes long,
+    with the coding negotiated from the `Accept-Encoding` header of the request.
+
+    Responses which are already encoded (precompressed by the response cache) only get their
+    ETag made specific to their coding.
+    """
+    if response.mimetype != "application/json":
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    if response.status_code != 200 or response.direct_passthrough:
+        return response
+
+    if response.content_encoding is None:
+        encoding = negotiate_encoding(request.accept_encodings)
+        if (
+            encoding is None
+            or response.content_length is None
+            or response.content_length < current_app.config["COMPRESS_MIN_SIZE"]
+        ):
+            return response
+
+        response.set_data(
+            compress(
+                response.get_data(), encoding, current_app.config["COMPRESS_LEVEL"]
+            )
+        )
+        response.content_encoding = encoding
+
+    etag, weak = response.get_etag()
+    if etag and response.content_encoding in ENCODINGS:
+        response.set_etag(
+            representation_etag(etag, response.content_encoding), weak=weak
+        )
+
+    return response
+
+
+def init_compression(app):
+    """
+    Enables the compression of the JSON responses of the app (see `compress_response`).
+    """
+    app.after_request(compress_response)
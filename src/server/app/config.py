@@ -16,9 +16,65 @@ class Config:
     # Storage location of the database files (SHOULD BE RELATIVE)
     DB_STORAGE_DIR = os.path.join(basedir, "../db/storage")
 
+    # Number of seconds the read api end points can be cached without revalidation
+    # (0: caches must revalidate with the ETag, as the database can be reloaded at any time)
+    CACHE_MAX_AGE = 0
+
+    # JSON provider serialising the responses ('orjson', falling back to 'default' if orjson is missing)
+    JSON_PROVIDER = "orjson"
+
+    # Whether the children, parents and search responses are written from pre-encoded node fragments
+    # (only used for compact responses, i.e. not in debug mode)
+    JSON_FRAGMENTS = True
+
+    # Minimum size (in bytes) of the JSON responses compressed with gzip or brotli
+    COMPRESS_MIN_SIZE = 1024
+
+    # Compression level of the responses (1: fastest - 9: smallest)
+    COMPRESS_LEVEL = 6
+
+    # Whether the response cache also keeps the compressed bodies of its responses
+    RESPONSE_CACHE_PRECOMPRESS = True
+
+    # Maximum total size (in bytes) of the responses kept in the response cache
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+    # Number of responses (of the most requested hot routes) computed when a database is loaded
+    RESPONSE_CACHE_WARM_SIZE = 200
+
+    # Maximum number of distinct requests counted in the access statistics
+    ACCESS_STATS_MAX_KEYS = 10000
+
     # Maximum possible number of items returned by the search api end points
     MAX_SEARCH_LIMIT = 50
 
+    # Maximum number of searches running at once (per worker process)
+    SEARCH_MAX_CONCURRENT = 2
+
+    # Maximum number of searches waiting for a running one to finish (others are rejected with 429)
+    SEARCH_MAX_QUEUE = 8
+
+    # Maximum number of seconds a search waits in the queue before being rejected with 429
+    SEARCH_QUEUE_TIMEOUT = 2.0
+
+    # Number of seconds after which a search returns the best results found so far (0: no limit)
+    SEARCH_TIME_BUDGET = 1.0
+
+    # Number of candidates scored by a search between checks of its time budget
+    SEARCH_CHUNK_SIZE = 5000
+
+    # Maximum possible number of children returned by a page of the children api end point
+    MAX_CHILDREN_PAGE = 1000
+
+    # Maximum possible number of nodes returned by the subtree api end point
+    MAX_SUBTREE_NODES = 5000
+
+    # Maximum possible number of root paths returned by the ancestors api end point
+    MAX_ROOT_PATHS = 1000
+
+    # Maximum possible number of URIs (or pairs of URIs) requested at once by the batch api end points
+    MAX_BATCH_URIS = 1000
+
 
 class DeploymentConfig(Config):
     DEBUG = False
@@ -1,4 +1,9 @@
+import re
+import time
+from collections import deque
 from app.config import Config
+from app.fragments import encode, get_node_fragments
+from app.index import get_graph_index
 from rdflib import URIRef, Literal, RDF, RDFS, Namespace
 from rapidfuzz import process, fuzz
 
@@ -35,7 +40,9 @@ def check_uri_exists(uri: str, graph) -> bool:
 
 
 # Get only the node's LABEL and DEPRECATION DATE
-def get_basic_node_info(uri: str, graph, default_dep: bool = False) -> dict[str, any]:
+def get_basic_node_info(
+    uri: str, graph, default_dep: bool = False, fields: set = None
+) -> dict[str, any]:
     """
     Retrieves basic information about a node, including its label and deprecation date.
 
@@ -43,6 +50,7 @@ def get_basic_node_info(uri: str, graph, default_dep: bool = False) -> dict[str,
         uri (str): The URI of the node to fetch information for.
         graph (rdflib.Graph): The RDFLib graph to query.
         default_dep (bool, optional): Whether to include 'dep' in the dictionary by default. (Default is False).
+        fields (set, optional): The fields to include (see `parse_fields`), None for all fields (default: None).
 
     Returns:
         dict: A dictionary containing the node's 'id', 'label', and 'dep' (deprecation date, if any).
@@ -56,21 +64,29 @@ def get_basic_node_info(uri: str, graph, default_dep: bool = False) -> dict[str,
     uri_ref = URIRef(uri)  # Ensure uri is a ref before querying
 
     # Query for the label of the node
-    for _, _, label in graph.triples((uri_ref, RDFS.label, None)):
-        if isinstance(label, Literal):
-            node_info["label"] = str(label)
+    if wants(fields, "label"):
+        for _, _, label in graph.triples((uri_ref, RDFS.label, None)):
+            if isinstance(label, Literal):
+                node_info["label"] = str(label)
+    else:
+        del node_info["label"]
 
     # Query for the deprecation date
-    for _, _, deprecation_date in graph.triples(
-        (uri_ref, META.valDeprecationDate, None)
-    ):
-        if isinstance(deprecation_date, Literal):
-            node_info["dep"] = str(deprecation_date)
+    if wants(fields, "dep"):
+        for _, _, deprecation_date in graph.triples(
+            (uri_ref, META.valDeprecationDate, None)
+        ):
+            if isinstance(deprecation_date, Literal):
+                node_info["dep"] = str(deprecation_date)
+    else:
+        node_info.pop("dep", None)
 
     return node_info
 
 
-def get_node_info_with_relations(uri: str, graph, dep: bool = False) -> dict[str, any]:
+def get_node_info_with_relations(
+    uri: str, graph, dep: bool = False, stats: bool = False, fields: set = None
+) -> dict[str, any]:
     """
     Retrieves information about a node, including its label, deprecation date, and whether it has children or parents.
 
@@ -78,9 +94,12 @@ def get_node_info_with_relations(uri: str, graph, dep: bool = False) -> dict[str
         uri (str): The URI of the node to fetch information for.
         graph (rdflib.Graph): The RDFLib graph to query.
         dep (bool, optional): Whether to include deprecated nodes in the checks for has_children and has_parent. (default: False).
+        stats (bool, optional): Whether to include the node's 'depth', 'child_count' and 'descendant_count' (default: False).
+        fields (set, optional): The fields to include (see `parse_fields`), None for all fields (default: None).
 
     Returns:
-        dict: A dictionary containing the node's 'id', 'label', 'dep', 'has_children', and 'has_parents'.
+        dict: A dictionary containing the node's 'id', 'label', 'dep', 'has_children', and 'has_parents'
+              (and the subtree stats if requested), restricted to the requested fields.
 
     Raises:
         ValueError: If the provided URI does not exist within the RDFLib graph.
@@ -91,38 +110,49 @@ def get_node_info_with_relations(uri: str, graph, dep: bool = False) -> dict[str
     if not check_uri_exists(uri, graph):
         raise ValueError(f"URI '{uri}' does not exist within the database")
 
-    node_info = {
-        "id": str(uri),
-        "label": None,
-        "dep": None,
-        "has_children": False,
-        "has_parents": False,
-    }
+    node_info = {"id": str(uri)}
 
     # Query for the label of the node
-    for _, _, label in graph.triples((uri_ref, RDFS.label, None)):
-        if isinstance(label, Literal):
-            node_info["label"] = str(label)
+    if wants(fields, "label"):
+        node_info["label"] = None
+        for _, _, label in graph.triples((uri_ref, RDFS.label, None)):
+            if isinstance(label, Literal):
+                node_info["label"] = str(label)
 
     # Query for the deprecation date
-    for _, _, deprecation_date in graph.triples(
-        (uri_ref, META.valDeprecationDate, None)
-    ):
-        if isinstance(deprecation_date, Literal):
-            node_info["dep"] = str(deprecation_date)
+    if wants(fields, "dep"):
+        node_info["dep"] = None
+        for _, _, deprecation_date in graph.triples(
+            (uri_ref, META.valDeprecationDate, None)
+        ):
+            if isinstance(deprecation_date, Literal):
+                node_info["dep"] = str(deprecation_date)
 
     # Check if the node has children
-    node_info["has_children"] = has_children(uri, graph, dep=dep)
+    if wants(fields, "has_children"):
+        node_info["has_children"] = has_children(uri, graph, dep=dep)
 
     # Check if the node has parents
-    node_info["has_parents"] = has_parents(uri, graph, dep=dep)
+    if wants(fields, "has_parents"):
+        node_info["has_parents"] = has_parents(uri, graph, dep=dep)
+
+    # Add the precomputed subtree stats (if requested)
+    if stats:
+        node_info.update(
+            get_subtree_stats(get_graph_index(graph), str(uri), dep, fields)
+        )
 
     return node_info
 
 
 # Get all information (predicates and objects) for a given node in the RDFLib graph.
 def get_all_node_info(
-    uri: str, graph, all_info: bool = True, default_dep: bool = True
+    uri: str,
+    graph,
+    all_info: bool = True,
+    default_dep: bool = True,
+    referenced: set = None,
+    fields: set = None,
 ) -> dict[str, any]:
     """
     Retrieves all available information about a given node in the RDFLib graph. This includes
@@ -134,6 +164,9 @@ def get_all_node_info(
         graph (rdflib.Graph): The RDFLib graph to query the node's information from.
         all_info (bool, optional): A flag indicating whether to retrieve additional properties (default: True).
         default_dep (bool, optional): Whether to include 'dep' in the dictionary by default. (Default is True).
+        referenced (set, optional): A set to collect the URIs referenced by the returned information (types, parents, properties) (default: None).
+        fields (set, optional): The fields to include (see `parse_fields`), None for all fields (default: None).
+                                The triples of the fields which are not requested are skipped.
 
     Returns:
         dict: A dictionary containing all available information about the node, including:
@@ -163,6 +196,11 @@ def get_all_node_info(
     if default_dep:
         node_info["dep"] = None  # Handle meta/valDeprecationDate
 
+    # Leave out the fields which are not requested
+    if fields is not None:
+        node_info = {key: value for key, value in node_info.items() if key in fields}
+        all_info = "properties" in node_info
+
     # Ensure node exists within the database
     if not check_uri_exists(uri=uri, graph=graph):
         raise ValueError(f"URI '{uri}' does not exist within the database")
@@ -171,27 +209,48 @@ def get_all_node_info(
 
     # Query for all triples where the node is the subject
     for predicate, obj in graph.predicate_objects(subject=uri_ref):
+        # Collect the URIs that the returned information refers to (if requested)
+        if referenced is not None:
+            if predicate in (RDF.type, RDFS.subClassOf):
+                if isinstance(obj, URIRef) and wants(
+                    fields, "types" if predicate == RDF.type else "parents"
+                ):
+                    referenced.add(str(obj))
+            elif all_info and predicate not in (
+                RDFS.label,
+                META.valDeprecationDate,
+                SKOS.definition,
+            ):
+                referenced.add(str(predicate))
+                if isinstance(obj, URIRef):
+                    referenced.add(str(obj))
+
         # If the predicate is rdfs:label, store it separately
         if predicate == RDFS.label and isinstance(obj, Literal):
-            node_info["label"] = str(obj)
+            if "label" in node_info:
+                node_info["label"] = str(obj)
 
         # If the predicate is rdf:type, store it in the 'types' list
         elif predicate == RDF.type:
-            node_info["types"].append(str(obj))
+            if "types" in node_info:
+                node_info["types"].append(str(obj))
 
         # If the predicate is the deprecation date, store it separately
         elif predicate == META.valDeprecationDate and isinstance(obj, Literal):
-            node_info["dep"] = str(obj)
+            if wants(fields, "dep"):
+                node_info["dep"] = str(obj)
 
         # If the predicate is skos:definition, store it separately
         elif predicate == SKOS.definition and isinstance(obj, Literal):
-            definition = str(obj)
-            definition = definition.replace("&lt;", "<").replace("&gt;", ">")
-            node_info["definition"] = definition
+            if "definition" in node_info:
+                definition = str(obj)
+                definition = definition.replace("&lt;", "<").replace("&gt;", ">")
+                node_info["definition"] = definition
 
         # If the predicate is rdfs:subClassOf, store it in the 'parents' list
         elif predicate == RDFS.subClassOf:
-            node_info["parents"].append(str(obj))
+            if "parents" in node_info:
+                node_info["parents"].append(str(obj))
 
         else:
             if all_info:
@@ -208,12 +267,140 @@ def get_all_node_info(
     return node_info
 
 
-def get_root_node_info(graph) -> dict[str, any]:
+def get_label(uri: str, graph) -> str:
+    """
+    Retrieves the label of a node.
+
+    Args:
+        uri (str): The URI of the node.
+        graph (rdflib.Graph): The RDFLib graph to query.
+
+    Returns:
+        str: The rdfs:label of the node, or None if it has no label.
+    """
+    label = None
+    for _, _, value in graph.triples((URIRef(uri), RDFS.label, None)):
+        if isinstance(value, Literal):
+            label = str(value)
+    return label
+
+
+def get_labels(uris, graph) -> dict[str, str]:
+    """
+    Retrieves the labels of many URIs at once from the label index of the graph.
+
+    Args:
+        uris (iterable[str]): The URIs (of nodes, types, predicates, ...).
+        graph (rdflib.Graph): The RDFLib graph.
+
+    Returns:
+        dict: A dictionary mapping each URI to its rdfs:label, or None if it has none.
+    """
+    labels = get_graph_index(graph).labels
+    return {uri: labels.get(uri) for uri in uris}
+
+
+def get_reference(index, uri: str, expand_labels: bool = False) -> dict[str, str]:
+    """
+    Builds the reference to another node (e.g. an extra parent): its 'id', and its 'label' if expanded.
+    """
+    if expand_labels:
+        return {"id": uri, "label": index.labels.get(uri)}
+    return {"id": uri}
+
+
+def get_node_info_with_relations_batch(
+    uris: list[str], graph, dep: bool = False, fields: set = None
+) -> tuple[dict[str, dict], dict[str, str], dict[str, str]]:
+    """
+    Retrieves the selected information (see `get_node_info_with_relations`) of many nodes at once.
+
+    Args:
+        uris (list[str]): The URIs of the nodes to fetch information for.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to include deprecated nodes in the checks for has_children and has_parent. (default: False).
+        fields (set, optional): The fields to include in each node (see `parse_fields`), None for all fields (default: None).
+
+    Returns:
+        tuple: A dictionary mapping each URI to its information, a dictionary mapping each node URI to its label,
+               and a dictionary mapping each URI that does not exist to its error message.
+    """
+    nodes = {}
+    errors = {}
+
+    for uri in dict.fromkeys(uris):  # Unique URIs, in the requested order
+        try:
+            nodes[uri] = get_node_info_with_relations(
+                uri=uri, graph=graph, dep=dep, fields=fields
+            )
+        except ValueError as e:
+            errors[uri] = str(e)
+
+    labels = {
+        uri: node_info["label"] if "label" in node_info else get_label(uri, graph)
+        for uri, node_info in nodes.items()
+    }
+
+    return nodes, labels, errors
+
+
+def get_all_node_info_batch(
+    uris: list[str],
+    graph,
+    all_info: bool = True,
+    default_dep: bool = True,
+    fields: set = None,
+) -> tuple[dict[str, dict], dict[str, str], dict[str, str]]:
+    """
+    Retrieves all information (see `get_all_node_info`) of many nodes at once, and resolves the labels of
+    every URI referenced by them (the nodes, their types, parents and properties) in the same pass.
+
+    Args:
+        uris (list[str]): The URIs of the nodes to fetch information for.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        all_info (bool, optional): A flag indicating whether to retrieve additional properties (default: True).
+        default_dep (bool, optional): Whether to include 'dep' in the dictionary by default. (Default is True).
+        fields (set, optional): The fields to include in each node (see `parse_fields`), None for all fields (default: None).
+
+    Returns:
+        tuple: A dictionary mapping each URI to its information, a deduplicated dictionary mapping every
+               referenced URI to its label (None if it has none), and a dictionary mapping each URI that
+               does not exist to its error message.
+    """
+    nodes = {}
+    errors = {}
+    referenced = set()
+
+    for uri in dict.fromkeys(uris):  # Unique URIs, in the requested order
+        try:
+            nodes[uri] = get_all_node_info(
+                uri=uri,
+                graph=graph,
+                all_info=all_info,
+                default_dep=default_dep,
+                referenced=referenced,
+                fields=fields,
+            )
+        except ValueError as e:
+            errors[uri] = str(e)
+
+    # The labels of the nodes themselves are already known (if requested)
+    labels = {
+        uri: node_info["label"] if "label" in node_info else get_label(uri, graph)
+        for uri, node_info in nodes.items()
+    }
+    labels.update(get_labels(referenced.difference(labels), graph))
+
+    return nodes, labels, errors
+
+
+def get_root_node_info(graph, fields: set = None) -> dict[str, any]:
     """
     Retrieves information about the root node of the graph.
 
     Args:
         graph (rdflib.Graph): The RDFLib graph to query.
+        fields (set, optional): The fields to include (see `parse_fields`), None for all fields (default: None).
 
     Raises:
         ValueError: If the root node does not exist in the graph.
@@ -228,7 +415,7 @@ def get_root_node_info(graph) -> dict[str, any]:
         raise ValueError(f"URI '{root_node_uri}' does not exist within the database")
 
     # Use the helper function to get root node info
-    return get_basic_node_info(root_node_ref, graph)
+    return get_basic_node_info(root_node_ref, graph, fields=fields)
 
 
 def has_children(uri: str, graph, dep: bool) -> bool:
@@ -295,11 +482,17 @@ def get_children(
     children_flag: bool = True,
     order: bool = True,
     ignore_id: str = None,
-    inclusion_list: list = None,
+    inclusion_list: set = None,
+    stats: bool = False,
+    fields: set = None,
+    expand_labels: bool = False,
 ) -> list[dict[str, any]]:
     """
     Retrieves the children of a given node, with optional inclusion of deprecated nodes and extra parents.
 
+    The children come from the hierarchy index, where they are stored both in label order and in
+    the order of the graph (with and without deprecated nodes), so no sorting is needed at request time.
+
     Args:
         uri (str): The URI of the node to fetch children for.
         graph (rdflib.Graph): The RDFLib graph to query.
@@ -307,8 +500,13 @@ def get_children(
         ex_parents (bool, optional): Whether to include extra parents for each child. (default: True).
         children_flag (bool, optional): Whether to include a boolean flag indicating if the child has children. (default: True).
         order (bool, optional): A flag indicating whether to order the children alphabetically (default: True).
+                                The children are stored in both orders, so this costs nothing either way.
         ignore_id (str, optional): The URI to exclude from the results (default: None).
-        inclusion_list (list, optional): A list of URIs to include in the results (default: None).
+        inclusion_list (set, optional): The URIs to include in the results (default: None).
+        stats (bool, optional): Whether to include each child's 'depth', 'child_count' and 'descendant_count' (default: False).
+        fields (set, optional): The fields to include in each child (see `parse_fields`), None for all fields (default: None).
+                                Fields which are not requested are not computed.
+        expand_labels (bool, optional): Whether to include the label of each extra parent (default: False).
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -316,66 +514,319 @@ def get_children(
     Returns:
         list: A list of dictionaries, each containing information about a child node.
     """
-    children_set = set()  # Keep only unique children
+    index = get_graph_index(graph)
+    uri = str(uri)
     children_list = []
-    uri_ref = URIRef(uri)  # Convert the URI string to an RDFLib URIRef object
 
-    if not check_uri_exists(uri=uri, graph=graph):
+    if not index.exists(uri):
         raise ValueError(f"URI '{uri}' does not exist within the database")
 
-    # Query the graph for triples where the given URI is an object of rdfs:subClassOf
-    for child, _, parent in graph.triples((None, RDFS.subClassOf, uri_ref)):
-        # If the node is being ignored, skip it (including a node being a child of itself)
-        if (str(child) == uri) or (ignore_id and str(child) == ignore_id):
+    # The children are unique, and exclude the node itself and deprecated nodes (unless requested)
+    for child in index.get_children(uri, dep=dep, order=order):
+        # If the node is being ignored, skip it
+        if ignore_id and child == str(ignore_id):
             continue
 
         # Include only if part of the inclusion_list (if specified)
-        if (inclusion_list) and (str(child) not in inclusion_list):
+        if (inclusion_list) and (child not in inclusion_list):
             continue
 
-        if child not in children_set:
-            # Use the helper function to get child info
-            child_info = get_basic_node_info(child, graph)
+        child_info = index.basic_info(child, fields)
 
-            # If ignoring deprecated nodes and a node has a deprecation date, then skip it
-            if not dep and child_info.get("dep"):
-                continue
+        # If ex_parents is True, find any additional parents
+        if ex_parents and wants(fields, "extra_parents"):
+            extra_parents_list = [
+                get_reference(index, other_parent, expand_labels)
+                for other_parent in index.get_parents(child, dep=True)
+                if other_parent != uri
+            ]
 
-            # Add the child to the set and the list
-            children_set.add(child)
+            # Only add the 'extra_parents' field if there are extra parents
+            if extra_parents_list:
+                child_info["extra_parents"] = extra_parents_list
 
-            # If ex_parents is True, find any additional parents
-            if ex_parents:
-                extra_parents_list = []  # Initialise an empty list for extra parents
+        # Add the 'has_children' field
+        if children_flag and wants(fields, "has_children"):
+            child_info["has_children"] = index.has_children(child, dep=dep)
 
-                for _, _, other_parent in graph.triples((child, RDFS.subClassOf, None)):
-                    if str(other_parent) != str(parent):
-                        # Get info for the extra parent and add it to the extra_parents list
-                        extra_parent_info = {"id": str(other_parent)}
-                        extra_parents_list.append(extra_parent_info)
+        # Add the precomputed subtree stats
+        if stats:
+            child_info.update(get_subtree_stats(index, child, dep, fields))
 
-                # Only add the 'extra_parents' field if there are extra parents
-                if extra_parents_list:
-                    child_info["extra_parents"] = extra_parents_list
+        # Append the child info to the children list
+        children_list.append(child_info)
 
-            # Add the 'has_children' field
-            if children_flag:
-                child_info["has_children"] = has_children(str(child), graph, dep)
+    return children_list
 
-            # Append the child info to the children list
-            children_list.append(child_info)
 
-    # Order the children by their label if 'order' is set to True
-    if order:
-        children_list.sort(key=lambda x: (x.get("label") or ""))
+def get_subtree_stats(index, uri: str, dep: bool, fields: set = None) -> dict:
+    """
+    Retrieves the precomputed subtree stats of a node which are part of the fieldset.
+    """
+    stats = index.subtree_stats(uri, dep=dep)
+    if fields is None:
+        return stats
+    return {key: value for key, value in stats.items() if key in fields}
 
-    return children_list
+
+def _stats_fields(index, uri: str, dep: bool, fields: set = None) -> list:
+    """
+    Encodes the precomputed subtree stats of a node as (key, value) fragments, sorted by key.
+    """
+    return [
+        (key, encode(value))
+        for key, value in sorted(get_subtree_stats(index, uri, dep, fields).items())
+    ]
+
+
+def get_children_json(
+    uri: str,
+    graph,
+    dep: bool = False,
+    ex_parents: bool = True,
+    children_flag: bool = True,
+    order: bool = True,
+    ignore_id: str = None,
+    stats: bool = False,
+    fields: set = None,
+    expand_labels: bool = False,
+) -> str:
+    """
+    Same as `get_children`, but writes the children as a JSON array from the pre-encoded fragments
+    of the nodes, without building a dictionary per child.
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+
+    Returns:
+        str: The JSON array of the children.
+    """
+    index = get_graph_index(graph)
+    fragments = get_node_fragments(graph)
+    uri = str(uri)
+    children_list = []
+
+    if not index.exists(uri):
+        raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    for child in index.get_children(uri, dep=dep, order=order):
+        # If the node is being ignored, skip it
+        if ignore_id and child == str(ignore_id):
+            continue
+
+        # The other fields of the child, in key order
+        child_fields = _stats_fields(index, child, dep, fields) if stats else []
+
+        if ex_parents and wants(fields, "extra_parents"):
+            extra_parents = [
+                fragments.reference(other_parent, expand_labels)
+                for other_parent in index.get_parents(child, dep=True)
+                if other_parent != uri
+            ]
+            if extra_parents:
+                child_fields.append(
+                    ("extra_parents", "[" + ",".join(extra_parents) + "]")
+                )
+
+        if children_flag and wants(fields, "has_children"):
+            has_children = index.has_children(child, dep=dep)
+            child_fields.append(("has_children", "true" if has_children else "false"))
+
+        children_list.append(fragments.node(child, child_fields, fields))
+
+    return "[" + ",".join(children_list) + "]"
+
+
+def get_children_page(
+    uri: str,
+    graph,
+    dep: bool = False,
+    ex_parents: bool = True,
+    children_flag: bool = True,
+    limit: int = 100,
+    cursor: int = 0,
+    order: bool = True,
+    stats: bool = False,
+    fields: set = None,
+    expand_labels: bool = False,
+) -> dict[str, any]:
+    """
+    Retrieves a page of the children of a given node, in the same format as `get_children`.
+
+    The children are sliced from the lists stored in the hierarchy index (presorted by label, or in
+    the order of the graph), so that the cost of a page does not depend on the number of children of the node.
+
+    Args:
+        uri (str): The URI of the node to fetch children for.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to include deprecated nodes. (default: False).
+        ex_parents (bool, optional): Whether to include extra parents for each child. (default: True).
+        children_flag (bool, optional): Whether to include a boolean flag indicating if the child has children. (default: True).
+        limit (int, optional): The maximum number of children in the page (default: 100).
+        cursor (int, optional): The cursor returned with the previous page, 0 for the first page (default: 0).
+        order (bool, optional): Whether to order the children alphabetically, the cursors of both orders differ (default: True).
+        stats (bool, optional): Whether to include each child's 'depth', 'child_count' and 'descendant_count' (default: False).
+        fields (set, optional): The fields to include in each child (see `parse_fields`), None for all fields (default: None).
+        expand_labels (bool, optional): Whether to include the label of each extra parent (default: False).
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+
+    Returns:
+        dict: A dictionary containing:
+            - children (list[dict]): The children of the page.
+            - total (int): The number of children of the node.
+            - next_cursor (int): The cursor to fetch the next page with (None on the last page).
+    """
+    index = get_graph_index(graph)
+
+    if not index.exists(uri):
+        raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    page, next_cursor = index.get_children_page(
+        uri, dep=dep, start=cursor, limit=limit, order=order
+    )
+
+    children_list = []
+    for child in page:
+        child_info = index.basic_info(child, fields)
+
+        # If ex_parents is True, add the other parents of the child
+        if ex_parents and wants(fields, "extra_parents"):
+            extra_parents_list = [
+                get_reference(index, other_parent, expand_labels)
+                for other_parent in index.get_parents(child, dep=True)
+                if other_parent != uri
+            ]
+            if extra_parents_list:
+                child_info["extra_parents"] = extra_parents_list
+
+        # Add the 'has_children' field
+        if children_flag and wants(fields, "has_children"):
+            child_info["has_children"] = index.has_children(child, dep=dep)
+
+        # Add the precomputed subtree stats
+        if stats:
+            child_info.update(get_subtree_stats(index, child, dep, fields))
+
+        children_list.append(child_info)
+
+    return {
+        "children": children_list,
+        "total": index.subtree_stats(uri, dep=dep)["child_count"],
+        "next_cursor": next_cursor,
+    }
 
 
-def search(search_key, field, graph, dep=False, limit=5, min_similarity=75):
+def get_children_batch(
+    uris: list[str],
+    graph,
+    dep: bool = False,
+    ex_parents: bool = True,
+    children_flag: bool = True,
+    order: bool = True,
+    stats: bool = False,
+    fields: set = None,
+    expand_labels: bool = False,
+) -> tuple[dict[str, list], dict[str, str]]:
+    """
+    Retrieves the children of many nodes at once.
+
+    Args:
+        uris (list[str]): The URIs of the nodes to fetch children for.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to include deprecated nodes. (default: False).
+        ex_parents (bool, optional): Whether to include extra parents for each child. (default: True).
+        children_flag (bool, optional): Whether to include a boolean flag indicating if the child has children. (default: True).
+        order (bool, optional): A flag indicating whether to order the children alphabetically (default: True).
+        stats (bool, optional): Whether to include each child's 'depth', 'child_count' and 'descendant_count' (default: False).
+        fields (set, optional): The fields to include in each child (see `parse_fields`), None for all fields (default: None).
+        expand_labels (bool, optional): Whether to include the label of each extra parent (default: False).
+
+    Returns:
+        tuple: A dictionary mapping each URI to its list of children (as returned by `get_children`),
+               and a dictionary mapping each URI that could not be expanded to its error message.
+    """
+    children = {}
+    errors = {}
+
+    for uri in dict.fromkeys(uris):  # Unique URIs, in the requested order
+        try:
+            children[uri] = get_children(
+                uri=uri,
+                graph=graph,
+                dep=dep,
+                ex_parents=ex_parents,
+                children_flag=children_flag,
+                order=order,
+                stats=stats,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+        except ValueError as e:
+            errors[uri] = str(e)
+
+    return children, errors
+
+
+def extract_within_budget(
+    query, choices, scorer, limit, score_cutoff, deadline=None, chunk_size=None
+):
+    """
+    Finds the best matches of a query among the choices, like `process.extract`, but scores the
+    choices in chunks and stops once the deadline has passed, returning the best matches found so far.
+
+    Args:
+        query (str): The search term.
+        choices (list[str]): The strings to match against.
+        scorer (callable): The RapidFuzz scorer.
+        limit (int): Maximum number of matches to return.
+        score_cutoff (float): Minimum score of the matches.
+        deadline (float, optional): `time.monotonic()` after which no more chunk is scored (default: None, no deadline).
+        chunk_size (int, optional): Number of choices scored between deadline checks (default: `Config.SEARCH_CHUNK_SIZE`).
+
+    Returns:
+        tuple: The matches (choice, score, index), best first, and whether the choices were not all scored.
+    """
+    if deadline is None:
+        matches = process.extract(
+            query, choices, scorer=scorer, limit=limit, score_cutoff=score_cutoff
+        )
+        return matches, False
+
+    chunk_size = chunk_size or Config.SEARCH_CHUNK_SIZE
+    best = []
+
+    for start in range(0, len(choices), chunk_size):
+        # Always score the first chunk, so there is something to return
+        if start and time.monotonic() >= deadline:
+            return best, True
+
+        chunk_matches = process.extract(
+            query,
+            choices[start : start + chunk_size],
+            scorer=scorer,
+            limit=limit,
+            score_cutoff=score_cutoff,
+        )
+        best.extend((choice, score, start + i) for choice, score, i in chunk_matches)
+
+        # Keep the best matches, ties ordered by position (like `process.extract`)
+        best.sort(key=lambda match: (-match[1], match[2]))
+        del best[limit:]
+
+    return best, False
+
+
+def search_uris(
+    search_key, field, graph, dep=False, limit=5, min_similarity=75, deadline=None
+):
     """
     Search the RDFLib graph for nodes by URI or label, with optional filtering for deprecated nodes.
-    Return results within the limit and ranked by relavence to the search key.
+    Return the URIs of the results within the limit and ranked by relavence to the search key.
+
+    The lowercase labels and URIs matched against are kept in the hierarchy index, so only the
+    scoring is done per request.
 
     Args:
         search_key (str): The search term (either part of a URI or part of a label).
@@ -384,10 +835,14 @@ def search(search_key, field, graph, dep=False, limit=5, min_similarity=75):
         dep (bool, optional): Whether to include deprecated nodes. Defaults to False.
         limit (int, optional): Maximum number of results to return. Defaults to 5.
         min_similarity (int, optional): Minimum similarity score of results to return. Default to 75(%).
+        deadline (float, optional): `time.monotonic()` after which the search stops and returns the best results
+                                    found so far. Defaults to None (no deadline).
 
     Returns:
-        list: A list of unique dictionaries containing node information.
+        tuple: A list of unique URIs, and whether the search was truncated by the deadline.
     """
+    index = get_graph_index(graph)
+
     # Initialise results array
     results = []
 
@@ -395,69 +850,115 @@ def search(search_key, field, graph, dep=False, limit=5, min_similarity=75):
     search_key_lower = search_key.lower()
 
     # NOTE: The search ranking must be performed with case insensitivity, however the information must
-    # be obtained using the original case sensitive URI, so the original must be stored as well.
+    # be obtained using the original case sensitive URI, so the index maps each lowercase choice to it.
 
     # Check if the field is "LABEL"
     if field.upper() == "LABEL":
+        # Find similar matches based on the label
+        choices, uri_map = index.search_choices("LABEL")
+        scorer = fuzz.WRatio
 
-        labels = set()  # Ensure unique labels to prevent duplication
-        uri_label_map = {}  # Map labels to their URIs
+    # Default or explicit "URI" search (substring match)
+    else:
+        # Use custom scorer to put more emphasis on numbers in the id
+        choices, uri_map = index.search_choices("ID")
+        scorer = custom_number_sensitive_scorer
+
+    matches, truncated = extract_within_budget(
+        search_key_lower,
+        choices,
+        scorer=scorer,
+        limit=limit,
+        score_cutoff=min_similarity,
+        deadline=deadline,
+    )
 
-        for uri, _, label in graph.triples((None, RDFS.label, None)):
-            if isinstance(label, Literal):
-                label = str(label).lower()  # Ensure case insensitivity
-                labels.add(label)
-                uri_label_map[label] = uri  # Store original URI with lowercase label
+    for choice, _, _ in matches:
+        uri = uri_map[choice]  # Retrieve original case-sensitive URI
 
-        # Find similar matches based on the label
-        matches = process.extract(
-            search_key_lower,
-            list(labels),
-            scorer=fuzz.WRatio,
-            limit=limit,
-            score_cutoff=min_similarity,
-        )
+        # Skip if we don't want deprecated nodes
+        if not dep and index.is_deprecated(uri):
+            continue
 
-        for label, _, _ in matches:
-            uri = uri_label_map[label]
+        results.append(uri)
 
-            # Get basic node info
-            node_info = get_basic_node_info(uri=uri, graph=graph)
+    return results, truncated
 
-            # Skip if we don't want deprecated nodes
-            if not dep and node_info.get("dep"):
-                continue
 
-            results.append(node_info)
+def search(
+    search_key,
+    field,
+    graph,
+    dep=False,
+    limit=5,
+    min_similarity=75,
+    stats=False,
+    deadline=None,
+):
+    """
+    Search the RDFLib graph for nodes by URI or label (see `search_uris`), returning the basic
+    information of each result.
 
-    # Default or explicit "URI" search (substring match)
-    else:
-        # Get all URIs in the graph, preserving original URIs in a map for case insensitivity
-        uri_map = {str(uri).lower(): uri for uri in graph.subjects()}
+    Args:
+        search_key (str): The search term (either part of a URI or part of a label).
+        field (str): The field to search by ('URI' or 'LABEL').
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to include deprecated nodes. Defaults to False.
+        limit (int, optional): Maximum number of results to return. Defaults to 5.
+        min_similarity (int, optional): Minimum similarity score of results to return. Default to 75(%).
+        stats (bool, optional): Whether to include each node's 'depth', 'child_count' and 'descendant_count'. Defaults to False.
+        deadline (float, optional): `time.monotonic()` after which the search stops (see `search_uris`). Defaults to None.
 
-        # Perform case-insensitive search on lowercase URIs
-        uris = list(uri_map.keys())
+    Returns:
+        tuple: A list of unique dictionaries containing node information, and whether the search was truncated.
+    """
+    index = get_graph_index(graph)
+    results = []
+    uris, truncated = search_uris(
+        search_key, field, graph, dep, limit, min_similarity, deadline
+    )
 
-        # Find similar matches using a list of the uris
-        # Use custom scorer to put more emphasis on numbers in the id
-        matches = process.extract(
-            search_key_lower,
-            list(uris),
-            scorer=custom_number_sensitive_scorer,
-            limit=limit,
-            score_cutoff=min_similarity,
-        )
+    for uri in uris:
+        node_info = index.basic_info(uri)
 
-        for uri_lower, _, _ in matches:
-            original_uri = uri_map[uri_lower]  # Retrieve original case-sensitive URI
-            node_info = get_basic_node_info(uri=original_uri, graph=graph)
+        # Add the precomputed subtree stats (if requested)
+        if stats:
+            node_info.update(index.subtree_stats(uri, dep=dep))
 
-            if not dep and node_info.get("dep"):
-                continue
+        results.append(node_info)
 
-            results.append(node_info)
+    return results, truncated
 
-    return results
+
+def search_json(
+    search_key,
+    field,
+    graph,
+    dep=False,
+    limit=5,
+    min_similarity=75,
+    stats=False,
+    deadline=None,
+) -> tuple[str, bool]:
+    """
+    Same as `search`, but writes the results as a JSON array from the pre-encoded fragments of
+    the nodes.
+
+    Returns:
+        tuple: The JSON array of the results, and whether the search was truncated.
+    """
+    index = get_graph_index(graph)
+    fragments = get_node_fragments(graph)
+    results = []
+    uris, truncated = search_uris(
+        search_key, field, graph, dep, limit, min_similarity, deadline
+    )
+
+    for uri in uris:
+        fields = _stats_fields(index, uri, dep) if stats else ()
+        results.append(fragments.node(uri, fields))
+
+    return "[" + ",".join(results) + "]", truncated
 
 
 def custom_number_sensitive_scorer(search_key, candidate, **kwargs):
@@ -486,6 +987,8 @@ def get_parents(
     children_ex_parents: bool = False,
     parent_flag: bool = True,
     order: bool = True,
+    fields: set = None,
+    expand_labels: bool = False,
 ) -> list[dict[str, any]]:
     """
     Retrieves the parents of a given node and ensures that its children are unique across all parents.
@@ -497,6 +1000,9 @@ def get_parents(
         include_ex_children(bool, optional): Whether to include children other then uri in `ex_children` field (default: False).
         children_ex_parents (bool, optional): Whether to include extra parents for each child in parent's children. (default: True).
         order (bool, optional): A flag indicating whether to order the parents alphabetically by their label (default: True).
+                                The parents are stored in both orders, so this costs nothing either way.
+        fields (set, optional): The fields to include in each parent and child (see `parse_fields`), None for all fields (default: None).
+        expand_labels (bool, optional): Whether to include the label of each extra parent of the children (default: False).
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -504,30 +1010,23 @@ def get_parents(
     Returns:
         list: A list of dictionaries, each containing information about a parent node.
     """
+    index = get_graph_index(graph)
+    uri = str(uri)
     hierarchy = []
-    uri_ref = URIRef(uri)  # Convert the URI string to an RDFLib URIRef object
-    num_parents = 0
 
-    if not check_uri_exists(uri=uri, graph=graph):
+    if not index.exists(uri):
         raise ValueError(f"URI '{uri}' does not exist within the database")
 
-    # Get ALL the parents of node
-    for _, _, parent in graph.triples((uri_ref, RDFS.subClassOf, None)):
-        parent_info = get_basic_node_info(parent, graph)
-
-        # If ignoring deprecated nodes and a node has a deprecation date, then skip it
-        if not dep and parent_info.get("dep"):
-            continue
+    # Get the parents of node (excluding deprecated nodes unless requested)
+    for parent in index.get_parents(uri, dep=dep, order=order):
+        parent_info = index.basic_info(parent, fields)
 
         # Add the 'has_parents' field
-        if parent_flag:
-            parent_info["has_parents"] = has_parents(str(parent), graph, dep)
-
-        # Incriment number of parents since it has now been included as a parent
-        num_parents += 1
+        if parent_flag and wants(fields, "has_parents"):
+            parent_info["has_parents"] = index.has_parents(parent, dep=dep)
 
         # Obtain the children of the parents ONLY if requested
-        if include_ex_children:
+        if include_ex_children and wants(fields, "extra_children"):
             parent_info["extra_children"] = get_children(
                 uri=parent,
                 graph=graph,
@@ -536,18 +1035,72 @@ def get_parents(
                 children_flag=False,  # Dont include attribute in children of parents
                 order=order,
                 ignore_id=uri,
+                fields=fields,
+                expand_labels=expand_labels,
             )
 
         # Append the parent to the hierarchy
         hierarchy.append(parent_info)
 
-    # Order the children by their label if 'order' is set to True
-    if order:
-        hierarchy.sort(key=lambda x: (x.get("label") or ""))
-
     return hierarchy
 
 
+def get_parents_json(
+    uri: str,
+    graph,
+    dep: bool = False,
+    include_ex_children: bool = False,
+    children_ex_parents: bool = False,
+    parent_flag: bool = True,
+    order: bool = True,
+    fields: set = None,
+    expand_labels: bool = False,
+) -> str:
+    """
+    Same as `get_parents`, but writes the parents as a JSON array from the pre-encoded fragments
+    of the nodes, without building a dictionary per parent (or child of a parent).
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+
+    Returns:
+        str: The JSON array of the parents.
+    """
+    index = get_graph_index(graph)
+    fragments = get_node_fragments(graph)
+    uri = str(uri)
+    hierarchy = []
+
+    if not index.exists(uri):
+        raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    for parent in index.get_parents(uri, dep=dep, order=order):
+        # The other fields of the parent, in key order
+        parent_fields = []
+
+        if include_ex_children and wants(fields, "extra_children"):
+            extra_children = get_children_json(
+                uri=parent,
+                graph=graph,
+                dep=dep,
+                ex_parents=children_ex_parents,
+                children_flag=False,  # Dont include attribute in children of parents
+                order=order,
+                ignore_id=uri,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+            parent_fields.append(("extra_children", extra_children))
+
+        if parent_flag and wants(fields, "has_parents"):
+            has_parents = index.has_parents(parent, dep=dep)
+            parent_fields.append(("has_parents", "true" if has_parents else "false"))
+
+        hierarchy.append(fragments.node(parent, parent_fields, fields))
+
+    return "[" + ",".join(hierarchy) + "]"
+
+
 def get_local_hierarchy_to_root(
     uri: str,
     graph,
@@ -557,11 +1110,16 @@ def get_local_hierarchy_to_root(
     parent_flag: bool = False,
     order: bool = True,
     include_children: bool = True,
+    expand_labels: bool = False,
 ) -> list[dict[str, any]]:
     """
     Get the local hierarchy of a node from the root all the way to the selected node,
     only including the children and parents required to get to the node.
 
+    The hierarchy is built iteratively, one level up at a time: each level wraps the structure built
+    so far as a child of the first parent (by label, unless `order` is False), along with any siblings that were already drawn
+    (to show multi-parent links).
+
     Args:
         uri (str): The URI of the node to retrieve the hierarchy for.
         graph (rdflib.Graph): The RDFLib graph to query.
@@ -571,6 +1129,10 @@ def get_local_hierarchy_to_root(
         parent_flag (bool, optional): Whether to include a flag indicating if the node has parents (default: True).
         order (bool, optional): Whether to order children alphabetically by label (default: True).
         include_children (bool, optional): Whether to include the direct children of the selected node (default: True).
+        expand_labels (bool, optional): Whether to include the label of each extra parent (default: False).
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
 
     Returns:
         list[dict]: A list representing the hierarchy, with the node's children placed correctly under its parents.
@@ -578,13 +1140,12 @@ def get_local_hierarchy_to_root(
     if not check_uri_exists(uri=uri, graph=graph):
         raise ValueError(f"URI '{uri}' does not exist within the database")
 
-    node_list = []
-    children = []
+    node_set = {uri}  # URIs of the drawn nodes
+    path = {uri}  # URIs of the nodes from the centre node up to the current level
 
     # Create the initial structure for the centre node
     centre_node = get_basic_node_info(uri=uri, graph=graph)
     centre_node["centre"] = True  # Mark this as the centre node
-    node_list.append(uri)  # Add centre node in node list
 
     # Start by getting the children of the centre node (if requested)
     if include_children:
@@ -596,150 +1157,442 @@ def get_local_hierarchy_to_root(
             children_flag=children_flag,
             order=order,
             ignore_id=uri,  # Prevent the node to be a child of itself
+            expand_labels=expand_labels,
         )
         centre_node["children"] = children  # Add the node's children
-
-    # Add the children to the list
-    for child in children:
-        node_list.append(child.get("id"))
+        node_set.update(child["id"] for child in children)
 
     # Add the 'has_children' field
     if children_flag:
         centre_node["has_children"] = has_children(uri=str(uri), graph=graph, dep=dep)
 
-    # Now get the parents of the centre node
-    parents = get_parents(
-        uri=uri,
-        graph=graph,
-        dep=dep,
-        ex_parents=ex_parents,
-        children_flag=children_flag,
-        parent_flag=parent_flag,
-        order=order,
-        include_children=False,  # Don't include children at the parent level yet
-    )
+    node = centre_node
+    node_uri = uri
 
-    # If the node has no parents, return the centre node structure as it is the root
-    if not parents:
-        return centre_node
-
-    # Add the parents' IDs to the node_list
-    for parent in parents:
-        node_list.append(parent["id"])
-
-    # Select the first parent to append the structure to
-    main_parent = parents[0]
-
-    # If the node has additional parents, add them to the 'extra_parents' field
-    if ex_parents and len(parents) > 1:
-        centre_node["extra_parents"] = [{"id": parent["id"]} for parent in parents[1:]]
-
-    # Start building from the first parent up to the root
-    hierarchy = build_parent_hierarchy(
-        node=centre_node,
-        node_list=node_list,
-        parent_uri=main_parent["id"],
-        graph=graph,
-        dep=dep,
-        ex_parents=ex_parents,
-        parent_flag=parent_flag,
-        order=order,
-    )
+    while True:
+        # Get the parents of the current node (a node already on the path would be a cycle)
+        parents = [
+            parent
+            for parent in get_parents(
+                uri=node_uri,
+                graph=graph,
+                dep=dep,
+                parent_flag=parent_flag,
+                order=order,
+            )
+            if parent["id"] not in path
+        ]
+
+        # If the node has no parents, it is the root
+        if not parents:
+            return node
+
+        # Add the parents' IDs to the drawn nodes
+        node_set.update(parent["id"] for parent in parents)
+
+        # If the node has additional parents, add them to the 'extra_parents' field
+        if ex_parents and len(parents) > 1:
+            node["extra_parents"] = [
+                (
+                    {"id": parent["id"], "label": parent["label"]}
+                    if expand_labels
+                    else {"id": parent["id"]}
+                )
+                for parent in parents[1:]
+            ]
 
-    return hierarchy
+        # Go up one level, through the first parent
+        parent_uri = parents[0]["id"]
+        parent_structure = get_basic_node_info(uri=parent_uri, graph=graph)
+        parent_structure["children"] = [node]  # The current node becomes a child
+
+        if ex_parents:
+            # Add the children that are drawn nodes, to show the multi-parent links
+            matching_children = get_children(
+                uri=parent_uri,
+                graph=graph,
+                dep=dep,
+                ex_parents=ex_parents,
+                children_flag=False,
+                order=order,
+                inclusion_list=node_set,
+                ignore_id=node_uri,  # Ignore the current node to avoid duplication
+                expand_labels=expand_labels,
+            )
+            parent_structure["children"].extend(matching_children)
+
+        node = parent_structure
+        node_uri = parent_uri
+        path.add(parent_uri)
 
 
-def build_parent_hierarchy(
-    node: dict,
-    parent_uri: str,
+def get_subtree(
+    uri: str,
     graph,
-    node_list: list,
+    depth: int = 2,
+    max_nodes: int = 500,
     dep: bool = False,
-    ex_parents: bool = True,
-    parent_flag: bool = False,
     order: bool = True,
-) -> dict:
+) -> dict[str, any]:
     """
-    Recursively builds the parent hierarchy by appending the current node structure to its parent.
+    Retrieves the subtree below a node, down to a given depth, as a flat node table and an edge list.
 
-    This function recursively traverses the graph from a given node upwards to the root, building a hierarchy
-    of nodes and their relationships. It appends the current node's structure as a child to its parent,
-    and continues to go up through the graph, attaching parents until it reaches the root.
+    The subtree is expanded breadth-first over the hierarchy index, so the closest levels are
+    always complete before deeper ones. Nodes reached through several parents are included once,
+    with one edge per parent. No new nodes are added once the node budget is exhausted.
 
     Args:
-        node (dict): The current node's structure, including children and other relevant information.
-        parent_uri (str): The URI of the parent node to which the current node will be attached.
-        graph (rdflib.Graph): The RDFLib graph that stores the relationships between nodes.
-        node_list (list): A list of node URIs that have already been processed, used to avoid duplication.
-        dep (bool, optional): Whether to include deprecated nodes in the hierarchy (default: False).
-        ex_parents (bool, optional): Whether to include additional parents (multi-parent scenario) (default: True).
-        parent_flag (bool, optional): Whether to include a flag indicating if the node has parents (default: False).
-        order (bool, optional): Whether to order children alphabetically by label (default: True).
+        uri (str): The URI of the node at the top of the subtree.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        depth (int, optional): The number of levels to expand below the node (default: 2).
+        max_nodes (int, optional): The maximum number of nodes to return, including the top node (default: 500).
+        dep (bool, optional): Whether to include deprecated nodes (default: False).
+        order (bool, optional): Whether to expand the children of each node alphabetically by label (default: True).
+                                The children are stored in both orders, so this costs nothing either way.
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
 
     Returns:
-        dict: A dictionary representing the hierarchical structure, with the current node attached to its parent
-              and any additional parents or children included as necessary.
-    """
-    # Get the parents of the current parent node
-    parent_structure = get_basic_node_info(uri=parent_uri, graph=graph)
-    parent_structure["children"] = [
-        node
-    ]  # The current node becomes a child of this parent
-
-    if ex_parents:
-        # Get children that match node_list and add them to the parent's children
-        matching_children = get_children(
-            uri=parent_uri,
-            graph=graph,
-            dep=dep,
-            ex_parents=ex_parents,
-            children_flag=False,
-            order=order,
-            inclusion_list=node_list,  # Include ONLY the drawn nodes to check for multi-parent links
-            ignore_id=node["id"],  # Ignore the current node to avoid duplication
-        )
+        dict: A dictionary containing:
+            - nodes (list[dict]): The nodes ('id', 'label', 'dep' if deprecated, 'depth' and 'has_children').
+            - edges (list[dict]): The parent-child links ('source' is the parent URI, 'target' the child URI).
+            - truncated (bool): True if nodes were left out because of the node budget.
+    """
+    index = get_graph_index(graph)
 
-        # Add matching children from node_list to the parent
-        parent_structure["children"].extend(matching_children)
-
-    parents_of_parent = get_parents(
-        uri=parent_uri,
-        graph=graph,
-        dep=dep,
-        ex_parents=ex_parents,
-        children_flag=False,
-        parent_flag=parent_flag,
-        order=order,
-        include_children=False,
-    )
+    if not index.exists(uri):
+        raise ValueError(f"URI '{uri}' does not exist within the database")
 
-    # If there are parents, go up another level
-    if parents_of_parent:
-        main_parent = parents_of_parent[0]
+    depths = {uri: 0}  # Nodes included so far, with their depth
+    nodes = []
+    edges = []
+    truncated = False
+    queue = deque([uri])
 
-        # Add extra parents if there are any
-        if ex_parents and len(parents_of_parent) > 1:
-            parent_structure["extra_parents"] = [
-                {"id": p["id"]} for p in parents_of_parent[1:]
+    while queue:
+        node = queue.popleft()
+        node_depth = depths[node]
+
+        node_info = index.basic_info(node)
+        node_info["depth"] = node_depth
+        node_info["has_children"] = index.has_children(node, dep=dep)
+        nodes.append(node_info)
+
+        if node_depth >= depth:
+            continue
+
+        children = index.get_children(node, dep=dep, order=order)
+        for child in children:
+            if child not in depths:
+                # Once the node budget is used up, no new nodes are added (nor their edges),
+                # but the nodes already queued are still returned and linked to each other
+                if len(depths) >= max_nodes:
+                    truncated = True
+                    continue
+                depths[child] = node_depth + 1
+                queue.append(child)
+
+            edges.append({"source": node, "target": child})
+
+    return {"nodes": nodes, "edges": edges, "truncated": truncated}
+
+
+def get_ancestors(
+    uri: str,
+    graph,
+    dep: bool = False,
+    paths: bool = False,
+    max_paths: int = 100,
+    order: bool = True,
+) -> dict[str, any]:
+    """
+    Retrieves all ancestors of a node, with every parent-child link between them, and optionally
+    the distinct paths from the roots down to the node.
+
+    Unlike `get_local_hierarchy_to_root`, which only goes up through the first parent, this returns
+    the complete ancestor graph of multi-parent nodes. The ancestors come from the closure kept
+    in the hierarchy index, so only the links between them need to be looked up.
+
+    Args:
+        uri (str): The URI of the node to retrieve the ancestors for.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to include deprecated nodes (default: False).
+        paths (bool, optional): Whether to include the paths from the roots to the node (default: False).
+        max_paths (int, optional): The maximum number of paths to return (default: 100).
+        order (bool, optional): Whether to order the nodes, edges and paths alphabetically by label (default: True).
+                                The ordered ancestors are kept in the hierarchy index, so this is not sorted per request.
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+
+    Returns:
+        dict: A dictionary containing:
+            - nodes (list[dict]): The node and its ancestors ('id', 'label', 'dep' if deprecated, and
+                                  'centre' for the node itself or 'root' for ancestors without parents).
+            - edges (list[dict]): The parent-child links ('source' is the parent URI, 'target' the child URI).
+            - paths (list[list[str]]): The URIs of each path, from a root to the node (only if requested).
+            - truncated (bool): True if paths were left out because of `max_paths` (only if requested).
+    """
+    index = get_graph_index(graph)
+
+    if not index.exists(uri):
+        raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    if order:
+        ancestors = index.ordered_ancestors(uri, dep=dep)
+    else:
+        ancestors = index.ancestors(uri, dep=dep)
+    node_ids = [uri, *ancestors]
+
+    nodes = []
+    edges = []
+    for node in node_ids:
+        node_info = index.basic_info(node)
+        parents = index.get_parents(node, dep=dep, order=order)
+
+        if node == uri:
+            node_info["centre"] = True
+        elif not parents:
+            node_info["root"] = True
+        nodes.append(node_info)
+
+        edges.extend({"source": parent, "target": node} for parent in parents)
+
+    result = {"nodes": nodes, "edges": edges}
+
+    if paths:
+        # Depth-first walk up from the node, stopping once enough paths are found
+        root_paths = []
+        truncated = False
+        stack = [[uri]]
+        while stack:
+            path = stack.pop()
+            parents = [
+                p
+                for p in index.get_parents(path[-1], dep=dep, order=order)
+                if p not in path
             ]
+            if not parents:
+                if len(root_paths) >= max_paths:
+                    truncated = True
+                    break
+                root_paths.append(path[::-1])
+                continue
 
-        # Add the parents' IDs to the node_list
-        for parent in parents_of_parent:
-            node_list.append(parent["id"])
+            # Reversed so that the first parent (by label, if ordered) is walked first
+            stack.extend(path + [parent] for parent in reversed(parents))
 
-        # Recursively add the parent structure
-        parent_structure = build_parent_hierarchy(
-            node=parent_structure,
-            parent_uri=main_parent["id"],
-            node_list=node_list,
-            graph=graph,
-            dep=dep,
-            ex_parents=ex_parents,
-            parent_flag=parent_flag,
-            order=order,
-        )
+        result["paths"] = root_paths
+        result["truncated"] = truncated
+
+    return result
+
+
+def is_descendant_batch(
+    pairs: list[list[str]], graph, dep: bool = False
+) -> tuple[list, dict[str, str]]:
+    """
+    Checks for many pairs of nodes (X, Y) if X is a (direct or indirect) subclass of Y.
+
+    The checks use the interval labelling of the hierarchy index, so each one takes constant time
+    when Y is reached through first parents, and only looks at extra parents otherwise.
+
+    Args:
+        pairs (list[list[str]]): The pairs of URIs to check, each as [X, Y].
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to go through deprecated parents (default: False).
+
+    Returns:
+        tuple: A list with the result of each pair (None if one of its URIs does not exist), and a
+               dictionary mapping each URI that does not exist to its error message.
+    """
+    index = get_graph_index(graph)
+    results = []
+    errors = {}
+
+    for uri, ancestor in pairs:
+        missing = [node for node in (uri, ancestor) if not index.exists(node)]
+        for node in missing:
+            errors[node] = f"URI '{node}' does not exist within the database"
+
+        if missing:
+            results.append(None)
+        else:
+            results.append(index.is_descendant(uri, ancestor, dep=dep))
+
+    return results, errors
+
+
+def walk_up(index, uri: str, dep: bool = False) -> dict[str, str]:
+    """
+    Walks breadth-first from a node up to all its ancestors over the hierarchy index.
+
+    Returns:
+        dict: Maps each node reached (including the start node) to the child it was first reached
+              from (None for the start node), giving a shortest path from each ancestor down to the node.
+    """
+    reached_from = {uri: None}
+    queue = deque([uri])
+    while queue:
+        node = queue.popleft()
+        for parent in index.get_parents(node, dep=dep):
+            if parent not in reached_from:
+                reached_from[parent] = node
+                queue.append(parent)
+    return reached_from
+
+
+def get_lowest_common_ancestors(
+    uri_a: str, uri_b: str, graph, dep: bool = False
+) -> dict[str, any]:
+    """
+    Retrieves the lowest common ancestors of two nodes, and the shortest paths from both nodes up to them.
+
+    The common ancestors (or the nodes themselves, if one descends from the other) are taken from
+    deepest to shallowest, and one is kept as lowest if none of the lowest ones already kept descends
+    from it. A multi-parent hierarchy can have several lowest common ancestors.
+
+    Args:
+        uri_a (str): The URI of the first node.
+        uri_b (str): The URI of the second node.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to go through deprecated nodes (default: False).
+
+    Raises:
+        ValueError: If one of the nodes does not exist in the graph.
+
+    Returns:
+        dict: A dictionary containing:
+            - lca (list[str]): The URIs of the lowest common ancestors (empty if the nodes are unrelated).
+            - nodes (list[dict]): The nodes of the connecting subgraph ('id', 'label' and 'dep' if deprecated).
+            - edges (list[dict]): The parent-child links ('source' is the parent URI, 'target' the child URI).
+    """
+    index = get_graph_index(graph)
+
+    for uri in (uri_a, uri_b):
+        if not index.exists(uri):
+            raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    reached_from_a = walk_up(index, uri_a, dep=dep)
+    reached_from_b = walk_up(index, uri_b, dep=dep)
+
+    common = reached_from_a.keys() & reached_from_b.keys()
+    lowest = []
+    for node in sorted(common, key=lambda x: (-index.depth(x, dep=dep), x)):
+        if not any(index.is_descendant(other, node, dep=dep) for other in lowest):
+            lowest.append(node)
+
+    # Connect both nodes to each lowest common ancestor through their shortest paths
+    node_ids = {uri_a: None, uri_b: None}
+    edges = {}
+    for ancestor in lowest:
+        for reached_from in (reached_from_a, reached_from_b):
+            node = ancestor
+            while reached_from[node] is not None:
+                child = reached_from[node]
+                node_ids[node] = None
+                edges[(node, child)] = None
+                node = child
+
+    return {
+        "lca": lowest,
+        "nodes": [index.basic_info(node) for node in node_ids],
+        "edges": [{"source": parent, "target": child} for parent, child in edges],
+    }
 
-    return parent_structure
+
+def get_hierarchy_path(
+    uri_a: str, uri_b: str, graph, dep: bool = False
+) -> dict[str, any]:
+    """
+    Retrieves the shortest path between two nodes through the hierarchy, going up from the first
+    node to a common ancestor and down to the second node.
+
+    Both nodes are walked up at the same time (a bidirectional breadth-first search over the
+    hierarchy index), always expanding the smaller frontier by a whole level, and the walk stops
+    at the first level where the two searches meet.
+
+    Args:
+        uri_a (str): The URI of the first node.
+        uri_b (str): The URI of the second node.
+        graph (rdflib.Graph): The RDFLib graph to query.
+        dep (bool, optional): Whether to go through deprecated nodes (default: False).
+
+    Raises:
+        ValueError: If one of the nodes does not exist in the graph.
+
+    Returns:
+        dict: A dictionary containing:
+            - path (list[str]): The URIs of the path, from the first to the second node (empty if unrelated).
+            - top (str): The URI of the common ancestor at the top of the path (None if unrelated).
+            - nodes (list[dict]): The nodes of the path ('id', 'label' and 'dep' if deprecated).
+            - edges (list[dict]): The parent-child links ('source' is the parent URI, 'target' the child URI).
+    """
+    index = get_graph_index(graph)
+
+    for uri in (uri_a, uri_b):
+        if not index.exists(uri):
+            raise ValueError(f"URI '{uri}' does not exist within the database")
+
+    # The search from the first node is 0, the one from the second node is 1
+    reached_from = [{uri_a: None}, {uri_b: None}]
+    distances = [{uri_a: 0}, {uri_b: 0}]
+    frontiers = [[uri_a], [uri_b]]
+
+    # Expand a whole level of the smaller frontier until the searches meet
+    while not distances[0].keys() & distances[1].keys():
+        open_searches = [i for i in (0, 1) if frontiers[i]]
+        if not open_searches:
+            return {"path": [], "top": None, "nodes": [], "edges": []}
+
+        i = min(open_searches, key=lambda x: len(frontiers[x]))
+        next_frontier = []
+        for node in frontiers[i]:
+            for parent in index.get_parents(node, dep=dep):
+                if parent not in reached_from[i]:
+                    reached_from[i][parent] = node
+                    distances[i][parent] = distances[i][node] + 1
+                    next_frontier.append(parent)
+        frontiers[i] = next_frontier
+
+    top = min(
+        distances[0].keys() & distances[1].keys(),
+        key=lambda x: (distances[0][x] + distances[1][x], x),
+    )
+
+    # Follow each search back down from the top to its start node
+    up_path, down_path = [top], [top]
+    while reached_from[0][up_path[-1]] is not None:
+        up_path.append(reached_from[0][up_path[-1]])
+    while reached_from[1][down_path[-1]] is not None:
+        down_path.append(reached_from[1][down_path[-1]])
+    path = up_path[::-1] + down_path[1:]
+
+    # Parent-child links in the order of the path
+    links = list(zip(up_path, up_path[1:]))[::-1] + list(zip(down_path, down_path[1:]))
+    edges = [{"source": parent, "target": child} for parent, child in links]
+
+    return {
+        "path": path,
+        "top": top,
+        "nodes": [index.basic_info(node) for node in path],
+        "edges": edges,
+    }
+
+
+def split_uri_pair(node_uris: str) -> tuple[str, str]:
+    """
+    Splits the path of an endpoint taking two node URIs (e.g. "http://a/A/http://b/B") into both URIs,
+    at the first slash followed by the scheme of the second URI.
+
+    Raises:
+        ValueError: If the path does not contain two URIs.
+    """
+    match = re.match(r"^(.+?)/([A-Za-z][A-Za-z0-9+.-]*://.+)$", node_uris)
+    if not match:
+        raise ValueError("Two node URIs must be provided")
+    return match.group(1), match.group(2)
 
 
 #  Convert a string to a boolean and accepts common representations of true/false.
@@ -756,3 +1609,31 @@ def str_to_bool(value: str) -> bool:
     if isinstance(value, str):
         return value.lower() in ["true", "1", "t", "y", "yes"]
     return bool(value)
+
+
+def parse_fields(value) -> set:
+    """
+    Parses the sparse fieldset of a request: the fields to include in each node of the response.
+
+    Args:
+        value (str or list[str] or None): The comma separated field names (or a list of them).
+
+    Returns:
+        set: The requested field names, always including 'id', or None if no fieldset was given (all fields).
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+
+    fields = {str(field).strip() for field in value if str(field).strip()}
+    if not fields:
+        return None
+    return fields | {"id"}
+
+
+def wants(fields: set, name: str) -> bool:
+    """
+    Checks if a field is part of a sparse fieldset (see `parse_fields`), None meaning all fields.
+    """
+    return fields is None or name in fields
@@ -0,0 +1,155 @@
+import json
+import threading
+import weakref
+from flask import current_app
+from app.index import get_graph_index
+
+# Fragments of the indexes in use (entries are dropped with their index)
+_fragments = weakref.WeakKeyDictionary()
+_fragments_lock = threading.Lock()
+
+
+def encode(value) -> str:
+    """
+    Encodes a value as compact JSON, without escaping non-ASCII characters (like orjson).
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class NodeFragments:
+    """
+    Pre-encoded JSON fragments of the basic info ('id', 'label' and 'dep') of every node of a
+    graph, so that responses listing many nodes are written by concatenating strings instead of
+    building a dict per node and encoding the same URIs and labels again for every request.
+
+    The keys of every object are written in sorted order, like the JSON provider does. The basic
+    info of a node is split around the other keys of its object: the 'dep' fragment comes after the
+    keys sorting before "dep", and the 'id'/'label' fragment after those sorting before "id".
+
+    Args:
+        index (GraphIndex): The index of the graph, holding the labels and deprecation dates.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.ids = {}  # URI -> encoded URI
+        self._deps = {}  # URI -> '"dep":...' fragment (deprecated nodes only)
+        self._id_labels = {}  # URI -> '"id":...,"label":...' fragment
+
+        for uri in index.subjects.union(index.labels):
+            self._add(uri)
+
+    def _add(self, uri: str):
+        encoded_uri = encode(uri)
+        self.ids[uri] = encoded_uri
+        self._id_labels[uri] = (
+            f'"id":{encoded_uri},"label":{encode(self.index.labels.get(uri))}'
+        )
+        if uri in self.index.deps:
+            self._deps[uri] = f'"dep":{encode(self.index.deps[uri])}'
+
+    def id(self, uri: str) -> str:
+        """
+        Retrieves the encoded URI of a node.
+        """
+        encoded_uri = self.ids.get(uri)
+        return encoded_uri if encoded_uri is not None else encode(uri)
+
+    def reference(self, uri: str, expand_labels: bool = False) -> str:
+        """
+        Writes the JSON object referencing a node: its 'id', and its 'label' if expanded.
+        """
+        if not expand_labels:
+            return '{"id":' + self.id(uri) + "}"
+        if uri not in self._id_labels:
+            self._add(uri)
+        return "{" + self._id_labels[uri] + "}"
+
+    def node(self, uri: str, fields: list = (), fieldset: set = None) -> str:
+        """
+        Writes the JSON object of a node: its basic info along with the given fields.
+
+        Args:
+            uri (str): The URI of the node.
+            fields (list[tuple[str, str]], optional): Other (key, encoded value) pairs of the object,
+                                                      sorted by key (default: none).
+            fieldset (set, optional): The fields of the basic info to include besides 'id' (see
+                                      `parse_fields`), None for all fields (default: None).
+
+        Returns:
+            str: The JSON object.
+        """
+        if uri not in self._id_labels:
+            self._add(uri)  # Not a subject of the graph (e.g. a parent without triples)
+
+        if fieldset is None or "label" in fieldset:
+            basic = self._id_labels[uri]
+        else:
+            basic = '"id":' + self.ids[uri]
+        dep = self._deps.get(uri) if fieldset is None or "dep" in fieldset else None
+
+        parts = []
+        basic_added = dep_added = False
+        for key, value in fields:
+            if not dep_added and key > "dep":
+                if dep:
+                    parts.append(dep)
+                dep_added = True
+            if not basic_added and key > "id":
+                parts.append(basic)
+                basic_added = True
+            parts.append(f'"{key}":{value}')
+
+        if not dep_added and dep:
+            parts.append(dep)
+        if not basic_added:
+            parts.append(basic)
+
+        return "{" + ",".join(parts) + "}"
+
+
+def get_node_fragments(graph) -> NodeFragments:
+    """
+    Retrieves the fragments of the nodes of a graph, building them on first use for the current
+    generation of its index.
+
+    Args:
+        graph (rdflib.Graph): The RDFLib graph.
+
+    Returns:
+        NodeFragments: The fragments of the nodes.
+    """
+    index = get_graph_index(graph)
+    fragments = _fragments.get(index)
+    if fragments is not None:
+        return fragments
+
+    with _fragments_lock:
+        fragments = _fragments.get(index)
+        if fragments is None:
+            fragments = _fragments[index] = NodeFragments(index)
+        return fragments
+
+
+def fragments_enabled() -> bool:
+    """
+    Checks if the responses can be written from fragments: they must be enabled by the
+    `JSON_FRAGMENTS` configuration, and the responses must be compact (not indented in debug mode).
+    """
+    provider = current_app.json
+    compact = provider.compact or (provider.compact is None and not current_app.debug)
+    return bool(current_app.config.get("JSON_FRAGMENTS")) and compact
+
+
+def fragment_response(fields: list):
+    """
+    Creates a JSON response from an object written as fragments.
+
+    Args:
+        fields (list[tuple[str, str]]): The (key, encoded value) pairs of the object, sorted by key.
+
+    Returns:
+        flask.Response: The response.
+    """
+    body = "{" + ",".join(f'"{key}":{value}' for key, value in fields) + "}\n"
+    return current_app.response_class(body, mimetype="application/json")
@@ -0,0 +1,561 @@
+import threading
+import uuid
+import weakref
+from collections import deque
+from rdflib import Literal, RDFS, Namespace
+
+# Define the namespace for meta
+META = Namespace("http://data.15926.org/meta/")
+
+# Indexes of the graphs in use, by id of the graph (entries are dropped with their graph)
+_indexes = {}
+_indexes_lock = threading.Lock()
+_build_lock = threading.Lock()  # Only build one index at a time
+
+
+class GraphIndex:
+    """
+    Load-time index of the `rdfs:subClassOf` hierarchy of an RDFLib graph.
+
+    Holds the adjacency lists (parents and children) of every node, both in the order of the graph
+    and presorted by label, along with its label and deprecation date, so that walks over the
+    hierarchy do not need to query the graph (or sort) per node.
+    All nodes are identified by their URI strings. Self references (a node being its own parent)
+    are left out of the adjacency lists.
+
+    The hierarchy is labelled at load time (see `IntervalLabelling`), so that checking if a node
+    descends from another does not need to walk up its ancestors, and the depth, number of
+    children and number of descendants of every node are computed. The ancestor closure of each
+    node is also kept, as a frozenset sharing the URI strings of the index. It is computed on
+    first use (for a node and all its ancestors at once, under a lock shared by the requests)
+    rather than for the whole graph, as storing the closure of every node takes memory and load
+    time in the order of the number of nodes times their number of ancestors, while most nodes
+    of the RDL are never asked for.
+
+    Args:
+        graph (rdflib.Graph): The RDFLib graph to index. It must not be modified afterwards.
+        generation (str, optional): Identifier of the content of the graph, e.g. the content hash of
+                                    the loaded database. A random one is used if not given.
+    """
+
+    def __init__(self, graph, generation: str = None):
+        # Identifier of the graph content, changing whenever another database is loaded
+        self.generation = generation or uuid.uuid4().hex
+        self.subjects = set()  # URIs of all subjects in the graph
+        self.labels = {}  # URI -> rdfs:label
+        self.deps = {}  # URI -> meta:valDeprecationDate
+        self.parents = {}  # URI -> list of parent URIs
+        self.children = {}  # URI -> list of child URIs
+        # dep -> URI -> frozenset of ancestor URIs (filled on first use, under the lock)
+        self._ancestors = {False: {}, True: {}}
+        # dep -> URI -> tuple of ancestor URIs ordered by label (filled on first use, under the lock)
+        self._ordered_ancestors = {False: {}, True: {}}
+        self._ancestors_lock = threading.Lock()
+        # Field ('ID' or 'LABEL') -> lowercase search choice -> URI (of the last node with the choice)
+        self._search_choices = {"ID": {}, "LABEL": {}}
+
+        for subj in graph.subjects(unique=True):
+            self.subjects.add(str(subj))
+            self._search_choices["ID"][str(subj).lower()] = str(subj)
+
+        for subj, label in graph.subject_objects(RDFS.label):
+            if isinstance(label, Literal):
+                self.labels[str(subj)] = str(label)
+                self._search_choices["LABEL"][str(label).lower()] = str(subj)
+
+        # Field -> the search choices as a list, to be scored by position
+        self._search_choice_lists = {
+            field: list(choices) for field, choices in self._search_choices.items()
+        }
+
+        for subj, deprecation_date in graph.subject_objects(META.valDeprecationDate):
+            if isinstance(deprecation_date, Literal):
+                self.deps[str(subj)] = str(deprecation_date)
+
+        for child, parent in graph.subject_objects(RDFS.subClassOf):
+            child, parent = str(child), str(parent)
+            if child == parent:
+                continue
+            parents = self.parents.setdefault(child, [])
+            if parent not in parents:
+                parents.append(parent)
+                self.children.setdefault(parent, []).append(child)
+
+        # Keep the adjacency lists in insertion order next to the lists presorted by label, and
+        # split off the lists without deprecated nodes (sharing a list whenever it is identical)
+        self._children_lists = {}  # (dep, order) -> URI -> list of child URIs
+        self._parents_lists = {}  # (dep, order) -> URI -> list of parent URIs
+        for adjacency, lists in (
+            (self.children, self._children_lists),
+            (self.parents, self._parents_lists),
+        ):
+            for key in ((False, False), (False, True), (True, False), (True, True)):
+                lists[key] = {}
+            for uri, inserted in adjacency.items():
+                ordered = sorted(inserted, key=lambda x: self.labels.get(x) or "")
+                if ordered == inserted:
+                    ordered = inserted
+                for order, neighbours in ((False, inserted), (True, ordered)):
+                    visible_neighbours = [x for x in neighbours if x not in self.deps]
+                    if len(visible_neighbours) == len(neighbours):
+                        visible_neighbours = neighbours
+                    lists[True, order][uri] = neighbours
+                    lists[False, order][uri] = visible_neighbours
+                adjacency[uri] = ordered
+
+        # dep -> interval labelling of the hierarchy
+        self._labellings = {dep: IntervalLabelling(self, dep) for dep in (False, True)}
+
+        # dep -> URI -> depth (length of the longest path from a root) and number of descendants
+        self._depths = {}
+        self._descendant_counts = {}
+        for dep in (False, True):
+            self._depths[dep] = self._walk_down(dep)
+            self._descendant_counts[dep] = self._count_descendants(dep)
+
+    def exists(self, uri: str) -> bool:
+        """
+        Checks if a node exists as a subject in the graph.
+        """
+        return uri in self.subjects
+
+    def is_deprecated(self, uri: str) -> bool:
+        """
+        Checks if a node has a deprecation date.
+        """
+        return uri in self.deps
+
+    def search_choices(self, field: str) -> tuple[list[str], dict[str, str]]:
+        """
+        Retrieves the lowercase strings that searches by 'ID' (URIs of the subjects) or by 'LABEL'
+        (every rdfs:label) are matched against, and the URI of each of them.
+        The list and the dictionary are shared with the index and must not be modified.
+        """
+        return self._search_choice_lists[field], self._search_choices[field]
+
+    def get_children(
+        self, uri: str, dep: bool = False, order: bool = True
+    ) -> list[str]:
+        """
+        Retrieves the child URIs of a node, ordered by label if `order` is True (in the order of the
+        graph otherwise), excluding deprecated children unless `dep` is True.
+        The list is shared with the index and must not be modified.
+        """
+        return self._children_lists[dep, order].get(uri, [])
+
+    def get_parents(self, uri: str, dep: bool = False, order: bool = True) -> list[str]:
+        """
+        Retrieves the parent URIs of a node, ordered by label if `order` is True (in the order of the
+        graph otherwise), excluding deprecated parents unless `dep` is True.
+        The list is shared with the index and must not be modified.
+        """
+        return self._parents_lists[dep, order].get(uri, [])
+
+    def get_children_page(
+        self,
+        uri: str,
+        dep: bool = False,
+        start: int = 0,
+        limit: int = 100,
+        order: bool = True,
+    ) -> tuple[list[str], int]:
+        """
+        Retrieves up to `limit` child URIs of a node, starting at position `start` of its stored
+        children (see `get_children`), excluding deprecated children unless `dep` is True.
+
+        Returns:
+            tuple: The child URIs, and the position to start the next page at (None if there are no more children).
+        """
+        children = self.get_children(uri, dep=dep, order=order)
+        end = start + limit
+        return children[start:end], end if end < len(children) else None
+
+    def has_children(self, uri: str, dep: bool = False) -> bool:
+        """
+        Checks if a node has any children, considering the deprecation status.
+        """
+        return bool(self.get_children(uri, dep=dep))
+
+    def has_parents(self, uri: str, dep: bool = False) -> bool:
+        """
+        Checks if a node has any parents, considering the deprecation status.
+        """
+        return bool(self.get_parents(uri, dep=dep))
+
+    def _linked_children(self, uri: str, dep: bool) -> list[str]:
+        # Without deprecated nodes, the links from a deprecated parent are ignored
+        if not dep and uri in self.deps:
+            return []
+        return self.children.get(uri, [])
+
+    def _walk_down(self, dep: bool) -> dict[str, int]:
+        # Walk down from the roots, reaching each node once all its parents are done, to get the
+        # depth of each node
+        pending_parents = {}
+        queue = deque()
+        for node in self._labellings[dep].intervals:
+            pending_parents[node] = len(self.get_parents(node, dep=dep))
+            if not pending_parents[node]:
+                queue.append(node)
+
+        depths = dict.fromkeys(queue, 0)
+        while queue:
+            node = queue.popleft()
+            for child in self._linked_children(node, dep):
+                depths[child] = max(depths.get(child, 0), depths[node] + 1)
+                pending_parents[child] -= 1
+                if not pending_parents[child]:
+                    queue.append(child)
+
+        # Nodes in (or below) a subclass cycle are never reached, so they are placed below their
+        # parents with a depth in the order of the walk of the interval labelling
+        intervals = self._labellings[dep].intervals
+        left = [node for node, pending in pending_parents.items() if pending]
+        for node in sorted(left, key=intervals.get):
+            depths[node] = 1 + max(
+                (depths[p] for p in self.get_parents(node, dep=dep) if p in depths),
+                default=-1,
+            )
+
+        return depths
+
+    def _count_descendants(self, dep: bool) -> dict[str, int]:
+        # The nodes listed below a node (through `get_children`) are a union of subtrees of the
+        # spanning tree of the interval labelling, so they are kept as the few merged ranges of
+        # pre/post-order numbers covering them, and counted from prefix sums over those numbers.
+        # Each node only keeps ranges when it reaches beyond its own subtree (through extra parent
+        # links), so the cost stays linear in the size of the hierarchy for tree-like hierarchies.
+        # The components of subclass cycles are closed as a whole, after all the nodes below them
+        # (iterative Tarjan walk over the children), and a node is not its own descendant.
+        intervals = self._labellings[dep].intervals
+
+        # Number of counted nodes numbered before each pre/post-order number
+        counted = [0] * (2 * len(intervals) + 1)
+        for node, (pre, _) in intervals.items():
+            if dep or node not in self.deps:
+                counted[pre + 1] = 1
+        for number in range(1, len(counted)):
+            counted[number] += counted[number - 1]
+
+        reach = (
+            {}
+        )  # URI -> merged ranges of the nodes below (only if beyond its own subtree)
+        counts = {}
+        visit_order = {}
+        low_link = {}
+        cycle_stack = []
+        on_stack = set()
+
+        for start in intervals:
+            if start in visit_order:
+                continue
+
+            visit_order[start] = low_link[start] = len(visit_order)
+            cycle_stack.append(start)
+            on_stack.add(start)
+            stack = [(start, iter(self.get_children(start, dep=dep)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in visit_order:
+                        visit_order[child] = low_link[child] = len(visit_order)
+                        cycle_stack.append(child)
+                        on_stack.add(child)
+                        stack.append((child, iter(self.get_children(child, dep=dep))))
+                        break
+                    if child in on_stack:
+                        low_link[node] = min(low_link[node], visit_order[child])
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        low_link[parent] = min(low_link[parent], low_link[node])
+                    if low_link[node] != visit_order[node]:
+                        continue
+
+                    component = []
+                    while not component or component[-1] != node:
+                        component.append(cycle_stack.pop())
+                        on_stack.discard(component[-1])
+
+                    # Ranges of the children outside of the component, and of the component itself
+                    ranges = []
+                    for member in component:
+                        for child in self.get_children(member, dep=dep):
+                            if child not in on_stack and child not in component:
+                                ranges.extend(reach.get(child) or (intervals[child],))
+                    if len(component) == 1:
+                        pre, post = intervals[node]
+                        ranges = [r for r in ranges if r[0] < pre or post < r[1]]
+                    ranges.extend(intervals[member] for member in component)
+
+                    merged = _merge_ranges(ranges)
+                    if len(component) > 1 or merged != [intervals[node]]:
+                        for member in component:
+                            reach[member] = merged
+
+                    total = sum(
+                        counted[end + 1] - counted[begin] for begin, end in merged
+                    )
+                    for member in component:
+                        pre = intervals[member][0]
+                        counts[member] = total - (counted[pre + 1] - counted[pre])
+
+        return counts
+
+    def depth(self, uri: str, dep: bool = False) -> int:
+        """
+        Retrieves the depth of a node: the length of its longest path to a root (0 for a root),
+        so that a node is always deeper than its ancestors outside of subclass cycles.
+        """
+        return self._depths[dep].get(uri, 0)
+
+    def subtree_stats(self, uri: str, dep: bool = False) -> dict[str, int]:
+        """
+        Retrieves the precomputed 'depth', 'child_count' and 'descendant_count' (distinct nodes
+        below, each counted once even if reached through several parents) of a node. Both counts
+        follow `get_children`, so a deprecated node counts the nodes listed below it.
+        """
+        return {
+            "depth": self._depths[dep].get(uri, 0),
+            "child_count": len(self.get_children(uri, dep=dep)),
+            "descendant_count": self._descendant_counts[dep].get(uri, 0),
+        }
+
+    def ancestors(self, uri: str, dep: bool = False) -> frozenset[str]:
+        """
+        Retrieves the URIs of all ancestors of a node (its transitive parents), only going through
+        non-deprecated parents unless `dep` is True. A node is not its own ancestor, even in a cycle.
+        """
+        closures = self._ancestors[dep]
+        closure = closures.get(uri)
+        if closure is not None:
+            return closure
+
+        with self._ancestors_lock:
+            # Another request may have computed the closure while waiting for the lock
+            if uri not in closures:
+                self._compute_ancestors(uri, closures, dep)
+            return closures[uri]
+
+    def ordered_ancestors(self, uri: str, dep: bool = False) -> tuple[str, ...]:
+        """
+        Same as `ancestors`, but ordered by label. The order is computed on first use and kept.
+        """
+        ordered = self._ordered_ancestors[dep].get(uri)
+        if ordered is not None:
+            return ordered
+
+        closure = self.ancestors(uri, dep=dep)
+        with self._ancestors_lock:
+            ordered = self._ordered_ancestors[dep].get(uri)
+            if ordered is None:
+                ordered = tuple(sorted(closure, key=lambda x: self.labels.get(x) or ""))
+                self._ordered_ancestors[dep][uri] = ordered
+            return ordered
+
+    def _compute_ancestors(self, uri: str, closures: dict, dep: bool):
+        # Iterative Tarjan walk over the parents: the nodes of a subclass cycle share their ancestors,
+        # and each cycle (or single node) is closed once all the parents above it are
+        visit_order = {uri: 0}
+        low_link = {uri: 0}
+        cycle_stack = [uri]
+        on_stack = {uri}
+        stack = [(uri, iter(self.get_parents(uri, dep)))]
+        while stack:
+            node, parents = stack[-1]
+            for parent in parents:
+                if parent in closures:
+                    continue
+                if parent not in visit_order:
+                    visit_order[parent] = low_link[parent] = len(visit_order)
+                    cycle_stack.append(parent)
+                    on_stack.add(parent)
+                    stack.append((parent, iter(self.get_parents(parent, dep))))
+                    break
+                if parent in on_stack:
+                    low_link[node] = min(low_link[node], visit_order[parent])
+            else:
+                stack.pop()
+                if stack:
+                    child = stack[-1][0]
+                    low_link[child] = min(low_link[child], low_link[node])
+                if low_link[node] != visit_order[node]:
+                    continue
+
+                component = []
+                while not component or component[-1] != node:
+                    component.append(cycle_stack.pop())
+                    on_stack.discard(component[-1])
+
+                closure = set(component) if len(component) > 1 else set()
+                for member in component:
+                    for parent in self.get_parents(member, dep):
+                        closure.add(parent)
+                        closure.update(closures.get(parent, ()))
+                for member in component:
+                    closures[member] = frozenset(closure - {member})
+
+    def is_descendant(self, uri: str, ancestor: str, dep: bool = False) -> bool:
+        """
+        Checks if a node is a (direct or indirect) subclass of another node, only going through
+        non-deprecated parents unless `dep` is True. A node is not its own descendant.
+        """
+        return self._labellings[dep].is_descendant(uri, ancestor)
+
+    def basic_info(self, uri: str, fields: set = None) -> dict[str, any]:
+        """
+        Retrieves the node's 'id', 'label' and 'dep' (only if deprecated), like `get_basic_node_info`.
+        If `fields` is given, 'label' and 'dep' are only included if they are part of it.
+        """
+        node_info = {"id": uri}
+        if fields is None or "label" in fields:
+            node_info["label"] = self.labels.get(uri)
+        if uri in self.deps and (fields is None or "dep" in fields):
+            node_info["dep"] = self.deps[uri]
+        return node_info
+
+
+def _merge_ranges(ranges: list) -> list[tuple[int, int]]:
+    # Merges overlapping and adjacent (start, end) ranges of numbers
+    ranges = sorted(ranges)
+    merged = [list(ranges[0])]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+class IntervalLabelling:
+    """
+    Pre/post-order interval labelling of the hierarchy, answering "is X a descendant of Y" checks.
+
+    A spanning tree of the hierarchy is walked depth-first from the roots, and each node is labelled
+    with the interval between its pre-order and post-order numbers. In the tree, X descends from Y
+    exactly when the interval of Y contains the interval of X, which is checked in constant time.
+    Links to extra parents (not part of the tree) are kept in a small exception index, only looked
+    at when the interval check fails: X then also descends from Y if one of the extra parents of X,
+    or of its tree ancestors, descends from (or is) Y.
+
+    Args:
+        index (GraphIndex): The index holding the adjacency lists of the hierarchy.
+        dep (bool): Whether to go through deprecated parents.
+    """
+
+    def __init__(self, index, dep: bool):
+        self.intervals = {}  # URI -> (pre-order number, post-order number)
+        self.tree_parents = {}  # URI -> parent URI in the spanning tree
+        self.extra_parents = {}  # URI -> parent URIs not in the spanning tree
+
+        nodes = index.subjects.union(index.parents, index.children)
+        roots = [node for node in nodes if not index.get_parents(node, dep=dep)]
+
+        # Walk from the roots first, then from any node left (only reachable through a cycle)
+        counter = 0
+        for start in roots + list(nodes):
+            if start in self.intervals:
+                continue
+
+            self.intervals[start] = counter
+            counter += 1
+            stack = [(start, iter(index._linked_children(start, dep)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in self.intervals:
+                        self.tree_parents[child] = node
+                        self.intervals[child] = counter
+                        counter += 1
+                        stack.append((child, iter(index._linked_children(child, dep))))
+                        break
+                else:
+                    stack.pop()
+                    self.intervals[node] = (self.intervals[node], counter)
+                    counter += 1
+
+        for node in nodes:
+            extra_parents = [
+                parent
+                for parent in index.get_parents(node, dep=dep)
+                if parent != self.tree_parents.get(node)
+            ]
+            if extra_parents:
+                self.extra_parents[node] = extra_parents
+
+    def is_descendant(self, uri: str, ancestor: str) -> bool:
+        if uri == ancestor or uri not in self.intervals:
+            return False
+        if ancestor not in self.intervals:
+            return False
+
+        ancestor_pre, ancestor_post = self.intervals[ancestor]
+
+        def in_tree_of_ancestor(node):
+            pre, post = self.intervals[node]
+            return ancestor_pre <= pre and post <= ancestor_post
+
+        if in_tree_of_ancestor(uri):
+            return True
+
+        # Go through the extra parents of the node and of its tree ancestors
+        visited = set()
+        stack = [uri]
+        while stack:
+            node = stack.pop()
+            while node is not None and node not in visited:
+                visited.add(node)
+                for parent in self.extra_parents.get(node, ()):
+                    if in_tree_of_ancestor(parent):
+                        return True
+                    stack.append(parent)
+                node = self.tree_parents.get(node)
+
+        return False
+
+
+def build_graph_index(graph, generation: str = None) -> GraphIndex:
+    """
+    Builds the index of a graph and keeps it for later calls of `get_graph_index`.
+    Called once the graph is loaded, so that no request has to pay for building the index.
+
+    Args:
+        graph (rdflib.Graph): The RDFLib graph to index.
+        generation (str, optional): Identifier of the content of the graph (default: random).
+
+    Returns:
+        GraphIndex: The index of the graph.
+    """
+    index = GraphIndex(graph, generation=generation)
+
+    with _indexes_lock:
+        key = id(graph)
+        _indexes[key] = (weakref.ref(graph), index)
+        weakref.finalize(graph, _indexes.pop, key, None)
+
+    return index
+
+
+def get_graph_index(graph) -> GraphIndex:
+    """
+    Retrieves the index of a graph, building it on first use (e.g. for graphs not loaded through
+    `load_selected_db`, such as in tests).
+
+    Args:
+        graph (rdflib.Graph): The RDFLib graph.
+
+    Returns:
+        GraphIndex: The index of the graph.
+    """
+    entry = _indexes.get(id(graph))
+    if entry and entry[0]() is graph:
+        return entry[1]
+
+    with _build_lock:
+        # Another request may have built the index while waiting for the lock
+        entry = _indexes.get(id(graph))
+        if entry and entry[0]() is graph:
+            return entry[1]
+
+        return build_graph_index(graph)
@@ -0,0 +1,345 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from app import models
+from app.admission import search_limiter
+from app.caching import response_cache, single_flight
+from app.index import get_graph_index
+
+# Upper bounds of the buckets of the histograms (the last bucket, +Inf, is implicit)
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """
+    Counts the requests served, with histograms of their latency and of their response size,
+    per (method, route, status). Routes are the URL rules (e.g. '/node/info/<path:uri>'), so that
+    the number of series stays bounded whatever the URIs requested.
+
+    Recording a request only bisects the buckets and increments a few counters under a lock, and
+    the buckets are only made cumulative when the metrics are rendered.
+    """
+
+    def __init__(self):
+        # (method, route, status) -> [count, latency sum, size sum, latency buckets, size buckets]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, latency: float, size: int):
+        latency_bucket = bisect_left(LATENCY_BUCKETS, latency)
+        size_bucket = bisect_left(SIZE_BUCKETS, size)
+        key = (method, route, status)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [
+                    0,
+                    0.0,
+                    0,
+                    [0] * (len(LATENCY_BUCKETS) + 1),
+                    [0] * (len(SIZE_BUCKETS) + 1),
+                ]
+            series[0] += 1
+            series[1] += latency
+            series[2] += size
+            series[3][latency_bucket] += 1
+            series[4][size_bucket] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Copies the series, so that they can be rendered without holding the lock.
+        """
+        with self._lock:
+            return {
+                key: [count, latency, size, list(latencies), list(sizes)]
+                for key, (
+                    count,
+                    latency,
+                    size,
+                    latencies,
+                    sizes,
+                ) in self._series.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+request_metrics = RequestMetrics()
+
+
+def start_request_timer():
+    """
+    `before_request` hook recording when the request started.
+    """
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    """
+    `after_request` hook recording the latency and the size of the response. Registered before the
+    other hooks, it runs after them, so the size is the one sent (e.g. compressed).
+    """
+    start = g.get("request_start")
+    if start is None or g.get("cache_warming"):
+        return response
+
+    rule = request.url_rule
+    request_metrics.record(
+        request.method,
+        rule.rule if rule is not None else "<unmatched>",
+        response.status_code,
+        time.perf_counter() - start,
+        response.content_length or 0,
+    )
+    return response
+
+
+def init_metrics(app):
+    """
+    Enables the request metrics of the app (see `record_request`).
+    """
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+        + "}"
+    )
+
+
+def _metric(lines: list, name: str, kind: str, description: str, samples: list):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{labels} {value}")
+
+
+def _histogram_samples(series: dict, index: int, bounds: tuple) -> list:
+    samples = []
+    for (method, route, status), values in sorted(series.items()):
+        count, buckets = values[0], values[index + 3]
+        cumulative = 0
+        for bound, bucket in zip(bounds + ("+Inf",), buckets):
+            cumulative += bucket
+            labels = _labels(method=method, route=route, status=status, le=bound)
+            samples.append(("_bucket", labels, cumulative))
+
+        labels = _labels(method=method, route=route, status=status)
+        samples.append(("_sum", labels, values[index + 1]))
+        samples.append(("_count", labels, count))
+    return samples
+
+
+def _ratio(part: int, total: int) -> float:
+    return part / total if total else 0.0
+
+
+def render_metrics(graph) -> str:
+    """
+    Renders the metrics of the server in the Prometheus text format: the request counters and
+    histograms, the gauges of the loaded graph, and the counters of the response cache, of the
+    request coalescing and of the search admission (with their ratios, for convenience).
+
+    Args:
+        graph (rdflib.Graph): The RDFLib graph served, None if no graph is loaded (its metrics are left out).
+
+    Returns:
+        str: The metrics.
+    """
+    series = request_metrics.snapshot()
+    lines = []
+
+    _metric(
+        lines,
+        "rdl_http_requests_total",
+        "counter",
+        "Requests served, per method, route and status.",
+        [
+            ("", _labels(method=method, route=route, status=status), values[0])
+            for (method, route, status), values in sorted(series.items())
+        ],
+    )
+    _metric(
+        lines,
+        "rdl_http_request_duration_seconds",
+        "histogram",
+        "Time spent handling requests, per method, route and status.",
+        _histogram_samples(series, 0, LATENCY_BUCKETS),
+    )
+    _metric(
+        lines,
+        "rdl_http_response_size_bytes",
+        "histogram",
+        "Size of the response bodies sent, per method, route and status.",
+        _histogram_samples(series, 1, SIZE_BUCKETS),
+    )
+
+    if graph is not None:
+        index = get_graph_index(graph)
+        _metric(
+            lines,
+            "rdl_graph_triples",
+            "gauge",
+            "Triples in the loaded graph.",
+            [("", "", len(graph))],
+        )
+        _metric(
+            lines,
+            "rdl_graph_nodes",
+            "gauge",
+            "Subjects in the loaded graph.",
+            [("", "", len(index.subjects))],
+        )
+        _metric(
+            lines,
+            "rdl_graph_load_duration_seconds",
+            "gauge",
+            "Time spent loading and indexing the database of the loaded graph.",
+            [("", "", models.loaded_db_duration or 0)],
+        )
+        _metric(
+            lines,
+            "rdl_graph_info",
+            "gauge",
+            "Database file and generation of the loaded graph.",
+            [
+                (
+                    "",
+                    _labels(
+                        db_file=models.loaded_db_file or "",
+                        generation=index.generation,
+                    ),
+                    1,
+                )
+            ],
+        )
+
+    lookups = response_cache.hits + response_cache.misses
+    _metric(
+        lines,
+        "rdl_response_cache_hits_total",
+        "counter",
+        "Responses served from the response cache.",
+        [("", "", response_cache.hits)],
+    )
+    _metric(
+        lines,
+        "rdl_response_cache_misses_total",
+        "counter",
+        "Cacheable responses computed.",
+        [("", "", response_cache.misses)],
+    )
+    _metric(
+        lines,
+        "rdl_response_cache_hit_ratio",
+        "gauge",
+        "Share of the cacheable responses served from the response cache.",
+        [("", "", _ratio(response_cache.hits, lookups))],
+    )
+    _metric(
+        lines,
+        "rdl_response_cache_entries",
+        "gauge",
+        "Responses in the response cache.",
+        [("", "", len(response_cache))],
+    )
+    _metric(
+        lines,
+        "rdl_response_cache_bytes",
+        "gauge",
+        "Bytes of the responses in the response cache.",
+        [("", "", response_cache.size)],
+    )
+
+    coalescing = single_flight.stats()
+    requests = coalescing["computations"] + coalescing["coalesced"]
+    _metric(
+        lines,
+        "rdl_coalescing_computations_total",
+        "counter",
+        "Expensive responses computed.",
+        [("", "", coalescing["computations"])],
+    )
+    _metric(
+        lines,
+        "rdl_coalescing_coalesced_total",
+        "counter",
+        "Expensive requests served by an identical concurrent computation.",
+        [("", "", coalescing["coalesced"])],
+    )
+    _metric(
+        lines,
+        "rdl_coalescing_ratio",
+        "gauge",
+        "Share of the expensive requests served by an identical concurrent computation.",
+        [("", "", _ratio(coalescing["coalesced"], requests))],
+    )
+
+    admission = search_limiter.stats()
+    searches = admission["admitted"] + admission["rejected"]
+    _metric(
+        lines,
+        "rdl_search_admitted_total",
+        "counter",
+        "Searches admitted.",
+        [("", "", admission["admitted"])],
+    )
+    _metric(
+        lines,
+        "rdl_search_rejected_total",
+        "counter",
+        "Searches rejected with 429.",
+        [("", "", admission["rejected"])],
+    )
+    _metric(
+        lines,
+        "rdl_search_rejection_ratio",
+        "gauge",
+        "Share of the searches rejected with 429.",
+        [("", "", _ratio(admission["rejected"], searches))],
+    )
+    _metric(
+        lines,
+        "rdl_search_running",
+        "gauge",
+        "Searches running.",
+        [("", "", admission["running"])],
+    )
+    _metric(
+        lines,
+        "rdl_search_queued",
+        "gauge",
+        "Searches waiting for a running one to finish.",
+        [("", "", admission["queued"])],
+    )
+
+    return "\n".join(lines) + "\n"
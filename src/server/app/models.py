@@ -1,9 +1,16 @@
 import json
 import os
+import time
+from rdflib import URIRef
 
 from app.config import Config
+from app.index import build_graph_index
 
 loaded_db_file = None
+loaded_db_hash = (
+    None  # Content hash of the loaded database (recorded in the history by the CLI)
+)
+loaded_db_duration = None  # Seconds spent parsing and indexing the loaded database
 
 
 def load_selected_db(graph):
@@ -19,7 +26,7 @@ def load_selected_db(graph):
     Returns:
         rdflib.Graph: The RDFLib graph object with the Turtle data loaded, or an empty graph if no database is found.
     """
-    global loaded_db_file
+    global loaded_db_file, loaded_db_hash, loaded_db_duration
     try:
         # Check if DB files not yet initialised by CLI
         if (
@@ -42,12 +49,23 @@ def load_selected_db(graph):
                 "ERROR: No current database found in history! Loading an empty graph.\nPlease run the CLI tool and update the database: `python3 cli.py`."
             )
             return graph
-        if loaded_db_file == current_db_file:
+        if current_db_file == loaded_db_file:
             print("Warning: Selected database file already loaded, aborting reload.")
             return graph
 
-        graph.parse(f"{Config.DB_STORAGE_DIR}/{current_db_file}", format="turtle")
+        # Parse the full database, then apply the deltas stored on top of it (if any)
+        start = time.perf_counter()
+        base_db_file, *delta_files = get_db_chain(current_db_file)
+        graph.parse(f"{Config.DB_STORAGE_DIR}/{base_db_file}", format="turtle")
+        for delta_file in delta_files:
+            apply_delta(graph, delta_file)
         loaded_db_file = current_db_file
+        loaded_db_hash = get_db_hash(history_data, current_db_file)
+
+        # Index the hierarchy now, rather than on the first request. The content hash identifies
+        # the generation of the graph (the same in every worker, and across restarts)
+        build_graph_index(graph, generation=loaded_db_hash or loaded_db_file)
+        loaded_db_duration = time.perf_counter() - start
 
         return graph
 
@@ -55,6 +73,114 @@ def load_selected_db(graph):
         raise
 
 
+def get_db_hash(history_data, db_file):
+    """
+    Retrieves the content hash of a database from the history data.
+
+    Returns:
+        str: The content hash, or None if the database has none (e.g. created by an older CLI).
+    """
+    for db_entry in history_data.get("databases", []):
+        if db_entry.get("filename") == db_file:
+            return db_entry.get("hash")
+    return None
+
+
+def is_db_loaded(history_data, db_file):
+    """
+    Checks whether a database is already loaded, either as the same file or as a file with identical content.
+
+    Args:
+        history_data (dict): The content of the history file.
+        db_file (str): The filename of the database.
+
+    Returns:
+        bool: True if the database does not need to be parsed again, otherwise False.
+    """
+    if not db_file:
+        return False
+    if db_file == loaded_db_file:
+        return True
+
+    db_hash = get_db_hash(history_data, db_file)
+    return db_hash is not None and db_hash == loaded_db_hash
+
+
+def keep_loaded_db():
+    """
+    Checks whether the database currently selected in the history file is already loaded. If it is a
+    different file with identical content, it is recorded as the loaded database: the caller must then
+    keep its loaded graph rather than calling `load_selected_db`.
+
+    Returns:
+        bool: True if the selected database does not need to be parsed again, otherwise False.
+    """
+    global loaded_db_file
+    if not os.path.exists(Config.DB_HISTORY_FILE):
+        return False
+
+    with open(Config.DB_HISTORY_FILE, "r") as f:
+        history_data = json.load(f)
+
+    current_db_file = history_data.get("current_db", None)
+    if not is_db_loaded(history_data, current_db_file):
+        return False
+
+    loaded_db_file = current_db_file
+    return True
+
+
+def read_manifest(db_file):
+    """
+    Reads the manifest stored alongside a database file by the CLI (e.g. '2024-10-09-2.delta.json').
+
+    Returns:
+        dict: The manifest, or None if the database has no manifest.
+    """
+    manifest_file = os.path.join(
+        Config.DB_STORAGE_DIR, os.path.splitext(db_file)[0] + ".json"
+    )
+    if not os.path.exists(manifest_file):
+        return None
+
+    with open(manifest_file, "r") as f:
+        return json.load(f)
+
+
+def get_db_chain(db_file):
+    """
+    Resolves the files needed to load a database: a full database followed by the deltas applied on top of it.
+
+    Args:
+        db_file (str): The filename of the database to load.
+
+    Returns:
+        list[str]: The full database filename, followed by the delta filenames in the order they apply.
+    """
+    chain = [db_file]
+    manifest = read_manifest(db_file)
+    while manifest and manifest.get("parent"):
+        chain.append(manifest["parent"])
+        manifest = read_manifest(manifest["parent"])
+
+    return chain[::-1]
+
+
+def apply_delta(graph, delta_file):
+    """
+    Applies a delta database to the graph, replacing all triples of its removed and changed subjects.
+
+    Args:
+        graph (rdflib.Graph): The graph holding the parent database of the delta.
+        delta_file (str): The filename of the delta database.
+    """
+    manifest = read_manifest(delta_file)
+    for subject in manifest["removed"] + list(manifest["hashes"]):
+        graph.remove((URIRef(subject), None, None))
+
+    graph.parse(f"{Config.DB_STORAGE_DIR}/{delta_file}", format="turtle")
+
+
 def print_error(msg):
     """
     Prints a error message with header and footer to make it more distinguishable.
@@ -1,10 +1,22 @@
 # Imports
+import time
 from . import controllers
 from flask import jsonify, request, current_app
 from rdflib import Graph
+from app.admission import admission_controlled, search_limiter
 from app.blueprints import main, ctrl
+from app.caching import (
+    cached,
+    coalesced,
+    conditional,
+    response_cache,
+    single_flight,
+    warm_response_cache,
+)
 from app.config import Config
-from app.models import load_selected_db
+from app.fragments import encode, fragment_response, fragments_enabled
+from app.metrics import CONTENT_TYPE, render_metrics
+from app.models import load_selected_db, keep_loaded_db
 
 
 @main.route("/ping")
@@ -19,10 +31,15 @@ def ping():
 
 
 @main.route("/node/root")
+@conditional
+@cached
 def root():
     """
     Route to fetch the root node information from the graph.
 
+    Query Parameters:
+        fields (str, optional): Comma separated fields to include in each node ('id' is always included). Default is all fields.
+
     Raises:
         ValueError: If the root node does not exist.
         AttributeError: If the graph is not initialized.
@@ -35,7 +52,10 @@ def root():
         if not hasattr(current_app, "graph"):
             raise AttributeError("Graph is not initialised")
 
-        root_node_info = controllers.get_root_node_info(graph=current_app.graph)
+        root_node_info = controllers.get_root_node_info(
+            graph=current_app.graph,
+            fields=controllers.parse_fields(request.args.get("fields")),
+        )
 
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
@@ -52,6 +72,8 @@ def root():
 
 
 @main.route("/node/children/<path:node_uri>", methods=["GET"])
+@conditional
+@cached
 def children(node_uri):
     """
     Fetches the children of a given node in the graph.
@@ -64,6 +86,11 @@ def children(node_uri):
         extra_parents (bool): Whether to include extra parents for each child. Default is True.
         has_children (bool): Whether to include a boolean flag indicating if the child has children. Default is True.
         order (bool, optional): Whether to order the nodes in alphabetical order. Default is True.
+        stats (bool, optional): Whether to include the depth, child count and descendant count of each node. Default is False.
+        limit (int, optional): The number of children per page (max is 1000). Default is all children, unpaginated.
+        cursor (int, optional): The 'next_cursor' of the previous page, when paginated. Default is 0 (first page).
+        expand_labels (bool, optional): Whether to include the label of each extra parent. Default is False.
+        fields (str, optional): Comma separated fields to include in each node ('id' is always included). Default is all fields.
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -72,6 +99,7 @@ def children(node_uri):
 
     Returns:
         JSON: The id of the node, the children of the given node in alphabetical order, along with other requested details.
+              When paginated, also the total number of children and the cursor of the next page (null on the last page).
     """
     # Extract the custom parameters
     include_deprecation = controllers.str_to_bool(
@@ -84,29 +112,157 @@ def children(node_uri):
         request.args.get("has_children", default=True)
     )
     order = controllers.str_to_bool(request.args.get("order", default=True))
+    include_stats = controllers.str_to_bool(request.args.get("stats", default=False))
+    fields = controllers.parse_fields(request.args.get("fields"))
+    expand_labels = controllers.str_to_bool(
+        request.args.get("expand_labels", default=False)
+    )
+
+    # Paginate only if a limit is given
+    paginate = "limit" in request.args
+    if paginate:
+        try:
+            # Ensure the limit is positive and within max limits, and the cursor is not negative
+            abs_limit = max(abs(int(request.args.get("limit"))), 1)
+            limit = min(abs_limit, int(Config.MAX_CHILDREN_PAGE))
+            cursor = abs(int(request.args.get("cursor", 0)))
+        except ValueError:
+            return jsonify({"error": "'limit' and 'cursor' must be integers"}), 400
 
     try:
         # Check if the graph is available
         if not hasattr(current_app, "graph"):
             raise AttributeError("Graph is not initialised")
 
-        children = controllers.get_children(
-            uri=node_uri,
+        if paginate:
+            page = controllers.get_children_page(
+                uri=node_uri,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                ex_parents=include_extra_parents,
+                children_flag=include_has_children,
+                limit=limit,
+                cursor=cursor,
+                order=order,
+                stats=include_stats,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+        elif fragments_enabled():
+            # Write the response from the pre-encoded fragments of the nodes
+            children = controllers.get_children_json(
+                uri=node_uri,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                ex_parents=include_extra_parents,
+                children_flag=include_has_children,
+                order=order,
+                stats=include_stats,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+            return fragment_response([("children", children), ("id", encode(node_uri))])
+        else:
+            children = controllers.get_children(
+                uri=node_uri,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                ex_parents=include_extra_parents,
+                children_flag=include_has_children,
+                order=order,
+                stats=include_stats,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    if paginate:
+        return jsonify({"id": node_uri, **page})
+
+    return jsonify({"id": node_uri, "children": children})
+
+
+@main.route("/node/children/batch", methods=["POST"])
+def children_batch():
+    """
+    Fetches the children of many nodes in the graph in one request.
+
+    JSON Body:
+        uris (list[str]): The URIs of the nodes to fetch children for (at most `MAX_BATCH_URIS`).
+        dep (bool, optional): Whether to include deprecated nodes. Default is False.
+        extra_parents (bool, optional): Whether to include extra parents for each child. Default is True.
+        has_children (bool, optional): Whether to include a boolean flag indicating if the child has children. Default is True.
+        order (bool, optional): Whether to order the nodes in alphabetical order. Default is True.
+        stats (bool, optional): Whether to include the depth, child count and descendant count of each node. Default is False.
+        expand_labels (bool, optional): Whether to include the label of each extra parent. Default is False.
+        fields (list[str] or str, optional): The fields to include in each node ('id' is always included). Default is all fields.
+
+    Raises:
+        AttributeError: If the graph is not initialized.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The children of each node (keyed by URI), and an error message for each URI that does not exist.
+    """
+    body = request.get_json(silent=True) or {}
+    uris = body.get("uris")
+
+    if not isinstance(uris, list) or not all(isinstance(uri, str) for uri in uris):
+        return jsonify({"error": "A list of URIs must be provided in 'uris'"}), 400
+    if len(uris) > int(Config.MAX_BATCH_URIS):
+        return (
+            jsonify(
+                {
+                    "error": f"At most {Config.MAX_BATCH_URIS} URIs can be requested at once"
+                }
+            ),
+            400,
+        )
+
+    # Extract the custom parameters
+    include_deprecation = controllers.str_to_bool(body.get("dep", False))
+    include_extra_parents = controllers.str_to_bool(body.get("extra_parents", True))
+    include_has_children = controllers.str_to_bool(body.get("has_children", True))
+    order = controllers.str_to_bool(body.get("order", True))
+    include_stats = controllers.str_to_bool(body.get("stats", False))
+    expand_labels = controllers.str_to_bool(body.get("expand_labels", False))
+
+    if not isinstance(body.get("fields"), (str, list, type(None))):
+        return (
+            jsonify({"error": "'fields' must be a list or a comma separated string"}),
+            400,
+        )
+    fields = controllers.parse_fields(body.get("fields"))
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        children, errors = controllers.get_children_batch(
+            uris=uris,
             graph=current_app.graph,
             dep=include_deprecation,
             ex_parents=include_extra_parents,
             children_flag=include_has_children,
             order=order,
+            stats=include_stats,
+            fields=fields,
+            expand_labels=expand_labels,
         )
 
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 404
     except AttributeError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": "Internal Error"}), 500
 
-    return jsonify({"id": node_uri, "children": children})
+    return jsonify({"children": children, "errors": errors})
 
 
 @main.route("/node/children/", methods=["GET"])
@@ -125,6 +281,7 @@ def invalid_children():
 
 
 @main.route("/node/parents/<path:node_uri>", methods=["GET"])
+@conditional
 def parents(node_uri):
     """
     Fetches the parents of a given node in the graph, including information about their children and other optional details.
@@ -138,6 +295,8 @@ def parents(node_uri):
         children_ex_parents (bool, optional): Whether to include extra parents for each child in the parent's children. Default is False.
         has_parent (bool, optional): Whether to include a boolean flag indicating if the parent nodes have other parents. Default is True.
         order (bool, optional): Whether to order the parents alphabetically. Default is True.
+        expand_labels (bool, optional): Whether to include the label of each extra parent of the children. Default is False.
+        fields (str, optional): Comma separated fields to include in each node ('id' is always included). Default is all fields.
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -161,12 +320,31 @@ def parents(node_uri):
         request.args.get("has_parent", default=True)
     )
     order = controllers.str_to_bool(request.args.get("order", default=True))
+    fields = controllers.parse_fields(request.args.get("fields"))
+    expand_labels = controllers.str_to_bool(
+        request.args.get("expand_labels", default=False)
+    )
 
     try:
         # Check if the graph is available
         if not hasattr(current_app, "graph"):
             raise AttributeError("Graph is not initialised")
 
+        if fragments_enabled():
+            # Write the response from the pre-encoded fragments of the nodes
+            hierarchy = controllers.get_parents_json(
+                uri=node_uri,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                include_ex_children=include_extra_children,
+                children_ex_parents=include_parents_children_extra_parents,
+                parent_flag=include_has_parent,
+                order=order,
+                fields=fields,
+                expand_labels=expand_labels,
+            )
+            return fragment_response([("id", encode(node_uri)), ("parents", hierarchy)])
+
         hierarchy = controllers.get_parents(
             uri=node_uri,
             graph=current_app.graph,
@@ -175,6 +353,8 @@ def parents(node_uri):
             children_ex_parents=include_parents_children_extra_parents,
             parent_flag=include_has_parent,
             order=order,
+            fields=fields,
+            expand_labels=expand_labels,
         )
 
     except ValueError as e:
@@ -188,6 +368,7 @@ def parents(node_uri):
 
 
 @main.route("/node/info/<path:node_uri>", methods=["GET"])
+@conditional
 def info(node_uri):
     """
     Retrieves detailed information about a given node in the RDFLib graph,
@@ -200,24 +381,39 @@ def info(node_uri):
     Query Parameters:
         all_info (bool): A query parameter that specifies whether to retrieve all
                          available node information (default: True).
+        fields (str, optional): Comma separated fields to include ('id' is always included). Default is all fields.
+        expand_labels (bool, optional): Whether to include the labels of every URI referenced by the node
+                                        (its parents, types, property predicates and objects). Default is False.
 
     Returns:
-        JSON: The information for the given node.
+        JSON: The information for the given node (and the 'labels' of the referenced URIs if requested).
     """
     # Extract extra parameters
     include_all_info = controllers.str_to_bool(
         request.args.get("all_info", default=True)
     )
+    expand_labels = controllers.str_to_bool(
+        request.args.get("expand_labels", default=False)
+    )
 
     try:
         # Check if the graph is available
         if not hasattr(current_app, "graph"):
             raise AttributeError("Graph is not initialised")
 
+        referenced = set() if expand_labels else None
         info = controllers.get_all_node_info(
-            uri=node_uri, graph=current_app.graph, all_info=include_all_info
+            uri=node_uri,
+            graph=current_app.graph,
+            all_info=include_all_info,
+            referenced=referenced,
+            fields=controllers.parse_fields(request.args.get("fields")),
         )
 
+        # Resolve the labels of the referenced URIs from the label index
+        if expand_labels:
+            info["labels"] = controllers.get_labels(referenced, current_app.graph)
+
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
     except AttributeError as e:
@@ -228,6 +424,65 @@ def info(node_uri):
     return jsonify(info)
 
 
+@main.route("/node/info/batch", methods=["POST"])
+def info_batch():
+    """
+    Retrieves detailed information about many nodes in one request, along with the labels
+    of every URI referenced by them (types, parents and properties).
+
+    JSON Body:
+        uris (list[str]): The URIs of the nodes to retrieve information for (at most `MAX_BATCH_URIS`).
+        all_info (bool, optional): Whether to retrieve all available node information (default: True).
+        fields (list[str] or str, optional): The fields to include in each node ('id' is always included). Default is all fields.
+
+    Returns:
+        JSON: The information of each node (keyed by URI), the labels of all referenced URIs,
+              and an error message for each URI that does not exist.
+    """
+    body = request.get_json(silent=True) or {}
+    uris = body.get("uris")
+
+    if not isinstance(uris, list) or not all(isinstance(uri, str) for uri in uris):
+        return jsonify({"error": "A list of URIs must be provided in 'uris'"}), 400
+    if len(uris) > int(Config.MAX_BATCH_URIS):
+        return (
+            jsonify(
+                {
+                    "error": f"At most {Config.MAX_BATCH_URIS} URIs can be requested at once"
+                }
+            ),
+            400,
+        )
+
+    include_all_info = controllers.str_to_bool(body.get("all_info", True))
+
+    if not isinstance(body.get("fields"), (str, list, type(None))):
+        return (
+            jsonify({"error": "'fields' must be a list or a comma separated string"}),
+            400,
+        )
+    fields = controllers.parse_fields(body.get("fields"))
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        nodes, labels, errors = controllers.get_all_node_info_batch(
+            uris=uris,
+            graph=current_app.graph,
+            all_info=include_all_info,
+            fields=fields,
+        )
+
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"nodes": nodes, "labels": labels, "errors": errors})
+
+
 @main.route("/node/info/", methods=["GET"])
 @main.route("/node/info", methods=["GET"])
 def invalid_info():
@@ -245,6 +500,7 @@ def invalid_info():
 
 
 @main.route("/node/selected-info/<path:node_uri>", methods=["GET"])
+@conditional
 def selected_info(node_uri):
     """
     Retrieves selected information about a given node in the RDFLib graph,
@@ -255,6 +511,8 @@ def selected_info(node_uri):
 
     Query Parameters:
         dep (bool): Whether to include deprecated nodes. Default is False.
+        stats (bool, optional): Whether to include the depth, child count and descendant count of the node. Default is False.
+        fields (str, optional): Comma separated fields to include ('id' is always included). Default is all fields.
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -266,6 +524,7 @@ def selected_info(node_uri):
     include_deprecation = controllers.str_to_bool(
         request.args.get("dep", default=False)
     )
+    include_stats = controllers.str_to_bool(request.args.get("stats", default=False))
 
     try:
         # Check if the graph is available
@@ -274,7 +533,11 @@ def selected_info(node_uri):
 
         # Fetch the node information
         node_info = controllers.get_node_info_with_relations(
-            uri=node_uri, graph=current_app.graph, dep=include_deprecation
+            uri=node_uri,
+            graph=current_app.graph,
+            dep=include_deprecation,
+            stats=include_stats,
+            fields=controllers.parse_fields(request.args.get("fields")),
         )
 
     except ValueError as e:
@@ -287,6 +550,62 @@ def selected_info(node_uri):
     return jsonify(node_info)
 
 
+@main.route("/node/selected-info/batch", methods=["POST"])
+def selected_info_batch():
+    """
+    Retrieves selected information (label, deprecation date, has_children and has_parents)
+    about many nodes in one request.
+
+    JSON Body:
+        uris (list[str]): The URIs of the nodes to retrieve information for (at most `MAX_BATCH_URIS`).
+        dep (bool, optional): Whether to include deprecated nodes. Default is False.
+        fields (list[str] or str, optional): The fields to include in each node ('id' is always included). Default is all fields.
+
+    Returns:
+        JSON: The selected information of each node (keyed by URI), the labels of the nodes,
+              and an error message for each URI that does not exist.
+    """
+    body = request.get_json(silent=True) or {}
+    uris = body.get("uris")
+
+    if not isinstance(uris, list) or not all(isinstance(uri, str) for uri in uris):
+        return jsonify({"error": "A list of URIs must be provided in 'uris'"}), 400
+    if len(uris) > int(Config.MAX_BATCH_URIS):
+        return (
+            jsonify(
+                {
+                    "error": f"At most {Config.MAX_BATCH_URIS} URIs can be requested at once"
+                }
+            ),
+            400,
+        )
+
+    include_deprecation = controllers.str_to_bool(body.get("dep", False))
+
+    if not isinstance(body.get("fields"), (str, list, type(None))):
+        return (
+            jsonify({"error": "'fields' must be a list or a comma separated string"}),
+            400,
+        )
+    fields = controllers.parse_fields(body.get("fields"))
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        nodes, labels, errors = controllers.get_node_info_with_relations_batch(
+            uris=uris, graph=current_app.graph, dep=include_deprecation, fields=fields
+        )
+
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"nodes": nodes, "labels": labels, "errors": errors})
+
+
 @main.route("/node/selected-info/", methods=["GET"])
 @main.route("/node/selected-info", methods=["GET"])
 def invalid_selected_info():
@@ -304,6 +623,9 @@ def invalid_selected_info():
 
 
 @main.route("/search/<string:field>/<path:search_key>", methods=["GET"])
+@conditional
+@coalesced
+@admission_controlled(search_limiter)
 def search(field, search_key):
     """
     Searches the graph by either a node ID (URI) or a label based on the dynamic field in the URL.
@@ -316,10 +638,19 @@ def search(field, search_key):
         dep (bool): Whether to include deprecated nodes. Default is False.
         limit (int): Maximum number of results to return. Default is 5, max is 25.
         similarity (int): Minimum similarity score of results to return. Default is 75(%)
+        stats (bool): Whether to include the depth, child count and descendant count of each node. Default is False.
+
+    Only a few searches run at once (see `SEARCH_MAX_CONCURRENT`), the others wait in a short queue or are
+    rejected with 429. A search running longer than `SEARCH_TIME_BUDGET` seconds stops and returns the best
+    results found so far, with 'truncated' set (such responses are not cached).
 
     Returns:
-        JSON: The search results by either node ID (URI) or label.
+        JSON: The search results by either node ID (URI) or label, and whether they are truncated.
     """
+    # Stop scoring once the time budget of the search is spent (counted from the start of the request)
+    time_budget = float(current_app.config["SEARCH_TIME_BUDGET"])
+    deadline = time.monotonic() + time_budget if time_budget > 0 else None
+
     # Convert the 'field' to uppercase to make it case-insensitive
     field = field.upper()
     allowed_fields = ["ID", "LABEL"]
@@ -333,6 +664,7 @@ def search(field, search_key):
     limit = min(abs_limit, int(Config.MAX_SEARCH_LIMIT))
 
     similarity = abs(int(request.args.get("similarity", 75)))
+    include_stats = controllers.str_to_bool(request.args.get("stats", default=False))
 
     try:
         # Check if the graph is available
@@ -342,24 +674,57 @@ def search(field, search_key):
         if field not in allowed_fields:
             return jsonify({"error": "Invalid field. Use 'id' or 'label'."}), 400
 
-        results = controllers.search(
-            search_key=str(search_key),
-            field=field,
-            graph=current_app.graph,
-            dep=include_deprecation,
-            limit=limit,
-            min_similarity=similarity,
-        )
+        if fragments_enabled():
+            # Write the response from the pre-encoded fragments of the nodes
+            results, truncated = controllers.search_json(
+                search_key=str(search_key),
+                field=field,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                limit=limit,
+                min_similarity=similarity,
+                stats=include_stats,
+                deadline=deadline,
+            )
+            response = fragment_response(
+                [
+                    ("results", results),
+                    ("search_key", encode(search_key)),
+                    ("truncated", encode(truncated)),
+                ]
+            )
+
+        else:
+            results, truncated = controllers.search(
+                search_key=str(search_key),
+                field=field,
+                graph=current_app.graph,
+                dep=include_deprecation,
+                limit=limit,
+                min_similarity=similarity,
+                stats=include_stats,
+                deadline=deadline,
+            )
+            response = jsonify(
+                {"search_key": search_key, "results": results, "truncated": truncated}
+            )
 
     except AttributeError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": "Internal Error"}), 500
 
-    return jsonify({"search_key": search_key, "results": results})
+    # Partial results must not be reused
+    if truncated:
+        response.cache_control.no_store = True
+
+    return response
 
 
 @main.route("/graph/local-hierarchy/<path:node_uri>", methods=["GET"])
+@conditional
+@cached
+@coalesced
 def local_hierarchy(node_uri):
     """
     Fetches the local hierarchy for a given node in the RDF graph, including its parents, children, and other optional details.
@@ -374,6 +739,7 @@ def local_hierarchy(node_uri):
         has_parent (bool, optional): Whether to include a boolean flag indicating if each node has parents. Default is True.
         order (bool, optional): Whether to order the nodes alphabetically by label. Default is True.
         incl_children (bool, optional): Whether to include the direct children of the selected node. Default is True.
+        expand_labels (bool, optional): Whether to include the label of each extra parent. Default is False.
 
     Raises:
         ValueError: If the node does not exist in the graph.
@@ -400,6 +766,9 @@ def local_hierarchy(node_uri):
         request.args.get("incl_children", default=True)
     )
     order = controllers.str_to_bool(request.args.get("order", default=True))
+    expand_labels = controllers.str_to_bool(
+        request.args.get("expand_labels", default=False)
+    )
 
     try:
         # Check if the graph is available
@@ -416,6 +785,7 @@ def local_hierarchy(node_uri):
             parent_flag=include_has_parent,
             order=order,
             include_children=include_direct_children,
+            expand_labels=expand_labels,
         )
 
     except ValueError as e:
@@ -428,18 +798,352 @@ def local_hierarchy(node_uri):
     return jsonify({"centre_id": node_uri, "hierarchy": hierarchy})
 
 
+@main.route("/graph/subtree/<path:node_uri>", methods=["GET"])
+@conditional
+@coalesced
+def subtree(node_uri):
+    """
+    Fetches the subtree below a given node, down to a given depth, as a flat node table and an edge list.
+
+    Args:
+        node_uri (str): The URI of the node at the top of the subtree.
+
+    Query Parameters:
+        depth (int, optional): The number of levels to expand below the node. Default is 2.
+        max_nodes (int, optional): The maximum number of nodes to return. Default is 500, max is 5000.
+        dep (bool, optional): Whether to include deprecated nodes. Default is False.
+        order (bool, optional): Whether to expand the children alphabetically by label. Default is True.
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+        AttributeError: If the graph is not initialized in the application context.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The id of the top node, the nodes and edges of the subtree, and whether it was truncated.
+    """
+    # Extract custom parameters
+    include_deprecation = controllers.str_to_bool(
+        request.args.get("dep", default=False)
+    )
+    order = controllers.str_to_bool(request.args.get("order", default=True))
+
+    try:
+        depth = abs(int(request.args.get("depth", 2)))
+        # Ensure the node budget is positive and within max limits
+        abs_max_nodes = max(abs(int(request.args.get("max_nodes", 500))), 1)
+        max_nodes = min(abs_max_nodes, int(Config.MAX_SUBTREE_NODES))
+    except ValueError:
+        return jsonify({"error": "'depth' and 'max_nodes' must be integers"}), 400
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        subtree = controllers.get_subtree(
+            uri=node_uri,
+            graph=current_app.graph,
+            depth=depth,
+            max_nodes=max_nodes,
+            dep=include_deprecation,
+            order=order,
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"root_id": node_uri, **subtree})
+
+
+@main.route("/graph/ancestors/<path:node_uri>", methods=["GET"])
+@conditional
+@coalesced
+def ancestors(node_uri):
+    """
+    Fetches all ancestors of a given node as a node table and an edge list, and optionally the paths from the roots.
+
+    Args:
+        node_uri (str): The URI of the node to fetch the ancestors for.
+
+    Query Parameters:
+        dep (bool, optional): Whether to include deprecated nodes. Default is False.
+        paths (bool, optional): Whether to include all distinct paths from the roots to the node. Default is False.
+        max_paths (int, optional): The maximum number of paths to return. Default is 100, max is 1000.
+        order (bool, optional): Whether to order the nodes and paths alphabetically by label. Default is True.
+
+    Raises:
+        ValueError: If the node does not exist in the graph.
+        AttributeError: If the graph is not initialized in the application context.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The id of the node, its ancestors and the links between them, and the paths if requested.
+    """
+    # Extract custom parameters
+    include_deprecation = controllers.str_to_bool(
+        request.args.get("dep", default=False)
+    )
+    include_paths = controllers.str_to_bool(request.args.get("paths", default=False))
+    order = controllers.str_to_bool(request.args.get("order", default=True))
+
+    try:
+        # Ensure the number of paths is positive and within max limits
+        abs_max_paths = max(abs(int(request.args.get("max_paths", 100))), 1)
+        max_paths = min(abs_max_paths, int(Config.MAX_ROOT_PATHS))
+    except ValueError:
+        return jsonify({"error": "'max_paths' must be an integer"}), 400
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        ancestors = controllers.get_ancestors(
+            uri=node_uri,
+            graph=current_app.graph,
+            dep=include_deprecation,
+            paths=include_paths,
+            max_paths=max_paths,
+            order=order,
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"id": node_uri, **ancestors})
+
+
+@main.route("/graph/is-descendant", methods=["POST"])
+def is_descendant():
+    """
+    Checks for many pairs of nodes (X, Y) in one request if X is a (direct or indirect) subclass of Y.
+
+    JSON Body:
+        pairs (list[list[str]]): The pairs of URIs to check, each as [X, Y] (at most `MAX_BATCH_URIS` pairs).
+        dep (bool, optional): Whether to go through deprecated parents. Default is False.
+
+    Raises:
+        AttributeError: If the graph is not initialized.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The result of each pair (in order, null if a URI does not exist), and an error message for each URI that does not exist.
+    """
+    body = request.get_json(silent=True) or {}
+    pairs = body.get("pairs")
+
+    if not isinstance(pairs, list) or not all(
+        isinstance(pair, list)
+        and len(pair) == 2
+        and all(isinstance(uri, str) for uri in pair)
+        for pair in pairs
+    ):
+        return (
+            jsonify(
+                {"error": "A list of [uri, ancestor] pairs must be provided in 'pairs'"}
+            ),
+            400,
+        )
+    if len(pairs) > int(Config.MAX_BATCH_URIS):
+        return (
+            jsonify(
+                {
+                    "error": f"At most {Config.MAX_BATCH_URIS} pairs can be requested at once"
+                }
+            ),
+            400,
+        )
+
+    # Extract the custom parameters
+    include_deprecation = controllers.str_to_bool(body.get("dep", False))
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        results, errors = controllers.is_descendant_batch(
+            pairs=pairs, graph=current_app.graph, dep=include_deprecation
+        )
+
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"results": results, "errors": errors})
+
+
+@main.route("/graph/lca/<path:node_uris>", methods=["GET"])
+@conditional
+def lowest_common_ancestors(node_uris):
+    """
+    Fetches the lowest common ancestors of two nodes, and the shortest paths from both nodes up to them.
+
+    Args:
+        node_uris (str): The URIs of both nodes, separated by a slash (e.g. "http://a/A/http://b/B").
+
+    Query Parameters:
+        dep (bool, optional): Whether to go through deprecated nodes. Default is False.
+
+    Raises:
+        ValueError: If two URIs are not provided (400) or a node does not exist in the graph (404).
+        AttributeError: If the graph is not initialized in the application context.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The URIs of both nodes, of their lowest common ancestors, and the nodes and links connecting them.
+    """
+    # Extract custom parameters
+    include_deprecation = controllers.str_to_bool(
+        request.args.get("dep", default=False)
+    )
+
+    try:
+        uri_a, uri_b = controllers.split_uri_pair(node_uris)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        result = controllers.get_lowest_common_ancestors(
+            uri_a=uri_a, uri_b=uri_b, graph=current_app.graph, dep=include_deprecation
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"a": uri_a, "b": uri_b, **result})
+
+
+@main.route("/graph/path/<path:node_uris>", methods=["GET"])
+@conditional
+def hierarchy_path(node_uris):
+    """
+    Fetches the shortest path between two nodes, up from the first node to a common ancestor and down to the second.
+
+    Args:
+        node_uris (str): The URIs of both nodes, separated by a slash (e.g. "http://a/A/http://b/B").
+
+    Query Parameters:
+        dep (bool, optional): Whether to go through deprecated nodes. Default is False.
+
+    Raises:
+        ValueError: If two URIs are not provided (400) or a node does not exist in the graph (404).
+        AttributeError: If the graph is not initialized in the application context.
+        Exception: For any other internal error.
+
+    Returns:
+        JSON: The URIs of both nodes, the URIs of the path and its top node, and the nodes and links of the path.
+    """
+    # Extract custom parameters
+    include_deprecation = controllers.str_to_bool(
+        request.args.get("dep", default=False)
+    )
+
+    try:
+        uri_a, uri_b = controllers.split_uri_pair(node_uris)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Check if the graph is available
+        if not hasattr(current_app, "graph"):
+            raise AttributeError("Graph is not initialised")
+
+        result = controllers.get_hierarchy_path(
+            uri_a=uri_a, uri_b=uri_b, graph=current_app.graph, dep=include_deprecation
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except AttributeError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": "Internal Error"}), 500
+
+    return jsonify({"a": uri_a, "b": uri_b, **result})
+
+
 @ctrl.route("/ctrl/reload", methods=["GET"])
 def reload_graph():
     """
     Route to reload the RDFLib graph with the currently selected database file.
+    The graph (and anything cached for it) is kept if the selected database has the same content as the loaded one.
 
     Returns:
         JSON: Success message if the graph is reloaded successfully.
     """
     try:
+        if hasattr(current_app, "graph") and keep_loaded_db():
+            return jsonify(
+                {
+                    "status": "success",
+                    "message": "Selected database already loaded, graph kept.",
+                }
+            )
+
         new_graph = Graph()
         current_app.graph = load_selected_db(graph=new_graph)
+
+        # Rebuild the response cache for the new graph
+        warm_response_cache(current_app._get_current_object())
+
         return jsonify({"status": "success", "message": "Graph successfully reloaded."})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@ctrl.route("/ctrl/stats", methods=["GET"])
+def cache_stats():
+    """
+    Route to check how often requests are served from the response cache, how often identical
+    concurrent requests are coalesced into one computation, and how many searches are admitted or rejected.
+
+    Returns:
+        JSON: The counters of the response cache, of the request coalescing and of the search admission.
+    """
+    return jsonify(
+        {
+            "response_cache": {
+                "hits": response_cache.hits,
+                "misses": response_cache.misses,
+                "entries": len(response_cache),
+                "bytes": response_cache.size,
+            },
+            "coalescing": single_flight.stats(),
+            "search_admission": search_limiter.stats(),
+        }
+    )
+
+
+@ctrl.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Route exposing the metrics of the server in the Prometheus text format: the number of requests
+    with the histograms of their latency and response size per route and status, the size and load
+    time of the graph, and the counters of the response cache, request coalescing and search admission.
+    The graph metrics are left out while no graph is loaded.
+
+    Returns:
+        Response: The metrics, as plain text.
+    """
+    graph = current_app.graph if hasattr(current_app, "graph") else None
+    return current_app.response_class(render_metrics(graph), content_type=CONTENT_TYPE)
@@ -0,0 +1,86 @@
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional, the standard library encoder is always available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider serialising with orjson (several times faster than the standard library on the
+    large nested hierarchies returned by the api), falling back to the default provider when
+    orjson is not installed or when `dumps`/`loads` are given options orjson does not support.
+
+    Keys are sorted and responses are indented in debug mode, like the default provider. Only
+    non-ASCII characters differ: they are sent as UTF-8 instead of being escaped.
+    """
+
+    # Objects the default provider converts differently from orjson are passed to `default`
+    _dump_options = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        if orjson is not None
+        else 0
+    )
+
+    def _options(self, indent: bool = False) -> int:
+        options = self._dump_options
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        """
+        Serialises an object to UTF-8 encoded JSON.
+        """
+        if orjson is None:
+            if indent:
+                return super().dumps(obj, indent=2).encode("utf-8")
+            return super().dumps(obj, separators=(",", ":")).encode("utf-8")
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+# JSON providers which can be selected with the `JSON_PROVIDER` configuration
+JSON_PROVIDERS = {
+    "orjson": OrjsonProvider,
+    "default": DefaultJSONProvider,
+}
+
+
+def init_json_provider(app):
+    """
+    Installs the JSON provider selected by the `JSON_PROVIDER` configuration of the app.
+
+    Raises:
+        ValueError: If the provider is unknown.
+    """
+    name = app.config.get("JSON_PROVIDER", "default")
+    if name not in JSON_PROVIDERS:
+        raise ValueError(
+            f"Unknown JSON provider '{name}', use one of: {', '.join(JSON_PROVIDERS)}"
+        )
+
+    app.json_provider_class = JSON_PROVIDERS[name]
+    app.json = app.json_provider_class(app)
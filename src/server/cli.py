@@ -4,27 +4,38 @@ import typer
 
 from cli.history import get_current_db, delete_db, update_current_db, get_all_databases
 from cli.database import update_db
-from cli.config import HISTORY_VERSION
+from cli.benchmark import (
+    run_benchmark,
+    run_response_benchmark,
+    run_serialisation_benchmark,
+)
+from cli.importer import import_dump
+from cli.config import HISTORY_VERSION, BATCH_SIZE, IMPORT_CHUNK_SIZE
 from cli.reload import reload_graph
 
 app = typer.Typer()  # Initialize Typer app
 
 
-@app.command()
-def main(update: bool = False):
+@app.callback(invoke_without_command=True)
+def main(ctx: typer.Context, update: bool = False, delta: bool = False):
     """
     CLI tool to interact with the database.
 
     Args:
     - update (bool): To update database straight away.
+    - delta (bool): To store only the changes since the current database when updating.
     """
+    # Run the sub command instead of the interactive menu (if one was given)
+    if ctx.invoked_subcommand is not None:
+        return
+
     # Print MOTD
     motd()
 
     # If db_update is passed, update the database
     if update:
         typer.echo("Updating the database...")
-        update_db()
+        update_db(delta=delta)
         reload_graph()
 
     else:
@@ -38,6 +49,82 @@ def main(update: bool = False):
     menu()
 
 
+@app.command()
+def benchmark(
+    nodes: int = 5000,
+    dataset: str = None,
+    batch_size: int = BATCH_SIZE,
+    latency: float = 0.0,
+    failure_rate: float = 0.0,
+    repeat: int = 3,
+):
+    """
+    Benchmark the database update against a local stand-in SPARQL endpoint.
+
+    Args:
+    - nodes (int): Number of classes in the synthetic dataset.
+    - dataset (str): CSV recording of the source query to serve instead of synthetic data.
+    - batch_size (int): Number of rows fetched per request.
+    - latency (float): Seconds of latency added to every request.
+    - failure_rate (float): Probability of a request failing.
+    - repeat (int): Number of updates to run.
+    """
+    run_benchmark(
+        nodes=nodes,
+        dataset=dataset,
+        batch_size=batch_size,
+        latency=latency,
+        failure_rate=failure_rate,
+        repeat=repeat,
+    )
+
+
+@app.command("benchmark-responses")
+def benchmark_responses(
+    nodes: int = 5000, dataset: str = None, repeat: int = 20, bandwidth: float = 10.0
+):
+    """
+    Benchmark the size and latency of typical api responses with and without compression.
+
+    Args:
+    - nodes (int): Number of classes in the synthetic dataset.
+    - dataset (str): CSV recording of the source query to serve instead of synthetic data.
+    - repeat (int): Number of times each request is made.
+    - bandwidth (float): Bandwidth (Mbit/s) of the link used to estimate the transfer time.
+    """
+    run_response_benchmark(
+        nodes=nodes, dataset=dataset, repeat=repeat, bandwidth=bandwidth
+    )
+
+
+@app.command("benchmark-json")
+def benchmark_json(nodes: int = 5000, dataset: str = None, repeat: int = 20):
+    """
+    Benchmark the JSON providers on the outputs of the children and local hierarchy controllers.
+
+    Args:
+    - nodes (int): Number of classes in the synthetic dataset.
+    - dataset (str): CSV recording of the source query to serve instead of synthetic data.
+    - repeat (int): Number of times each output is serialised.
+    """
+    run_serialisation_benchmark(nodes=nodes, dataset=dataset, repeat=repeat)
+
+
+@app.command("import")
+def import_command(path: str, workers: int = None, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Import a local RDF dump (N-Triples or Turtle, optionally gzipped) as the current database.
+
+    Args:
+    - path (str): Path to the dump file.
+    - workers (int): Number of processes parsing N-Triples chunks (default: number of CPUs).
+    - chunk_size (int): Number of lines per N-Triples chunk.
+    """
+    typer.echo(f"Importing the database from '{path}'...")
+    if import_dump(path, workers=workers, chunk_size=chunk_size):
+        reload_graph()
+
+
 def motd():
     typer.echo("Welcome to Iso15926Vis CLI for Backend!")
     typer.echo(f"Database history version: '{HISTORY_VERSION}'\n")
@@ -50,10 +137,12 @@ def menu():
         typer.echo("Q = Quit the program")
         typer.echo("V = Check the version")
         typer.echo("U = Update the database")
+        typer.echo("R = Refresh the database, storing only the changes (delta)")
+        typer.echo("I = Import the database from a local dump file")
         typer.echo("M = Modify the database in use")
 
         # Get user input
-        choice = input("\nPlease enter your choice (Q/V/U/M): ").strip().upper()
+        choice = input("\nPlease enter your choice (Q/V/U/R/I/M): ").strip().upper()
         typer.echo("\n")
 
         if choice == "Q":
@@ -71,6 +160,18 @@ def menu():
             reload_graph()
             typer.echo("Database updated successfully!")
 
+        elif choice == "R":
+            typer.echo("Refreshing the database...")
+            update_db(delta=True)
+            reload_graph()
+            typer.echo("Database refreshed successfully!")
+
+        elif choice == "I":
+            path = input("Enter the path of the dump file: ").strip()
+            if import_dump(path):
+                reload_graph()
+                typer.echo("Database imported successfully!")
+
         elif choice == "M":
             typer.echo("Entering Database Version Control menu...")
             modify_db_menu()
@@ -0,0 +1,326 @@
+import json
+import os
+import tempfile
+import time
+import typer
+from rdflib import Graph
+from cli.config import BATCH_SIZE
+from cli.database import insert_results_into_rdflib, update_db
+from cli.mock_endpoint import (
+    MockSparqlEndpoint,
+    generate_synthetic_rows,
+    load_recorded_rows,
+    rows_to_csv,
+)
+
+
+# Run `update_db` end-to-end against a local stand-in endpoint and measure the refresh throughput
+def benchmark_update(
+    rows, batch_size=BATCH_SIZE, latency=0.0, failure_rate=0.0, repeat=1
+):
+    """
+    Benchmarks the full database refresh (fetch, insert, validate, save, history update) against
+    a `MockSparqlEndpoint` serving the given rows. Every run uses its own temporary storage
+    directory and history file, so the real databases are never touched.
+
+    Args:
+        rows (list[dict]): The dataset served by the stand-in endpoint.
+        batch_size (int, optional): Number of rows fetched per request (default: BATCH_SIZE).
+        latency (float, optional): Seconds of latency added to every request (default: 0).
+        failure_rate (float, optional): Probability of a request failing with HTTP 500 (default: 0).
+        repeat (int, optional): Number of refreshes to run (default: 1).
+
+    Returns:
+        list[dict]: One result per run with 'success', 'seconds', 'requests', 'failures',
+                    'rows', 'rows_per_second', 'file_size' (bytes) and the total
+                    'fetch_seconds', 'parse_seconds' and 'insert_seconds' of the batches.
+    """
+    results = []
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir, MockSparqlEndpoint(
+            rows, latency=latency, failure_rate=failure_rate
+        ) as endpoint:
+            storage_dir = os.path.join(tmp_dir, "storage")
+            report_dir = os.path.join(tmp_dir, "reports")
+
+            start_time = time.perf_counter()
+            db_filename = update_db(
+                endpoint_url=endpoint.url,
+                batch_size=batch_size,
+                storage_dir=storage_dir,
+                history_file=os.path.join(tmp_dir, "history.json"),
+                report_dir=report_dir,
+            )
+            elapsed_time = time.perf_counter() - start_time
+
+            file_size = 0
+            if db_filename:
+                file_size = os.path.getsize(os.path.join(storage_dir, db_filename))
+
+            # Break the time down using the report of the run
+            (report_file,) = os.listdir(report_dir)
+            with open(os.path.join(report_dir, report_file), "r") as f:
+                totals = json.load(f)["totals"]
+
+            results.append(
+                {
+                    "success": db_filename is not None,
+                    "seconds": elapsed_time,
+                    "requests": endpoint.request_count,
+                    "failures": endpoint.failure_count,
+                    "rows": len(rows),
+                    "rows_per_second": len(rows) / elapsed_time if elapsed_time else 0,
+                    "file_size": file_size,
+                    "fetch_seconds": totals["fetch_seconds"],
+                    "parse_seconds": totals["parse_seconds"],
+                    "insert_seconds": totals["insert_seconds"],
+                }
+            )
+
+    return results
+
+
+def run_benchmark(
+    nodes=5000,
+    dataset=None,
+    batch_size=BATCH_SIZE,
+    latency=0.0,
+    failure_rate=0.0,
+    repeat=3,
+):
+    """
+    Builds the dataset (synthetic, or recorded from a CSV file), runs the benchmark and prints a summary.
+    """
+    if dataset:
+        rows = load_recorded_rows(dataset)
+        typer.echo(f"Loaded {len(rows)} recorded rows from '{dataset}'.")
+    else:
+        rows = generate_synthetic_rows(num_nodes=nodes)
+        typer.echo(f"Generated {len(rows)} synthetic rows ({nodes} classes).")
+
+    results = benchmark_update(
+        rows,
+        batch_size=batch_size,
+        latency=latency,
+        failure_rate=failure_rate,
+        repeat=repeat,
+    )
+
+    typer.echo("\n~~~~~~~~~~~~~~~~ UPDATE BENCHMARK ~~~~~~~~~~~~~~~~")
+    for i, result in enumerate(results, start=1):
+        typer.echo(
+            f"Run {i}: {'SUCCESS' if result['success'] else 'FAILURE'} in {result['seconds']:.2f}s, "
+            f"{result['rows_per_second']:.0f} rows/s, {result['requests']} requests "
+            f"({result['failures']} failed), {result['file_size'] / 1024:.0f} KB saved"
+        )
+        typer.echo(
+            f"       fetch {result['fetch_seconds']:.2f}s, parse {result['parse_seconds']:.2f}s, "
+            f"insert {result['insert_seconds']:.2f}s"
+        )
+
+    successful = [result for result in results if result["success"]]
+    if successful:
+        best = min(result["seconds"] for result in successful)
+        mean = sum(result["seconds"] for result in successful) / len(successful)
+        typer.echo(
+            f"\nBest: {best:.2f}s ({len(rows) / best:.0f} rows/s), mean: {mean:.2f}s over {len(successful)} successful run(s)."
+        )
+    else:
+        typer.echo("\nNo run completed successfully.")
+
+    return results
+
+
+# Build an RDFLib graph from rows shaped like the results of `SOURCE_QUERY`
+def build_graph_from_rows(rows):
+    graph = Graph()
+    insert_results_into_rdflib(graph=graph, results_csv=rows_to_csv(rows))
+    return graph
+
+
+# The node with the most children and the deepest non-deprecated node of a graph
+def find_extreme_nodes(graph):
+    from app.index import get_graph_index
+
+    index = get_graph_index(graph)
+    widest = max(index.subjects, key=lambda uri: len(index.get_children(uri, True)))
+    deepest = max(index.subjects, key=lambda uri: index.depth(uri, False))
+    return widest, deepest
+
+
+# Typical read requests of the client: the root, the widest node, a deep hierarchy and a search
+def typical_requests(graph):
+    from app.config import Config
+
+    widest, deepest = find_extreme_nodes(graph)
+    urls = [
+        f"/node/children/{Config.ROOT_NODE_URI}",
+        f"/node/children/{widest}",
+        f"/graph/local-hierarchy/{deepest}",
+        f"/node/info/{deepest}",
+        "/search/label/CLASS 1?limit=50",
+    ]
+    return list(dict.fromkeys(urls))  # The root can be the widest node
+
+
+def benchmark_responses(graph, urls, encodings=None, repeat=20, cache=False):
+    """
+    Benchmarks the read api end points of the Flask app with every content coding, measuring the
+    size of the responses and the time taken to compute and encode them (through the test client,
+    so without any network).
+
+    Args:
+        graph (rdflib.Graph): The graph to serve.
+        urls (list[str]): The requests to benchmark.
+        encodings (list[str], optional): The content codings to compare, None being identity
+                                         (default: identity and every supported coding).
+        repeat (int, optional): Number of times each request is made (default: 20).
+        cache (bool, optional): Whether to use the response cache (default: False).
+
+    Returns:
+        list[dict]: One result per request and coding with 'url', 'encoding', 'bytes' and
+                    'seconds' (mean time per request).
+    """
+    from app import create_app
+    from app.caching import response_cache
+    from app.compression import ENCODINGS
+    from app.config import TestConfig
+
+    if encodings is None:
+        encodings = [None, *ENCODINGS]
+
+    app = create_app(TestConfig)
+    app.graph = graph
+    if not cache:
+        app.config["RESPONSE_CACHE_MAX_BYTES"] = 0
+    response_cache.clear()
+    client = app.test_client()
+
+    results = []
+    for url in urls:
+        for encoding in encodings:
+            headers = {"Accept-Encoding": encoding or "identity"}
+            response = client.get(url, headers=headers)  # Warm up
+
+            start_time = time.perf_counter()
+            for _ in range(repeat):
+                client.get(url, headers=headers)
+            elapsed_time = time.perf_counter() - start_time
+
+            results.append(
+                {
+                    "url": url,
+                    "encoding": encoding or "identity",
+                    "status": response.status_code,
+                    "bytes": len(response.data),
+                    "seconds": elapsed_time / repeat,
+                }
+            )
+
+    return results
+
+
+def run_response_benchmark(nodes=5000, dataset=None, repeat=20, bandwidth=10.0):
+    """
+    Builds the dataset (synthetic, or recorded from a CSV file), benchmarks the compression of
+    typical responses and prints their sizes and end-to-end latencies, the transfer time being
+    estimated for a link of `bandwidth` Mbit/s.
+    """
+    if dataset:
+        rows = load_recorded_rows(dataset)
+        typer.echo(f"Loaded {len(rows)} recorded rows from '{dataset}'.")
+    else:
+        rows = generate_synthetic_rows(num_nodes=nodes)
+        typer.echo(f"Generated {len(rows)} synthetic rows ({nodes} classes).")
+
+    graph = build_graph_from_rows(rows)
+    results = benchmark_responses(graph, typical_requests(graph), repeat=repeat)
+
+    typer.echo("\n~~~~~~~~~~~~~~~~ RESPONSE BENCHMARK ~~~~~~~~~~~~~~~~")
+    for result in results:
+        transfer_seconds = result["bytes"] * 8 / (bandwidth * 1_000_000)
+        result["latency_seconds"] = result["seconds"] + transfer_seconds
+        typer.echo(
+            f"{result['url'][:60]:<60} {result['encoding']:<8} {result['bytes'] / 1024:>8.1f} KB, "
+            f"server {result['seconds'] * 1000:>7.2f} ms, "
+            f"end-to-end {result['latency_seconds'] * 1000:>7.2f} ms"
+        )
+
+    return results
+
+
+def benchmark_serialisation(graph, repeat=20):
+    """
+    Benchmarks every JSON provider on real outputs of the controllers: the children of the root
+    node and of the widest node, and the local hierarchy of the deepest node.
+
+    Args:
+        graph (rdflib.Graph): The graph to build the outputs from.
+        repeat (int, optional): Number of times each output is serialised (default: 20).
+
+    Returns:
+        list[dict]: One result per output and provider with 'output', 'provider', 'bytes' and
+                    'seconds' (mean time per serialisation).
+    """
+    from app import controllers, create_app
+    from app.config import Config, TestConfig
+    from app.serialisation import JSON_PROVIDERS
+
+    widest, deepest = find_extreme_nodes(graph)
+    outputs = {
+        f"get_children({uri})": controllers.get_children(uri, graph)
+        for uri in dict.fromkeys([Config.ROOT_NODE_URI, widest])
+    }
+    outputs[f"get_local_hierarchy_to_root({deepest})"] = (
+        controllers.get_local_hierarchy_to_root(deepest, graph)
+    )
+
+    app = create_app(TestConfig)
+    app.config["DEBUG"] = False  # Compact responses, as in production
+    results = []
+    with app.app_context():
+        for name, provider_class in JSON_PROVIDERS.items():
+            provider = provider_class(app)
+            for output_name, output in outputs.items():
+                body = provider.response(output).get_data()
+
+                start_time = time.perf_counter()
+                for _ in range(repeat):
+                    provider.response(output)
+                elapsed_time = time.perf_counter() - start_time
+
+                results.append(
+                    {
+                        "output": output_name,
+                        "provider": name,
+                        "bytes": len(body),
+                        "seconds": elapsed_time / repeat,
+                    }
+                )
+
+    return results
+
+
+def run_serialisation_benchmark(nodes=5000, dataset=None, repeat=20):
+    """
+    Builds the dataset (synthetic, or recorded from a CSV file), benchmarks the JSON providers and
+    prints the serialisation time of each output.
+    """
+    if dataset:
+        rows = load_recorded_rows(dataset)
+        typer.echo(f"Loaded {len(rows)} recorded rows from '{dataset}'.")
+    else:
+        rows = generate_synthetic_rows(num_nodes=nodes)
+        typer.echo(f"Generated {len(rows)} synthetic rows ({nodes} classes).")
+
+    results = benchmark_serialisation(build_graph_from_rows(rows), repeat=repeat)
+
+    typer.echo("\n~~~~~~~~~~~~~~~~ SERIALISATION BENCHMARK ~~~~~~~~~~~~~~~~")
+    for result in results:
+        typer.echo(
+            f"{result['output'][:70]:<70} {result['provider']:<8} {result['bytes'] / 1024:>8.1f} KB, "
+            f"{result['seconds'] * 1000:>7.3f} ms"
+        )
+
+    return results
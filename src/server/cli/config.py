@@ -8,6 +8,7 @@ DATABASE_STORAGE_DIR = os.path.join(basedir, "../db/storage")
 
 SOURCE_OF_TRUTH = "http://190.92.134.58:8890/sparql"
 BATCH_SIZE = 10000
+IMPORT_CHUNK_SIZE = 50000  # Lines per chunk when importing N-Triples dumps in parallel
 LOG_LEVEL = "DEBUG"
 SOURCE_QUERY = """
   SELECT DISTINCT ?id ?predicate ?object ?g
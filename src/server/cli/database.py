@@ -2,20 +2,37 @@ import time
 import os
 import csv
 import logging
-import psutil
 from io import StringIO
 from rdflib import Graph, Namespace, URIRef, Literal
 from SPARQLWrapper import SPARQLWrapper, CSV
 from cli.config import (
     DATABASE_STORAGE_DIR,
+    HISTORY_FILE,
     LOG_LEVEL,
     SOURCE_QUERY,
     BATCH_SIZE,
     SOURCE_OF_TRUTH,
 )
 from cli.tests import test_new_database
+from cli.telemetry import IngestReport, get_rss_mb
+from cli.delta import (
+    MAX_DELTA_CHAIN,
+    compute_content_hash,
+    compute_subject_hashes,
+    delta_filename,
+    diff_subject_hashes,
+    extract_subjects,
+    resolve_subject_hashes,
+    write_manifest,
+)
 
-from cli.history import history_add_db, get_next_db_filename  # Import history functions
+from cli.history import (
+    history_add_db,
+    get_next_db_filename,
+    get_current_db,
+    get_db_by_hash,
+    update_current_db,
+)  # Import history functions
 
 BASE_URI = "http://data.15926.org/iso/"
 META = Namespace("http://data.15926.org/meta/")  # Set up namespace for `/meta`
@@ -44,8 +61,7 @@ def sanitise_literal(value):
 
 # Monitor memory usage and log it periodically
 def monitor_memory_usage(message=""):
-    memory_info = psutil.Process().memory_info()
-    memory_usage_mb = memory_info.rss / (1024 * 1024)  # Convert from bytes to MB
+    memory_usage_mb = get_rss_mb()
     logging.debug(f"{message} - Memory Usage: {memory_usage_mb:.2f} MB")
 
 
@@ -65,8 +81,10 @@ def execute_sparql_query(endpoint_url, offset=0, limit=10000):
     return result_csv
 
 
-# Insert the SPARQL query results into the RDFLib graph
-def insert_results_into_rdflib(graph, results_csv):
+# Parse the SPARQL query results into RDFLib triples
+def parse_results_csv(results_csv):
+    triples = []
+
     # Parse the CSV data
     csv_reader = csv.DictReader(StringIO(results_csv))
 
@@ -84,55 +102,120 @@ def insert_results_into_rdflib(graph, results_csv):
                 "https://"
             ):
                 object_iri = URIRef(ensure_absolute_iri(object_value))
-                graph.add(
+                triples.append(
                     (subject_iri, predicate_iri, object_iri)
-                )  # Add triple with IRI object
+                )  # Triple with IRI object
             else:
                 # If it's a literal, sanitize it and add it as a literal
                 sanitized_object = sanitise_literal(object_value)
-                graph.add(
+                triples.append(
                     (subject_iri, predicate_iri, Literal(sanitized_object))
-                )  # Add triple with literal object
+                )  # Triple with literal object
 
         except Exception as e:
             logging.error(f"Error processing result: {result}")
             logging.error(f"Exception: {e}")
             continue  # Skip to the next result
 
+    return triples
+
+
+# Insert parsed triples into the RDFLib graph
+def insert_triples_into_rdflib(graph, triples):
+    graph.addN((s, p, o, graph) for s, p, o in triples)
     logging.debug(
         f"Finished inserting results into RDFLib graph. True total length: {len(graph)}"
     )
 
 
+# Insert the SPARQL query results into the RDFLib graph
+def insert_results_into_rdflib(graph, results_csv):
+    insert_triples_into_rdflib(graph=graph, triples=parse_results_csv(results_csv))
+
+
 # Save the RDFLib graph to a file with a dynamic filename
-def save_graph_to_file(graph):
+def save_graph_to_file(
+    graph, storage_dir=DATABASE_STORAGE_DIR, history_file=HISTORY_FILE
+):
     # Ensure the storage directory exists, create it if not
-    os.makedirs(DATABASE_STORAGE_DIR, exist_ok=True)
+    os.makedirs(storage_dir, exist_ok=True)
 
     # Get the next available filename from history
-    db_filename = (
-        get_next_db_filename()
+    db_filename = get_next_db_filename(
+        history_file=history_file
     )  # This returns the filename and updates the history
 
     # Save the graph using the generated filename
-    graph.serialize(
-        destination=os.path.join(DATABASE_STORAGE_DIR, db_filename), format="turtle"
-    )
+    graph.serialize(destination=os.path.join(storage_dir, db_filename), format="turtle")
     logging.info(f"Graph saved to '{db_filename}'.")
     return db_filename
 
 
+# Save only the subjects that changed since the current database, along with a manifest
+# Falls back to a full save if the current database has no manifest or too many deltas
+# Returns the filename and the parent database (None for a full save)
+def save_graph_delta(
+    graph, new_hashes, storage_dir=DATABASE_STORAGE_DIR, history_file=HISTORY_FILE
+):
+    current_db, _ = get_current_db(history_file=history_file)
+    base_hashes, chain_length = (None, 0)
+    if current_db:
+        base_hashes, chain_length = resolve_subject_hashes(storage_dir, current_db)
+
+    if base_hashes is None or chain_length >= MAX_DELTA_CHAIN:
+        print("Saving a full database to apply future deltas to.")
+        db_filename = save_graph_to_file(
+            graph=graph, storage_dir=storage_dir, history_file=history_file
+        )
+        write_manifest(
+            storage_dir,
+            db_filename,
+            {"parent": None, "removed": [], "hashes": new_hashes},
+        )
+        return db_filename, None
+
+    removed, changed = diff_subject_hashes(base_hashes, new_hashes)
+    print(
+        f"Delta since '{current_db}': {len(changed)} subjects added or changed, {len(removed)} removed."
+    )
+
+    os.makedirs(storage_dir, exist_ok=True)
+    db_filename = delta_filename(get_next_db_filename(history_file=history_file))
+    extract_subjects(graph, changed).serialize(
+        destination=os.path.join(storage_dir, db_filename), format="turtle"
+    )
+    write_manifest(
+        storage_dir,
+        db_filename,
+        {"parent": current_db, "removed": removed, "hashes": changed},
+    )
+    logging.info(f"Delta saved to '{db_filename}' (parent '{current_db}').")
+    return db_filename, current_db
+
+
 # Main update function that fetches SPARQL data and inserts it into the RDFLib graph
-def update_db():
-    sparql_endpoint_url = SOURCE_OF_TRUTH
-    batch_size = BATCH_SIZE
+# Returns the filename of the new database, or None if the update failed
+# A JSON report of the run is saved in `report_dir` (default: 'reports' next to `storage_dir`)
+def update_db(
+    endpoint_url=SOURCE_OF_TRUTH,
+    batch_size=BATCH_SIZE,
+    storage_dir=DATABASE_STORAGE_DIR,
+    history_file=HISTORY_FILE,
+    delta=False,
+    report_dir=None,
+):
+    sparql_endpoint_url = endpoint_url
     offset = 0
     total_triples = 0
     success = 0
+    db_filename = None
 
     # Start timing
     start_time = time.time()
     logging.debug("Starting the database update process.")
+    report = IngestReport(
+        endpoint_url=sparql_endpoint_url, batch_size=batch_size, delta=delta
+    )
 
     # Check memory first
     monitor_memory_usage("Before updating database")
@@ -143,7 +226,9 @@ def update_db():
     try:
         while True:
             # Fetch data from the SPARQL endpoint in CSV format
+            fetch_start = time.perf_counter()
             results_csv = execute_sparql_query(sparql_endpoint_url, offset, batch_size)
+            fetch_seconds = time.perf_counter() - fetch_start
 
             # If no results are returned, break the loop
             num_lines = results_csv.count("\n") - 1  # Number of lines minus header
@@ -153,7 +238,20 @@ def update_db():
                 break
 
             # Insert the results into RDFLib
-            insert_results_into_rdflib(graph=graph, results_csv=results_csv)
+            parse_start = time.perf_counter()
+            triples = parse_results_csv(results_csv)
+            insert_start = time.perf_counter()
+            insert_triples_into_rdflib(graph=graph, triples=triples)
+            insert_end = time.perf_counter()
+
+            report.add_batch(
+                offset=offset,
+                fetch_seconds=fetch_seconds,
+                num_bytes=len(results_csv.encode("utf-8")),
+                rows=num_lines,
+                parse_seconds=insert_start - parse_start,
+                insert_seconds=insert_end - insert_start,
+            )
 
             # Increment the offset for the next batch
             offset += batch_size
@@ -170,10 +268,40 @@ def update_db():
     else:
         try:
             # Test the database to ensure nothing is wrong with it
-            test_new_database(graph=graph)
+            with report.stage("validation"):
+                test_new_database(graph=graph)
+
+            # Reuse the stored database if an identical one was downloaded before
+            with report.stage("hashing"):
+                subject_hashes = compute_subject_hashes(graph)
+                content_hash = compute_content_hash(subject_hashes)
+            existing_db = get_db_by_hash(content_hash, history_file=history_file)
+            if existing_db:
+                print(
+                    f"Downloaded database is identical to '{existing_db}', reusing it."
+                )
+                update_current_db(
+                    existing_db, history_file=history_file, report=report.filename
+                )
+                logging.info(f"Identical database found, reusing '{existing_db}'.")
+                db_filename = existing_db
+                success = 1
+                return existing_db
 
             # Save the RDFLib graph to a file after processing all batches
-            db_filename = save_graph_to_file(graph=graph)
+            with report.stage("save"):
+                if delta:
+                    db_filename, parent = save_graph_delta(
+                        graph=graph,
+                        new_hashes=subject_hashes,
+                        storage_dir=storage_dir,
+                        history_file=history_file,
+                    )
+                else:
+                    db_filename = save_graph_to_file(
+                        graph=graph, storage_dir=storage_dir, history_file=history_file
+                    )
+                    parent = None
 
             # End timing
             end_time = time.time()
@@ -192,7 +320,11 @@ def update_db():
             if true_length > 0:
                 print("Updating the history file with the new database.")
                 history_add_db(
-                    filename=db_filename
+                    filename=db_filename,
+                    history_file=history_file,
+                    parent=parent,
+                    content_hash=content_hash,
+                    report=report.filename,
                 )  # Ensure history is updated after database is saved successfully
                 logging.info("Updating the history file with the new database.")
                 success = 1
@@ -210,9 +342,19 @@ def update_db():
             print(f"Rolling database back...")
             return  # Exit the function if saving fails to avoid history update
 
+        return db_filename if success else None
+
     finally:
         # Always check memory usage at the end, even if errors occur
         monitor_memory_usage("Final memory usage after update process")
         logging.debug(
             f"Database update process completed with status: {'SUCCESS' if success else 'FAILURE'}."
         )
+
+        # Always save the report of the run, even if errors occur
+        report.finish(
+            status="SUCCESS" if success else "FAILURE",
+            db_filename=db_filename if success else None,
+            triples=len(graph),
+        )
+        report.save(report_dir or os.path.join(os.path.dirname(storage_dir), "reports"))
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from rdflib import Graph, URIRef
+
+# A full database is stored again (instead of another delta) after this many chained deltas
+MAX_DELTA_CHAIN = 10
+
+
+# Manifest of a stored database, e.g. '2024-10-09-2.delta.ttl' -> '2024-10-09-2.delta.json'
+def manifest_filename(db_filename):
+    return os.path.splitext(db_filename)[0] + ".json"
+
+
+# Filename of a delta database, e.g. '2024-10-09-2.ttl' -> '2024-10-09-2.delta.ttl'
+def delta_filename(db_filename):
+    return os.path.splitext(db_filename)[0] + ".delta.ttl"
+
+
+def read_manifest(storage_dir, db_filename):
+    path = os.path.join(storage_dir, manifest_filename(db_filename))
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_manifest(storage_dir, db_filename, manifest):
+    with open(os.path.join(storage_dir, manifest_filename(db_filename)), "w") as f:
+        json.dump(manifest, f)
+
+
+# Hash all triples of every subject, so changed subjects can be found without comparing graphs
+def compute_subject_hashes(graph):
+    hashes = {}
+    for subj in graph.subjects(unique=True):
+        lines = sorted(f"{p.n3()} {o.n3()}" for p, o in graph.predicate_objects(subj))
+        digest = hashlib.blake2b("\n".join(lines).encode("utf-8"), digest_size=8)
+        hashes[str(subj)] = digest.hexdigest()
+    return hashes
+
+
+# Hash the content of a whole graph from its subject hashes (independent of triple order)
+def compute_content_hash(subject_hashes):
+    digest = hashlib.blake2b(digest_size=16)
+    for subj in sorted(subject_hashes):
+        digest.update(f"{subj} {subject_hashes[subj]}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Rebuild the subject hashes of a stored database by walking its chain of manifests
+# Returns the hashes and the number of deltas in the chain, or (None, 0) if a manifest is missing
+def resolve_subject_hashes(storage_dir, db_filename):
+    chain = []
+    while db_filename:
+        manifest = read_manifest(storage_dir, db_filename)
+        if manifest is None:
+            return None, 0
+        chain.append(manifest)
+        db_filename = manifest.get("parent")
+
+    # Start from the full database, then apply each delta in order
+    hashes = dict(chain[-1]["hashes"])
+    for manifest in reversed(chain[:-1]):
+        for subj in manifest["removed"]:
+            hashes.pop(subj, None)
+        hashes.update(manifest["hashes"])
+
+    return hashes, len(chain) - 1
+
+
+# Compare the subject hashes of a new graph with those of the current database
+# Returns the removed subjects and the hashes of added or changed subjects
+def diff_subject_hashes(base_hashes, new_hashes):
+    removed = sorted(subj for subj in base_hashes if subj not in new_hashes)
+    changed = {
+        subj: digest
+        for subj, digest in new_hashes.items()
+        if base_hashes.get(subj) != digest
+    }
+    return removed, changed
+
+
+# Extract all triples of the given subjects into a new graph
+def extract_subjects(graph, subjects):
+    delta_graph = Graph()
+    for subj in subjects:
+        subj_ref = URIRef(subj)
+        for p, o in graph.predicate_objects(subj_ref):
+            delta_graph.add((subj_ref, p, o))
+    return delta_graph
@@ -3,28 +3,29 @@ import os
 import typer
 from datetime import datetime
 from cli.config import HISTORY_FILE, HISTORY_VERSION, DATABASE_STORAGE_DIR
+from cli.delta import manifest_filename
 
 
 # Creates a new history file if it doesn't exist
-def history_create():
-    if os.path.exists(HISTORY_FILE):
-        print(f"History file already exists: '{HISTORY_FILE}'")
+def history_create(history_file=HISTORY_FILE):
+    if os.path.exists(history_file):
+        print(f"History file already exists: '{history_file}'")
         return
 
     history_data = {"version": HISTORY_VERSION, "databases": [], "current_db": ""}
-    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
-    with open(HISTORY_FILE, "w") as f:
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, "w") as f:
         json.dump(history_data, f, indent=4)
 
-    print(f"History file created: '{HISTORY_FILE}'")
+    print(f"History file created: '{history_file}'")
 
 
 # Generate the next available database filename based on the date and existing files
-def get_next_db_filename():
-    if not os.path.exists(HISTORY_FILE):
-        history_create()
+def get_next_db_filename(history_file=HISTORY_FILE):
+    if not os.path.exists(history_file):
+        history_create(history_file)
 
-    with open(HISTORY_FILE, "r") as f:
+    with open(history_file, "r") as f:
         history_data = json.load(f)
 
     today_date = datetime.now().strftime("%Y-%m-%d")
@@ -42,22 +43,33 @@ def get_next_db_filename():
 
 
 # Adds a new database entry to the history file and marks it as the current one
-def history_add_db(filename):
-    if not os.path.exists(HISTORY_FILE):
-        history_create()
-
-    with open(HISTORY_FILE, "r") as f:
+# A delta database also records the database it applies to as its parent
+# The content hash of the database is recorded so identical downloads can reuse the file
+# The report of the update run that created the database is linked (if any)
+def history_add_db(
+    filename, history_file=HISTORY_FILE, parent=None, content_hash=None, report=None
+):
+    if not os.path.exists(history_file):
+        history_create(history_file)
+
+    with open(history_file, "r") as f:
         history_data = json.load(f)
 
-    history_data["databases"].append(
-        {
-            "filename": filename,
-            "created_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-        }
-    )
+    db_entry = {
+        "filename": filename,
+        "created_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+    }
+    if parent:
+        db_entry["parent"] = parent
+    if content_hash:
+        db_entry["hash"] = content_hash
+    if report:
+        db_entry["report"] = report
+
+    history_data["databases"].append(db_entry)
 
     history_data["current_db"] = filename
-    with open(HISTORY_FILE, "w") as f:
+    with open(history_file, "w") as f:
         json.dump(history_data, f, indent=4)
 
     print(f"Added new DB to history file: '{filename}', marked as current DB.")
@@ -65,13 +77,13 @@ def history_add_db(filename):
 
 
 # Returns the current database filename and its creation date
-def get_current_db():
-    if not os.path.exists(HISTORY_FILE):
+def get_current_db(history_file=HISTORY_FILE):
+    if not os.path.exists(history_file):
         print("Error: History file does not exist. Creating one...")
-        history_create()
+        history_create(history_file)
         return None, None
 
-    with open(HISTORY_FILE, "r") as f:
+    with open(history_file, "r") as f:
         history_data = json.load(f)
 
     current_db = history_data.get("current_db", None)
@@ -87,26 +99,39 @@ def get_current_db():
 
 
 # Retrieves all databases
-def get_all_databases():
-    if not os.path.exists(HISTORY_FILE):
+def get_all_databases(history_file=HISTORY_FILE):
+    if not os.path.exists(history_file):
         return []
 
-    with open(HISTORY_FILE, "r") as f:
+    with open(history_file, "r") as f:
         history_data = json.load(f)
     return history_data.get("databases", [])
 
 
+# Returns the filename of a stored database with the given content hash, if any
+def get_db_by_hash(content_hash, history_file=HISTORY_FILE):
+    for db_entry in get_all_databases(history_file=history_file):
+        if db_entry.get("hash") == content_hash:
+            return db_entry["filename"]
+    return None
+
+
 # Update the current database in the history file
-def update_current_db(new_db):
-    if not os.path.exists(HISTORY_FILE):
+# The report of an update run that reused the database is appended to its entry's reports (if any)
+def update_current_db(new_db, history_file=HISTORY_FILE, report=None):
+    if not os.path.exists(history_file):
         return
 
-    with open(HISTORY_FILE, "r") as f:
+    with open(history_file, "r") as f:
         history_data = json.load(f)
 
     history_data["current_db"] = new_db
+    if report:
+        for db_entry in history_data.get("databases", []):
+            if db_entry.get("filename") == new_db:
+                db_entry.setdefault("reports", []).append(report)
 
-    with open(HISTORY_FILE, "w") as f:
+    with open(history_file, "w") as f:
         json.dump(history_data, f, indent=4)
 
 
@@ -120,6 +145,18 @@ def delete_db(filename):
     with open(HISTORY_FILE, "r") as f:
         history_data = json.load(f)
 
+    # Deltas are stored on top of their parent, which must be kept while they exist
+    dependants = [
+        db["filename"]
+        for db in history_data["databases"]
+        if db.get("parent") == filename
+    ]
+    if dependants:
+        typer.echo(
+            f"!! Cannot delete '{filename}', it is the parent of the delta database(s): {', '.join(dependants)}."
+        )
+        return
+
     history_data["databases"] = [
         db for db in history_data["databases"] if db["filename"] != filename
     ]
@@ -135,3 +172,8 @@ def delete_db(filename):
         typer.echo(
             f"Error: File '{db_file}' does not exist or has already been deleted."
         )
+
+    # Delete the manifest stored alongside the database (if any)
+    manifest_file = os.path.join(DATABASE_STORAGE_DIR, manifest_filename(filename))
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
@@ -0,0 +1,169 @@
+import gzip
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from rdflib import Graph, Literal
+from cli.config import DATABASE_STORAGE_DIR, HISTORY_FILE, IMPORT_CHUNK_SIZE
+from cli.database import monitor_memory_usage, sanitise_literal, save_graph_to_file
+from cli.delta import compute_content_hash, compute_subject_hashes
+from cli.history import get_db_by_hash, history_add_db, update_current_db
+from cli.tests import test_new_database
+
+# Dump formats that can be imported (by file extension, ignoring `.gz`)
+DUMP_FORMATS = {".nt": "nt", ".ntriples": "nt", ".ttl": "turtle", ".turtle": "turtle"}
+
+# Formats with one triple per line, which can be split into chunks and parsed in parallel
+LINE_FORMATS = {"nt"}
+
+
+# Detect the RDF format of a dump file from its extension
+def detect_dump_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower()
+
+    if extension not in DUMP_FORMATS:
+        raise ValueError(
+            f"Unsupported dump format '{extension}', use one of: {', '.join(DUMP_FORMATS)} (optionally gzipped)."
+        )
+
+    return DUMP_FORMATS[extension]
+
+
+# Open a dump file as text, decompressing it if gzipped
+def open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+# Sanitise a triple's literal the same way `update_db` does, keeping its language and datatype
+def sanitise_triple(triple):
+    subj, pred, obj = triple
+    if isinstance(obj, Literal):
+        sanitised = sanitise_literal(str(obj))
+        if sanitised != str(obj):
+            obj = Literal(sanitised, lang=obj.language, datatype=obj.datatype)
+    return subj, pred, obj
+
+
+# Blank node ids of the N-Triples parser: every label (e.g. `_:b1`) is kept as the id of its blank node,
+# instead of a random id per parse, so that a blank node whose triples fall in several chunks stays one
+# node, and the content hash of a dump with blank nodes is the same on every import
+class DumpBNodeIds(dict):
+    def get(self, label, default=None):
+        return label
+
+
+# Parse a chunk of N-Triples lines (runs in a worker process)
+def parse_chunk(lines):
+    chunk_graph = Graph()
+    chunk_graph.parse(data="".join(lines), format="nt", bnode_context=DumpBNodeIds())
+    return [sanitise_triple(triple) for triple in chunk_graph]
+
+
+# Read the lines of a dump in chunks of `chunk_size` lines
+def read_chunks(stream, chunk_size):
+    chunk = []
+    for line in stream:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Run a function on every item in a pool, yielding the results in order while keeping at most
+# `window` items submitted, so that the items are only read as fast as they are processed
+def map_in_order(executor, function, items, window):
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# Parse a dump file into an RDFLib graph, in parallel chunks for line-oriented formats
+def parse_dump(path, workers=None, chunk_size=IMPORT_CHUNK_SIZE):
+    dump_format = detect_dump_format(path)
+    graph = Graph()
+
+    with open_dump(path) as stream:
+        if dump_format not in LINE_FORMATS:
+            # Statements can span several lines, so the file must be parsed as a whole
+            graph.parse(stream, format=dump_format)
+            for triple in list(graph):
+                sanitised = sanitise_triple(triple)
+                if sanitised != triple:
+                    graph.remove(triple)
+                    graph.add(sanitised)
+            return graph
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            num_chunks = 0
+            chunks = read_chunks(stream, chunk_size)
+            for triples in map_in_order(executor, parse_chunk, chunks, 2 * workers):
+                graph.addN((s, p, o, graph) for s, p, o in triples)
+                num_chunks += 1
+                logging.debug(
+                    f"Parsed chunk {num_chunks} of '{path}'. Total length: {len(graph)}"
+                )
+
+    return graph
+
+
+# Import a local RDF dump as a new database and mark it as the current one
+# Returns the filename of the new database, or None if the import failed
+def import_dump(
+    path,
+    workers=None,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    storage_dir=DATABASE_STORAGE_DIR,
+    history_file=HISTORY_FILE,
+):
+    start_time = time.time()
+    logging.debug(f"Starting the import of '{path}'.")
+    monitor_memory_usage("Before importing dump")
+
+    try:
+        graph = parse_dump(path, workers=workers, chunk_size=chunk_size)
+        print(f"Parsed {len(graph)} triples from '{path}'.")
+
+        # Run the same checks as for a downloaded database
+        test_new_database(graph=graph)
+
+        # Reuse the stored database if an identical one exists
+        content_hash = compute_content_hash(compute_subject_hashes(graph))
+        db_filename = get_db_by_hash(content_hash, history_file=history_file)
+        if db_filename:
+            print(f"Dump is identical to '{db_filename}', reusing it.")
+            update_current_db(db_filename, history_file=history_file)
+        else:
+            db_filename = save_graph_to_file(
+                graph=graph, storage_dir=storage_dir, history_file=history_file
+            )
+            history_add_db(
+                filename=db_filename,
+                history_file=history_file,
+                content_hash=content_hash,
+            )
+
+    except Exception as e:
+        logging.critical(f"An error occurred while importing '{path}': {e}")
+        print(f"Failed to import the dump: {e}")
+        return None
+
+    finally:
+        monitor_memory_usage("Final memory usage after import process")
+
+    elapsed_time = time.time() - start_time
+    print(f"Database saved as: {db_filename}")
+    print(f"Time taken: {elapsed_time:.2f} seconds")
+    logging.info(f"Imported '{path}' as '{db_filename}'.")
+
+    return db_filename
@@ -0,0 +1,240 @@
+import csv
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+# Columns returned by `SOURCE_QUERY` (see `cli/config.py`)
+CSV_COLUMNS = ["id", "predicate", "object", "g"]
+
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDFS_SUBCLASS_OF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+SKOS_DEFINITION = "http://www.w3.org/2004/02/skos/core#definition"
+META_DEPRECATION = "http://data.15926.org/meta/valDeprecationDate"
+OWL_CLASS = "http://www.w3.org/2002/07/owl#Class"
+
+LIMIT_PATTERN = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+OFFSET_PATTERN = re.compile(r"\bOFFSET\s+(\d+)", re.IGNORECASE)
+
+
+def generate_synthetic_rows(num_nodes=1000, seed=0, deprecated_ratio=0.05):
+    """
+    Generates a synthetic RDL-like dataset shaped like the results of `SOURCE_QUERY`.
+
+    The dataset is a random `rdfs:subClassOf` tree below `dm/Thing` (with some extra parents),
+    spread over the `/dm`, `/lci` and `/rdl` graphs so that it passes `test_new_database`.
+
+    Args:
+        num_nodes (int, optional): Number of classes to generate below the root (default: 1000).
+        seed (int, optional): Seed for the random generator, for reproducible datasets (default: 0).
+        deprecated_ratio (float, optional): Fraction of classes given a deprecation date (default: 0.05).
+
+    Returns:
+        list[dict]: A list of rows with the keys 'id', 'predicate', 'object' and 'g'.
+    """
+    rng = random.Random(seed)
+    root = "http://data.15926.org/dm/Thing"
+    rows = [
+        {"id": root, "predicate": RDFS_LABEL, "object": "Thing"},
+        {"id": root, "predicate": RDF_TYPE, "object": OWL_CLASS},
+    ]
+    nodes = [root]
+
+    for i in range(num_nodes):
+        # Place a few nodes in the smaller graphs, the rest in the RDL itself
+        if i % 50 == 0:
+            namespace = "lci"
+        elif i % 20 == 0:
+            namespace = "dm"
+        else:
+            namespace = "rdl"
+        uri = f"http://data.15926.org/{namespace}/RDS{i:07d}"
+
+        # Prefer recent nodes as parents to get a realistic, fairly deep hierarchy
+        parent = nodes[max(0, len(nodes) - 1 - int(rng.expovariate(0.05)))]
+
+        rows.append({"id": uri, "predicate": RDFS_LABEL, "object": f"CLASS {i}"})
+        rows.append({"id": uri, "predicate": RDF_TYPE, "object": OWL_CLASS})
+        rows.append({"id": uri, "predicate": RDFS_SUBCLASS_OF, "object": parent})
+        rows.append(
+            {
+                "id": uri,
+                "predicate": SKOS_DEFINITION,
+                "object": f"Synthetic class number {i}.",
+            }
+        )
+
+        # Some nodes have multiple parents
+        if len(nodes) > 2 and rng.random() < 0.05:
+            extra_parent = rng.choice(nodes)
+            if extra_parent != parent:
+                rows.append(
+                    {"id": uri, "predicate": RDFS_SUBCLASS_OF, "object": extra_parent}
+                )
+
+        if rng.random() < deprecated_ratio:
+            rows.append(
+                {"id": uri, "predicate": META_DEPRECATION, "object": "2021-03-21Z"}
+            )
+
+        nodes.append(uri)
+
+    # Attach the source graph of each triple, as returned by the endpoint
+    for row in rows:
+        namespace = row["id"].split("/")[3]
+        row["g"] = f"http://data.15926.org/{namespace}"
+
+    return rows
+
+
+def load_recorded_rows(path):
+    """
+    Loads a recorded dataset, i.e. a CSV file with the `SOURCE_QUERY` columns (id, predicate, object, g).
+
+    Args:
+        path (str): Path to the CSV recording.
+
+    Returns:
+        list[dict]: A list of rows with the keys 'id', 'predicate', 'object' and 'g'.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return [
+            {column: row.get(column, "") for column in CSV_COLUMNS}
+            for row in csv.DictReader(f)
+        ]
+
+
+def rows_to_csv(rows):
+    """
+    Serialises rows into the SPARQL CSV results format.
+    """
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class MockSparqlEndpoint:
+    """
+    A local stand-in for the `SOURCE_OF_TRUTH` SPARQL endpoint.
+
+    Answers `SOURCE_QUERY`-shaped requests (paged with LIMIT/OFFSET) in CSV from an in-memory
+    dataset, with optional latency and failure injection. Use as a context manager:
+
+        with MockSparqlEndpoint(rows, latency=0.01) as endpoint:
+            update_db(endpoint_url=endpoint.url)
+
+    Args:
+        rows (list[dict]): The dataset to serve (see `generate_synthetic_rows` and `load_recorded_rows`).
+        latency (float, optional): Seconds to wait before answering each request (default: 0).
+        failure_rate (float, optional): Probability of answering a request with HTTP 500 (default: 0).
+        fail_requests (set[int], optional): Request numbers (starting at 0) that always fail (default: None).
+        seed (int, optional): Seed for the failure injection (default: 0).
+    """
+
+    def __init__(self, rows, latency=0.0, failure_rate=0.0, fail_requests=None, seed=0):
+        self.rows = rows
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_requests = set(fail_requests or ())
+        self.request_count = 0
+        self.failure_count = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/sparql"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, query):
+        """
+        Computes the response for a query string.
+
+        Returns:
+            tuple[int, str]: The HTTP status code and the response body.
+        """
+        with self._lock:
+            request_number = self.request_count
+            self.request_count += 1
+            failed = (
+                request_number in self.fail_requests
+                or self._rng.random() < self.failure_rate
+            )
+            if failed:
+                self.failure_count += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if failed:
+            return 500, "Injected failure"
+
+        if not query:
+            return 400, "No query provided"
+
+        limit_match = LIMIT_PATTERN.search(query)
+        offset_match = OFFSET_PATTERN.search(query)
+        offset = int(offset_match.group(1)) if offset_match else 0
+        end = offset + int(limit_match.group(1)) if limit_match else len(self.rows)
+
+        return 200, rows_to_csv(self.rows[offset:end])
+
+    def _make_handler(self):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                self._answer(params.get("query", [None])[0])
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                if self.headers.get("Content-Type", "").startswith(
+                    "application/sparql-query"
+                ):
+                    self._answer(body)
+                else:
+                    self._answer(parse_qs(body).get("query", [None])[0])
+
+            def _answer(self, query):
+                status, body = endpoint.respond(query)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # Keep the benchmark and test output quiet
+
+        return Handler
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+import psutil
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_VERSION = 1
+
+
+# Current resident memory of the process in MB
+def get_rss_mb():
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class IngestReport:
+    """
+    Machine-readable report of a single `update_db` run.
+
+    Records the fetch latency, size, row count, parse time, insert time and memory of every batch,
+    the duration of each later stage (validation, hashing, saving, ...) and the totals of the run.
+    The report is saved as JSON, named after the start of the run, and the history entry created
+    by the run links to it so runs can be compared over time.
+
+    Args:
+        **settings: Settings of the run to record (e.g. endpoint URL and batch size).
+    """
+
+    def __init__(self, **settings):
+        self.started_at = datetime.now()
+        self.filename = f"{self.started_at.strftime('%Y-%m-%d-%H%M%S-%f')}.json"
+        self._start_time = time.perf_counter()
+        self.data = {
+            "version": REPORT_VERSION,
+            "started_at": self.started_at.strftime("%d-%m-%Y %H:%M:%S"),
+            "settings": settings,
+            "status": None,
+            "db_filename": None,
+            "batches": [],
+            "stages": {},
+            "totals": {},
+        }
+
+    def add_batch(
+        self, offset, fetch_seconds, num_bytes, rows, parse_seconds, insert_seconds
+    ):
+        self.data["batches"].append(
+            {
+                "offset": offset,
+                "fetch_seconds": fetch_seconds,
+                "bytes": num_bytes,
+                "rows": rows,
+                "parse_seconds": parse_seconds,
+                "insert_seconds": insert_seconds,
+                "rss_mb": get_rss_mb(),
+            }
+        )
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a stage of the run (recorded even if the stage raises an exception).
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.data["stages"][name] = {
+                "seconds": time.perf_counter() - start_time,
+                "rss_mb": get_rss_mb(),
+            }
+
+    def finish(self, status, db_filename=None, triples=0):
+        batches = self.data["batches"]
+        self.data["status"] = status
+        self.data["db_filename"] = db_filename
+        self.data["totals"] = {
+            "seconds": time.perf_counter() - self._start_time,
+            "batches": len(batches),
+            "bytes": sum(batch["bytes"] for batch in batches),
+            "rows": sum(batch["rows"] for batch in batches),
+            "triples": triples,
+            "fetch_seconds": sum(batch["fetch_seconds"] for batch in batches),
+            "parse_seconds": sum(batch["parse_seconds"] for batch in batches),
+            "insert_seconds": sum(batch["insert_seconds"] for batch in batches),
+            "peak_rss_mb": max(
+                [batch["rss_mb"] for batch in batches]
+                + [stage["rss_mb"] for stage in self.data["stages"].values()]
+                + [get_rss_mb()]
+            ),
+        }
+
+    def save(self, report_dir):
+        os.makedirs(report_dir, exist_ok=True)
+        with open(os.path.join(report_dir, self.filename), "w") as f:
+            json.dump(self.data, f, indent=4)
+        return self.filename
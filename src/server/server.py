@@ -2,6 +2,7 @@ import sys
 from rdflib import Graph
 from app import create_app
 from app.config import DeploymentConfig
+from app.caching import warm_response_cache
 from app.models import load_selected_db
 
 # Deployment Configuration
@@ -12,6 +13,7 @@ try:
     graph = Graph()
     graph = load_selected_db(graph=graph)
     flaskApp.graph = graph  # Store within app context
+    warm_response_cache(flaskApp)  # Compute the responses of the hot nodes now
 except Exception as e:
     print(f"Error loading database from history: {e}")
     sys.exit(1)
@@ -1,6 +1,7 @@
 import pytest
 from app import create_app
 from app.config import TestConfig
+from cli.mock_endpoint import MockSparqlEndpoint, generate_synthetic_rows
 from rdflib import Graph, Namespace, Literal, URIRef, RDF, RDFS
 
 
@@ -82,3 +83,13 @@ def test_client(sample_graph):
             flask_app.graph = sample_graph  # Assign the graph to the current app
 
             yield testing_client  # Yield the test client to the test functions
+
+
+@pytest.fixture
+def mock_sparql_endpoint():
+    """
+    Start a local stand-in for the SPARQL source of truth, serving a small synthetic RDL.
+    Latency and failures can be injected by changing the endpoint's attributes in the test.
+    """
+    with MockSparqlEndpoint(generate_synthetic_rows(num_nodes=200)) as endpoint:
+        yield endpoint
@@ -0,0 +1,129 @@
+import gzip
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from rdflib import BNode, Graph
+from rdflib.compare import isomorphic
+from cli.database import insert_results_into_rdflib
+from cli.delta import compute_content_hash, compute_subject_hashes
+from cli.importer import detect_dump_format, import_dump, map_in_order, parse_dump
+from cli.mock_endpoint import generate_synthetic_rows, rows_to_csv
+
+
+@pytest.fixture(scope="module")
+def dump_graph():
+    """
+    A synthetic RDL graph, built the same way `update_db` builds it.
+    """
+    graph = Graph()
+    insert_results_into_rdflib(
+        graph=graph, results_csv=rows_to_csv(generate_synthetic_rows(num_nodes=300))
+    )
+    return graph
+
+
+def test_detect_dump_format():
+    """
+    Test that dump formats are detected from their extension, including gzipped files.
+    """
+    assert detect_dump_format("rdl.nt") == "nt"
+    assert detect_dump_format("rdl.nt.gz") == "nt"
+    assert detect_dump_format("rdl.ttl.gz") == "turtle"
+
+    with pytest.raises(ValueError):
+        detect_dump_format("rdl.csv")
+
+
+def test_parse_dump_in_parallel_chunks(dump_graph, tmp_path):
+    """
+    Test that a gzipped N-Triples dump parsed in parallel chunks gives the same graph.
+    """
+    dump_file = tmp_path / "rdl.nt.gz"
+    with gzip.open(dump_file, "wb") as f:
+        f.write(dump_graph.serialize(format="nt", encoding="utf-8"))
+
+    graph = parse_dump(str(dump_file), workers=2, chunk_size=100)
+
+    assert len(graph) == len(dump_graph)
+    assert isomorphic(graph, dump_graph)
+
+
+def test_parse_dump_blank_nodes_across_chunks(tmp_path):
+    """
+    Test that a blank node whose triples fall in different chunks stays one node, with the same id on every parse.
+    """
+    dump_file = tmp_path / "bnodes.nt"
+    dump_file.write_text(
+        '_:b1 <http://www.w3.org/2000/01/rdf-schema#label> "Blank" .\n'
+        "_:b1 <http://www.w3.org/2000/01/rdf-schema#subClassOf> <http://data.15926.org/dm/Thing> .\n"
+        "<http://data.15926.org/dm/Thing> <http://www.w3.org/2000/01/rdf-schema#seeAlso> _:b1 .\n"
+    )
+
+    graph = parse_dump(str(dump_file), workers=2, chunk_size=1)
+
+    assert {node for node in graph.all_nodes() if isinstance(node, BNode)} == {
+        BNode("b1")
+    }
+
+    other_graph = parse_dump(str(dump_file), workers=2, chunk_size=1)
+    assert compute_content_hash(compute_subject_hashes(graph)) == compute_content_hash(
+        compute_subject_hashes(other_graph)
+    )
+
+
+def test_map_in_order_bounded_window():
+    """
+    Test that chunks are only read as their results are consumed, and results keep the order of the chunks.
+    """
+    read = []
+
+    def chunks():
+        for i in range(20):
+            read.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = map_in_order(executor, lambda x: x * 2, chunks(), window=4)
+        assert next(results) == 0
+        assert len(read) == 4
+        assert list(results) == [x * 2 for x in range(1, 20)]
+
+
+def test_import_turtle_dump(dump_graph, tmp_path):
+    """
+    Test that a Turtle dump is imported, saved and registered as the current database.
+    """
+    dump_file = tmp_path / "rdl.ttl"
+    dump_graph.serialize(destination=str(dump_file), format="turtle")
+    storage_dir = tmp_path / "storage"
+    history_file = tmp_path / "history.json"
+
+    db_filename = import_dump(
+        str(dump_file), storage_dir=str(storage_dir), history_file=str(history_file)
+    )
+
+    assert db_filename is not None
+    assert (storage_dir / db_filename).exists()
+    with open(history_file, "r") as f:
+        assert json.load(f)["current_db"] == db_filename
+
+
+def test_import_invalid_dump(tmp_path):
+    """
+    Test that a dump failing the database validations is not registered.
+    """
+    dump_file = tmp_path / "small.nt"
+    dump_file.write_text(
+        '<http://data.15926.org/dm/Thing> <http://www.w3.org/2000/01/rdf-schema#label> "Thing" .\n'
+    )
+    history_file = tmp_path / "history.json"
+
+    db_filename = import_dump(
+        str(dump_file),
+        workers=1,
+        storage_dir=str(tmp_path / "storage"),
+        history_file=str(history_file),
+    )
+
+    assert db_filename is None
+    assert not history_file.exists()
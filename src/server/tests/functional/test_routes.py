@@ -1,3 +1,10 @@
+import gzip
+import json
+from app import models
+from app.config import Config
+from rdflib import Graph, URIRef
+
+
 def test_health_check(test_client):
     """
     Use a GET request to route '/ping' to check the response is valid.
@@ -149,3 +156,891 @@ def test_selected_info_route_invalid_id(test_client):
         json_data["error"]
         == f"URI '{invalid_node_uri}' does not exist within the database"
     )
+
+
+def test_reload_keeps_graph_with_identical_content(test_client, tmp_path, monkeypatch):
+    """
+    Test that '/ctrl/reload' keeps the loaded graph when the selected database has the same content hash.
+    """
+    history_file = tmp_path / "history.json"
+    history_file.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "databases": [
+                    {"filename": "2024-10-09-1.ttl", "hash": "abc"},
+                    {"filename": "2024-10-10-1.ttl", "hash": "abc"},
+                ],
+                "current_db": "2024-10-10-1.ttl",
+            }
+        )
+    )
+    monkeypatch.setattr(Config, "DB_HISTORY_FILE", str(history_file))
+    monkeypatch.setattr(models, "loaded_db_file", "2024-10-09-1.ttl")
+    monkeypatch.setattr(models, "loaded_db_hash", "abc")
+    graph = test_client.application.graph
+
+    response = test_client.get("/ctrl/reload")
+
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "success"
+    assert test_client.application.graph is graph
+    assert models.loaded_db_file == "2024-10-10-1.ttl"
+
+    # Loading directly parses the selected file, even with the same content as the loaded one
+    storage_dir = tmp_path / "storage"
+    storage_dir.mkdir()
+    graph.serialize(destination=str(storage_dir / "2024-10-11-1.ttl"), format="turtle")
+    history_data = json.loads(history_file.read_text())
+    history_data["databases"].append({"filename": "2024-10-11-1.ttl", "hash": "abc"})
+    history_data["current_db"] = "2024-10-11-1.ttl"
+    history_file.write_text(json.dumps(history_data))
+    monkeypatch.setattr(Config, "DB_STORAGE_DIR", str(storage_dir))
+
+    loaded_graph = models.load_selected_db(Graph())
+    assert len(loaded_graph) == len(graph)
+    assert models.loaded_db_file == "2024-10-11-1.ttl"
+
+
+def test_children_batch_route(test_client):
+    """
+    Test the '/node/children/batch' route returns the same children as '/node/children' for each node.
+    """
+    uris = ["http://data.15926.org/dm/Thing", "http://data.15926.org/dm/Child4"]
+    response = test_client.post(
+        "/node/children/batch", json={"uris": uris, "dep": True}
+    )
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["errors"] == {}
+    for uri in uris:
+        single = test_client.get(f"/node/children/{uri}?dep=true").get_json()
+        assert json_data["children"][uri] == single["children"]
+
+
+def test_children_batch_route_invalid(test_client):
+    """
+    Test the '/node/children/batch' route with a missing list of URIs and a non-existent URI.
+    """
+    response = test_client.post("/node/children/batch", json={})
+    assert response.status_code == 400
+
+    uris = [
+        f"http://data.15926.org/dm/Child{i}" for i in range(Config.MAX_BATCH_URIS + 1)
+    ]
+    response = test_client.post("/node/children/batch", json={"uris": uris})
+    assert response.status_code == 400
+
+    invalid_uri = "http://data.15926.org/dm/NonExistent"
+    response = test_client.post("/node/children/batch", json={"uris": [invalid_uri]})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["children"] == {}
+    assert (
+        json_data["errors"][invalid_uri]
+        == f"URI '{invalid_uri}' does not exist within the database"
+    )
+
+
+def test_info_batch_route(test_client):
+    """
+    Test the '/node/info/batch' route returns the node information and the labels of referenced URIs.
+    """
+    uris = ["http://data.15926.org/dm/Child2", "http://data.15926.org/dm/Child3"]
+    response = test_client.post("/node/info/batch", json={"uris": uris})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    for uri in uris:
+        assert (
+            json_data["nodes"][uri] == test_client.get(f"/node/info/{uri}").get_json()
+        )
+    assert json_data["labels"]["http://data.15926.org/dm/Child1"] == "Child One"
+    assert (
+        json_data["labels"]["http://data.15926.org/dm/ExtraParent"] == "Another Parent"
+    )
+    assert json_data["errors"] == {}
+
+
+def test_selected_info_batch_route(test_client):
+    """
+    Test the '/node/selected-info/batch' route returns the selected information of each node.
+    """
+    uris = [
+        "http://data.15926.org/dm/Thing",
+        "http://data.15926.org/dm/NonExistentNode",
+    ]
+    response = test_client.post("/node/selected-info/batch", json={"uris": uris})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert (
+        json_data["nodes"][uris[0]]
+        == test_client.get(f"/node/selected-info/{uris[0]}").get_json()
+    )
+    assert json_data["labels"] == {uris[0]: "Thing"}
+    assert uris[1] in json_data["errors"]
+
+    response = test_client.post("/node/selected-info/batch", json={"uris": "Thing"})
+    assert response.status_code == 400
+
+    # Both info batches are capped
+    uris = ["http://data.15926.org/dm/Thing"] * (Config.MAX_BATCH_URIS + 1)
+    for url in ("/node/info/batch", "/node/selected-info/batch"):
+        assert test_client.post(url, json={"uris": uris}).status_code == 400
+
+
+def test_subtree_route(test_client):
+    """
+    Test the '/graph/subtree/<uri>' route returns the node table and edge list of the subtree.
+    """
+    response = test_client.get(
+        "/graph/subtree/http://data.15926.org/dm/Thing?depth=1&dep=true"
+    )
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["root_id"] == "http://data.15926.org/dm/Thing"
+    assert [node["label"] for node in json_data["nodes"]] == [
+        "Thing",
+        "Child Four",
+        "Child One",
+        "Child Two",
+    ]
+    assert len(json_data["edges"]) == 3
+    assert json_data["truncated"] is False
+
+    response = test_client.get("/graph/subtree/http://data.15926.org/dm/NonExistent")
+    assert response.status_code == 404
+
+    response = test_client.get(
+        "/graph/subtree/http://data.15926.org/dm/Thing?depth=deep"
+    )
+    assert response.status_code == 400
+
+
+def test_local_hierarchy_route(test_client):
+    """
+    Test the '/graph/local-hierarchy/<uri>' route returns the hierarchy from the root to the node.
+    """
+    response = test_client.get(
+        "/graph/local-hierarchy/http://data.15926.org/dm/Child4?dep=true"
+    )
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["centre_id"] == "http://data.15926.org/dm/Child4"
+    assert json_data["hierarchy"]["id"] == "http://data.15926.org/dm/Thing"
+    centre = json_data["hierarchy"]["children"][0]
+    assert centre["centre"] is True
+    assert [child["id"] for child in centre["children"]] == [
+        "http://data.15926.org/dm/Child5"
+    ]
+
+    response = test_client.get(
+        "/graph/local-hierarchy/http://data.15926.org/dm/NonExistent"
+    )
+    assert response.status_code == 404
+
+
+def test_ancestors_route(test_client):
+    """
+    Test the '/graph/ancestors/<uri>' route returns all the ancestors of a multi-parent node.
+    """
+    response = test_client.get(
+        "/graph/ancestors/http://data.15926.org/dm/Child2?paths=true"
+    )
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["id"] == "http://data.15926.org/dm/Child2"
+    assert [node["label"] for node in json_data["nodes"]] == [
+        "Child Two",
+        "Another Parent",
+        "Thing",
+    ]
+    assert len(json_data["paths"]) == 2
+    assert json_data["truncated"] is False
+
+    response = test_client.get("/graph/ancestors/http://data.15926.org/dm/NonExistent")
+    assert response.status_code == 404
+
+
+def test_is_descendant_route(test_client):
+    """
+    Test the '/graph/is-descendant' route answers each pair in order and reports unknown URIs.
+    """
+    thing = "http://data.15926.org/dm/Thing"
+    invalid_uri = "http://data.15926.org/dm/NonExistent"
+    pairs = [
+        ["http://data.15926.org/dm/Child2", thing],
+        [thing, "http://data.15926.org/dm/Child2"],
+        ["http://data.15926.org/dm/Child3", thing],
+        [invalid_uri, thing],
+    ]
+
+    response = test_client.post("/graph/is-descendant", json={"pairs": pairs})
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["results"] == [True, False, False, None]
+    assert list(json_data["errors"]) == [invalid_uri]
+
+    response = test_client.post(
+        "/graph/is-descendant", json={"pairs": pairs[:3], "dep": True}
+    )
+    assert response.get_json()["results"] == [True, False, True]
+
+    response = test_client.post("/graph/is-descendant", json={"pairs": [[thing]]})
+    assert response.status_code == 400
+
+    pairs = [[thing, thing]] * (Config.MAX_BATCH_URIS + 1)
+    response = test_client.post("/graph/is-descendant", json={"pairs": pairs})
+    assert response.status_code == 400
+
+
+def test_lca_and_path_routes(test_client):
+    """
+    Test the '/graph/lca/<a>/<b>' and '/graph/path/<a>/<b>' routes relate two nodes through the hierarchy.
+    """
+    child2 = "http://data.15926.org/dm/Child2"
+    child4 = "http://data.15926.org/dm/Child4"
+    thing = "http://data.15926.org/dm/Thing"
+
+    response = test_client.get(f"/graph/lca/{child2}/{child4}")
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert (json_data["a"], json_data["b"]) == (child2, child4)
+    assert json_data["lca"] == [thing]
+
+    response = test_client.get(f"/graph/path/{child2}/{child4}")
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data["path"] == [child2, thing, child4]
+    assert json_data["nodes"][1] == {"id": thing, "label": "Thing"}
+
+    response = test_client.get(f"/graph/path/{child2}")
+    assert response.status_code == 400
+
+    response = test_client.get(f"/graph/lca/{child2}/http://data.15926.org/dm/None")
+    assert response.status_code == 404
+
+
+def test_stats_on_children_selected_info_and_search(test_client):
+    """
+    Test the subtree stats are only returned when requested with 'stats=true'.
+    """
+    thing = "http://data.15926.org/dm/Thing"
+
+    children = test_client.get(f"/node/children/{thing}?stats=true").get_json()
+    child4 = children["children"][0]
+    assert child4["id"] == "http://data.15926.org/dm/Child4"
+    assert (child4["depth"], child4["child_count"], child4["descendant_count"]) == (
+        1,
+        0,
+        0,
+    )
+    assert (
+        "depth"
+        not in test_client.get(f"/node/children/{thing}").get_json()["children"][0]
+    )
+
+    node_info = test_client.get(
+        f"/node/selected-info/{thing}?dep=true&stats=true"
+    ).get_json()
+    assert node_info["descendant_count"] == 5
+
+    # The deprecated Child1 counts the child it lists as a descendant
+    node_info = test_client.get(
+        "/node/selected-info/http://data.15926.org/dm/Child1?stats=true&dep=false"
+    ).get_json()
+    assert (node_info["child_count"], node_info["descendant_count"]) == (1, 1)
+
+    results = test_client.get("/search/label/Thing?stats=true").get_json()["results"]
+    assert results[0]["child_count"] == 2
+
+
+def test_graph_children_route_paginated(test_client):
+    """
+    Test the '/node/children/<uri>' route returns pages of children when a limit is given.
+    """
+    thing = "http://data.15926.org/dm/Thing"
+
+    response = test_client.get(f"/node/children/{thing}?dep=true&limit=2")
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert [child["label"] for child in json_data["children"]] == [
+        "Child Four",
+        "Child One",
+    ]
+    assert json_data["total"] == 3
+
+    response = test_client.get(
+        f"/node/children/{thing}?dep=true&limit=2&cursor={json_data['next_cursor']}"
+    )
+    json_data = response.get_json()
+
+    assert [child["label"] for child in json_data["children"]] == ["Child Two"]
+    assert json_data["next_cursor"] is None
+
+    response = test_client.get(f"/node/children/{thing}?limit=2&cursor=next")
+    assert response.status_code == 400
+
+
+def test_conditional_get(test_client):
+    """
+    Test read routes send an ETag, and answer a matching 'If-None-Match' with '304 Not Modified'.
+    """
+    url = "/node/children/http://data.15926.org/dm/Thing?dep=true&order=true"
+
+    response = test_client.get(url)
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, no-cache"
+
+    response = test_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    # The order of the query parameters does not matter, their values do
+    reordered = "/node/children/http://data.15926.org/dm/Thing?order=true&dep=true"
+    assert test_client.get(reordered).headers["ETag"] == etag
+    other = test_client.get("/node/children/http://data.15926.org/dm/Thing?dep=false")
+    assert other.headers["ETag"] != etag
+
+    # Errors are not cached
+    response = test_client.get("/node/children/http://data.15926.org/dm/NonExistent")
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_conditional_get_new_generation(test_client):
+    """
+    Test the ETags change when another database is loaded.
+    """
+    url = "/node/info/http://data.15926.org/dm/Thing"
+    etag = test_client.get(url).headers["ETag"]
+    graph = test_client.application.graph
+
+    try:
+        other_graph = Graph()
+        for triple in graph:
+            other_graph.add(triple)
+        test_client.application.graph = other_graph
+
+        response = test_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+    finally:
+        test_client.application.graph = graph
+
+
+def test_response_cache(test_client):
+    """
+    Test hot routes are served from the response cache, warmed from the access statistics.
+    """
+    from app.caching import access_stats, response_cache, warm_response_cache
+
+    url = "/node/children/http://data.15926.org/dm/Child4"
+    first = test_client.get(url, query_string={"dep": "true"})
+    hits = response_cache.hits
+    second = test_client.get(url, query_string={"dep": "true"})
+    assert second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert response_cache.hits == hits + 1
+
+    # Errors are not cached
+    test_client.get("/node/children/http://data.15926.org/dm/Missing")
+    test_client.get("/node/children/http://data.15926.org/dm/Missing")
+    assert response_cache.hits == hits + 1
+
+    # Warming empties the cache and computes the requested responses again
+    assert any(key[1] == url for key, _ in access_stats.most_common())
+    warm_response_cache(test_client.application)
+    hits = response_cache.hits
+    assert test_client.get("/node/root").status_code == 200
+    assert test_client.get(url, query_string={"dep": "true"}).get_json() == (
+        first.get_json()
+    )
+    assert response_cache.hits == hits + 2
+
+
+def test_response_cache_warm_size(test_client):
+    """
+    Test the number of warmed responses follows the configuration of the app.
+    """
+    from app.caching import response_cache, warm_response_cache
+
+    app = test_client.application
+    test_client.get("/node/children/http://data.15926.org/dm/Child4")
+    warm_size = app.config["RESPONSE_CACHE_WARM_SIZE"]
+    try:
+        app.config["RESPONSE_CACHE_WARM_SIZE"] = 2
+        assert warm_response_cache(app) == 2
+        assert len(response_cache) == 2
+    finally:
+        app.config["RESPONSE_CACHE_WARM_SIZE"] = warm_size
+
+
+def test_response_cache_new_generation(test_client):
+    """
+    Test cached responses are not served once another database is loaded.
+    """
+    from app.caching import response_cache
+
+    url = "/node/children/http://data.15926.org/dm/Thing"
+    test_client.get(url)
+    graph = test_client.application.graph
+
+    try:
+        other_graph = Graph()
+        for triple in graph:
+            other_graph.add(triple)
+        other_graph.remove((URIRef("http://data.15926.org/dm/Child4"), None, None))
+        test_client.application.graph = other_graph
+
+        hits = response_cache.hits
+        children = test_client.get(url).get_json()["children"]
+        assert response_cache.hits == hits
+        assert "http://data.15926.org/dm/Child4" not in [c["id"] for c in children]
+    finally:
+        test_client.application.graph = graph
+
+
+def test_response_compression(test_client):
+    """
+    Test JSON responses above the size threshold are gzipped for clients accepting it.
+    """
+    app = test_client.application
+    url = "/node/info/http://data.15926.org/dm/Thing"
+    plain = test_client.get(url)
+    assert plain.headers.get("Content-Encoding") is None
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    # Below the threshold, responses are not compressed
+    small = test_client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert small.headers.get("Content-Encoding") is None
+
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    try:
+        response = test_client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+
+        # The compressed representation has its own ETag, and can be revalidated
+        assert response.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+        response = test_client.get(
+            url,
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["ETag"],
+            },
+        )
+        assert response.status_code == 304
+    finally:
+        app.config["COMPRESS_MIN_SIZE"] = min_size
+
+
+def test_response_cache_precompressed(test_client):
+    """
+    Test the response cache keeps the compressed bodies of its responses.
+    """
+    from app.caching import response_cache
+
+    app = test_client.application
+    url = "/node/children/http://data.15926.org/dm/Thing"
+    plain = test_client.get(url).get_json()
+
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    try:
+        test_client.get(url, headers={"Accept-Encoding": "gzip"})
+        hits = response_cache.hits
+        response = test_client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response_cache.hits == hits + 2  # Identity and gzip bodies
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"].endswith('-gzip"')
+        assert json.loads(gzip.decompress(response.data)) == plain
+    finally:
+        app.config["COMPRESS_MIN_SIZE"] = min_size
+
+
+def test_fragment_responses(test_client):
+    """
+    Test the children, parents and search responses written from node fragments are identical
+    to the responses serialised from dictionaries.
+    """
+    from app.caching import response_cache
+
+    app = test_client.application
+    urls = [
+        "/node/children/http://data.15926.org/dm/Thing",
+        "/node/children/http://data.15926.org/dm/Thing?dep=true&stats=true",
+        "/node/children/http://data.15926.org/dm/Thing?extra_parents=false&has_children=false",
+        "/node/children/http://data.15926.org/dm/Child4?dep=true",
+        "/node/parents/http://data.15926.org/dm/Child2",
+        "/node/parents/http://data.15926.org/dm/Child3?dep=true&children_ex_parents=true",
+        "/node/parents/http://data.15926.org/dm/Child2?extra_children=false&has_parent=false",
+        "/search/label/Child?limit=10&similarity=0&dep=true&stats=true",
+        "/search/id/Child5?limit=10&similarity=0",
+        "/node/children/http://data.15926.org/dm/Missing",
+    ]
+
+    app.json.compact = True
+    try:
+        for url in urls:
+            responses = []
+            for enabled in (True, False):
+                app.config["JSON_FRAGMENTS"] = enabled
+                response_cache.clear()
+                responses.append(test_client.get(url))
+
+            assert responses[0].status_code == responses[1].status_code
+            assert responses[0].data == responses[1].data, url
+    finally:
+        app.json.compact = None
+        app.config["JSON_FRAGMENTS"] = True
+
+
+def test_sparse_fieldsets_routes(test_client):
+    """
+    Test the node routes only return the requested fields of each node.
+    """
+    from app.caching import response_cache
+
+    response = test_client.get("/node/root?fields=label")
+    assert response.get_json() == {
+        "id": "http://data.15926.org/dm/Thing",
+        "label": "Thing",
+    }
+
+    url = "/node/children/http://data.15926.org/dm/Thing?fields=label,extra_parents"
+    children = test_client.get(url).get_json()["children"]
+    assert children[1] == {
+        "id": "http://data.15926.org/dm/Child2",
+        "label": "Child Two",
+        "extra_parents": [{"id": "http://data.15926.org/dm/ExtraParent"}],
+    }
+
+    url = "/node/parents/http://data.15926.org/dm/Child2?fields=has_parents"
+    parents = test_client.get(url).get_json()["parents"]
+    assert parents == [
+        {"id": "http://data.15926.org/dm/ExtraParent", "has_parents": False},
+        {"id": "http://data.15926.org/dm/Thing", "has_parents": False},
+    ]
+
+    url = "/node/info/http://data.15926.org/dm/Child1?fields=definition"
+    assert test_client.get(url).get_json() == {
+        "id": "http://data.15926.org/dm/Child1",
+        "definition": "Child One is a sample node.",
+    }
+
+    response = test_client.post(
+        "/node/selected-info/batch",
+        json={"uris": ["http://data.15926.org/dm/Child2"], "fields": ["has_parents"]},
+    )
+    assert response.get_json()["nodes"] == {
+        "http://data.15926.org/dm/Child2": {
+            "id": "http://data.15926.org/dm/Child2",
+            "has_parents": True,
+        }
+    }
+    assert response.get_json()["labels"] == {
+        "http://data.15926.org/dm/Child2": "Child Two"
+    }
+
+    response = test_client.post(
+        "/node/children/batch",
+        json={"uris": ["http://data.15926.org/dm/Thing"], "fields": 1},
+    )
+    assert response.status_code == 400
+
+    # Same fields when written from node fragments
+    app = test_client.application
+    app.json.compact = True
+    try:
+        for url in [
+            "/node/children/http://data.15926.org/dm/Thing?fields=dep,has_children&dep=true",
+            "/node/children/http://data.15926.org/dm/Thing?fields=label,depth&stats=true",
+            "/node/parents/http://data.15926.org/dm/Child2?fields=label,extra_children",
+        ]:
+            responses = []
+            for enabled in (True, False):
+                app.config["JSON_FRAGMENTS"] = enabled
+                response_cache.clear()
+                responses.append(test_client.get(url))
+            assert responses[0].data == responses[1].data, url
+    finally:
+        app.json.compact = None
+        app.config["JSON_FRAGMENTS"] = True
+
+
+def test_expand_labels(test_client):
+    """
+    Test the labels of the referenced URIs are included in the same response when requested.
+    """
+    from app.caching import response_cache
+
+    url = "/node/children/http://data.15926.org/dm/Thing"
+    child = test_client.get(url).get_json()["children"][1]
+    assert child["extra_parents"] == [{"id": "http://data.15926.org/dm/ExtraParent"}]
+
+    child = test_client.get(url + "?expand_labels=true").get_json()["children"][1]
+    assert child["extra_parents"] == [
+        {"id": "http://data.15926.org/dm/ExtraParent", "label": "Another Parent"}
+    ]
+
+    url = "/graph/local-hierarchy/http://data.15926.org/dm/Child2?expand_labels=true"
+    hierarchy = test_client.get(url).get_json()["hierarchy"]
+    extra_parents = [child for child in hierarchy["children"] if child.get("centre")][
+        0
+    ]["extra_parents"]
+    assert extra_parents == [{"id": "http://data.15926.org/dm/Thing", "label": "Thing"}]
+
+    url = "/node/info/http://data.15926.org/dm/Child1"
+    assert "labels" not in test_client.get(url).get_json()
+    info = test_client.get(url + "?expand_labels=true").get_json()
+    assert info["labels"] == {
+        "http://data.15926.org/dm/Thing": "Thing",
+        "http://data.15926.org/dm/ChildType": None,
+        "http://data.15926.org/dm/AnotherType": None,
+    }
+
+    # Same labels when written from node fragments
+    app = test_client.application
+    app.json.compact = True
+    try:
+        for url in [
+            "/node/children/http://data.15926.org/dm/Thing?expand_labels=true",
+            "/node/parents/http://data.15926.org/dm/Child3?dep=true&children_ex_parents=true&expand_labels=true",
+        ]:
+            responses = []
+            for enabled in (True, False):
+                app.config["JSON_FRAGMENTS"] = enabled
+                response_cache.clear()
+                responses.append(test_client.get(url))
+            assert responses[0].data == responses[1].data, url
+    finally:
+        app.json.compact = None
+        app.config["JSON_FRAGMENTS"] = True
+
+
+def test_coalesced_requests(test_client, monkeypatch):
+    """
+    Test identical concurrent requests share one computation, and the counters report it.
+    """
+    import threading
+    import time
+    from app import controllers
+    from app.caching import single_flight
+
+    get_local_hierarchy_to_root = controllers.get_local_hierarchy_to_root
+    calls = []
+    release = threading.Event()
+
+    def slow_local_hierarchy(*args, **kwargs):
+        calls.append(1)
+        release.wait(timeout=10)
+        return get_local_hierarchy_to_root(*args, **kwargs)
+
+    monkeypatch.setattr(
+        controllers, "get_local_hierarchy_to_root", slow_local_hierarchy
+    )
+
+    app = test_client.application
+    url = "/graph/local-hierarchy/http://data.15926.org/dm/Child3?dep=true&order=1"
+    stats = test_client.get("/ctrl/stats").get_json()["coalescing"]
+    responses = []
+
+    def fetch():
+        with app.test_client() as client:
+            responses.append(client.get(url))
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    # Let the leader finish once the other requests wait for it
+    deadline = time.monotonic() + 10
+    while single_flight.coalesced < stats["coalesced"] + 3:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.data for response in responses}) == 1
+
+    new_stats = test_client.get("/ctrl/stats").get_json()["coalescing"]
+    assert new_stats["computations"] == stats["computations"] + 1
+    assert new_stats["coalesced"] == stats["coalesced"] + 3
+    assert new_stats["in_flight"] == 0
+
+
+def test_coalesced_interrupted_leader():
+    """
+    Test the callers waiting for a leader interrupted by a BaseException get its exception, not a missing result.
+    """
+    import threading
+    import time
+    from app.caching import SingleFlight
+
+    class Interrupted(BaseException):
+        pass
+
+    single_flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def interrupted():
+        release.wait(timeout=10)
+        raise Interrupted()
+
+    def call():
+        try:
+            single_flight.do("key", interrupted)
+        except Interrupted as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.monotonic() + 10
+    while single_flight.coalesced < 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_search_admission(test_client):
+    """
+    Test searches beyond the admission limits are rejected with 429, and the counters report it.
+    """
+    app = test_client.application
+    stats = test_client.get("/ctrl/stats").get_json()["search_admission"]
+
+    app.config["SEARCH_MAX_CONCURRENT"] = 0
+    app.config["SEARCH_MAX_QUEUE"] = 0
+    try:
+        response = test_client.get("/search/label/Thing")
+    finally:
+        app.config["SEARCH_MAX_CONCURRENT"] = Config.SEARCH_MAX_CONCURRENT
+        app.config["SEARCH_MAX_QUEUE"] = Config.SEARCH_MAX_QUEUE
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "error" in response.get_json()
+
+    response = test_client.get("/search/label/Thing")
+    assert response.status_code == 200
+    assert response.get_json()["truncated"] is False
+
+    new_stats = test_client.get("/ctrl/stats").get_json()["search_admission"]
+    assert new_stats["rejected"] == stats["rejected"] + 1
+    assert new_stats["admitted"] == stats["admitted"] + 1
+    assert new_stats["running"] == 0 and new_stats["queued"] == 0
+
+
+def test_search_time_budget(test_client, monkeypatch):
+    """
+    Test a search exceeding its time budget returns the results found so far, flagged as truncated and not cached.
+    """
+    app = test_client.application
+    monkeypatch.setattr(Config, "SEARCH_CHUNK_SIZE", 1)
+    app.config["SEARCH_TIME_BUDGET"] = 1e-9
+    try:
+        for fragments in (True, False):
+            app.config["JSON_FRAGMENTS"] = fragments
+            response = test_client.get(
+                "/search/label/Child?limit=5&similarity=0&dep=true"
+            )
+            assert response.status_code == 200
+            assert response.get_json()["truncated"] is True
+            assert len(response.get_json()["results"]) == 1
+            assert response.headers.get("ETag") is None
+            assert "no-store" in response.headers["Cache-Control"]
+    finally:
+        app.config["SEARCH_TIME_BUDGET"] = Config.SEARCH_TIME_BUDGET
+        app.config["JSON_FRAGMENTS"] = True
+
+    response = test_client.get("/search/label/Child?limit=5&similarity=0&dep=true")
+    assert response.get_json()["truncated"] is False
+    assert len(response.get_json()["results"]) > 1
+    assert response.headers.get("ETag") is not None
+
+
+def test_metrics(test_client):
+    """
+    Test the metrics report the requests per route and status, with their latency and size histograms,
+    along with the gauges of the graph and the cache counters.
+    """
+    test_client.get("/node/root")
+    test_client.get("/node/info/http://data.15926.org/dm/Missing")
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+
+    root = 'method="GET",route="/node/root",status="200"'
+    missing = 'method="GET",route="/node/info/<path:node_uri>",status="404"'
+    assert samples[f"rdl_http_requests_total{{{root}}}"] >= 1
+    assert samples[f"rdl_http_requests_total{{{missing}}}"] >= 1
+    assert (
+        samples[f'rdl_http_request_duration_seconds_bucket{{{root},le="+Inf"}}']
+        == samples[f"rdl_http_request_duration_seconds_count{{{root}}}"]
+        == samples[f"rdl_http_requests_total{{{root}}}"]
+    )
+    assert samples[f"rdl_http_response_size_bytes_sum{{{root}}}"] > 0
+    assert (
+        samples[f'rdl_http_response_size_bytes_bucket{{{root},le="256"}}']
+        <= samples[f'rdl_http_response_size_bytes_bucket{{{root},le="+Inf"}}']
+    )
+
+    graph = test_client.application.graph
+    assert samples["rdl_graph_triples"] == len(graph)
+    assert samples["rdl_graph_nodes"] > 0
+    assert 0 <= samples["rdl_response_cache_hit_ratio"] <= 1
+    assert "rdl_search_rejected_total" in samples
+
+
+def test_metrics_without_graph():
+    """
+    Test the metrics are still served while no graph is loaded, without the graph metrics.
+    """
+    from app import create_app
+    from app.config import TestConfig
+
+    app = create_app(TestConfig)
+    with app.test_client() as client:
+        client.get("/ping")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    metrics = response.get_data(as_text=True)
+    assert 'rdl_http_requests_total{method="GET",route="/ping",status="200"}' in metrics
+    assert "rdl_response_cache_hit_ratio" in metrics
+    assert "rdl_search_rejected_total" in metrics
+    assert "rdl_graph_" not in metrics
@@ -0,0 +1,201 @@
+import json
+import os
+from rdflib import Graph, URIRef
+from rdflib.compare import isomorphic
+from app import models
+from app.config import Config
+from cli.database import insert_results_into_rdflib, update_db
+from cli.mock_endpoint import rows_to_csv
+
+
+def test_update_db_from_mock_endpoint(mock_sparql_endpoint, tmp_path):
+    """
+    Test that `update_db` downloads the whole dataset in batches, saves it and registers it in the history.
+    """
+    storage_dir = tmp_path / "storage"
+    history_file = tmp_path / "history.json"
+
+    db_filename = update_db(
+        endpoint_url=mock_sparql_endpoint.url,
+        batch_size=100,
+        storage_dir=str(storage_dir),
+        history_file=str(history_file),
+    )
+
+    # The database was saved and marked as current
+    assert db_filename is not None
+    assert (storage_dir / db_filename).exists()
+    with open(history_file, "r") as f:
+        history_data = json.load(f)
+    assert history_data["current_db"] == db_filename
+
+    # All batches were requested, plus the final empty one
+    num_rows = len(mock_sparql_endpoint.rows)
+    assert mock_sparql_endpoint.request_count == -(-num_rows // 100) + 1
+
+    # The saved database contains the served data
+    graph = Graph().parse(str(storage_dir / db_filename), format="turtle")
+    assert len(graph) == num_rows
+    assert any(graph.triples((URIRef("http://data.15926.org/dm/Thing"), None, None)))
+
+
+def test_update_db_aborts_on_endpoint_failure(mock_sparql_endpoint, tmp_path):
+    """
+    Test that a failing request aborts the update without saving a database or touching the history.
+    """
+    mock_sparql_endpoint.fail_requests = {1}  # Fail the second batch
+
+    db_filename = update_db(
+        endpoint_url=mock_sparql_endpoint.url,
+        batch_size=100,
+        storage_dir=str(tmp_path / "storage"),
+        history_file=str(tmp_path / "history.json"),
+    )
+
+    assert db_filename is None
+    assert mock_sparql_endpoint.failure_count == 1
+    assert not os.path.exists(tmp_path / "history.json")
+    assert not os.path.exists(tmp_path / "storage")
+
+
+def test_delta_update_db(mock_sparql_endpoint, tmp_path, monkeypatch):
+    """
+    Test that a delta refresh stores only the changed subjects, and that loading the delta
+    on top of its parent gives the same graph as a full download.
+    """
+    storage_dir = tmp_path / "storage"
+    history_file = tmp_path / "history.json"
+    update_args = {
+        "endpoint_url": mock_sparql_endpoint.url,
+        "batch_size": 500,
+        "storage_dir": str(storage_dir),
+        "history_file": str(history_file),
+    }
+
+    # The first refresh has nothing to compare to, so stores a full database
+    base_filename = update_db(delta=True, **update_args)
+    assert not base_filename.endswith(".delta.ttl")
+
+    # Change a label, remove a class and add a class in the source
+    rows = mock_sparql_endpoint.rows
+    removed_uri = rows[-1]["id"]
+    rows[:] = [row for row in rows if row["id"] != removed_uri]
+    rows[2]["object"] = "CHANGED LABEL"
+    rows.append(
+        {
+            "id": "http://data.15926.org/rdl/NewClass",
+            "predicate": "http://www.w3.org/2000/01/rdf-schema#label",
+            "object": "NEW CLASS",
+            "g": "http://data.15926.org/rdl",
+        }
+    )
+
+    delta_filename = update_db(delta=True, **update_args)
+    assert delta_filename.endswith(".delta.ttl")
+    assert (storage_dir / delta_filename).stat().st_size < (
+        storage_dir / base_filename
+    ).stat().st_size / 10
+
+    with open(history_file, "r") as f:
+        history_data = json.load(f)
+    assert history_data["current_db"] == delta_filename
+    assert history_data["databases"][-1]["parent"] == base_filename
+
+    # Loading base + delta gives the same graph as the source
+    monkeypatch.setattr(Config, "DB_STORAGE_DIR", str(storage_dir))
+    monkeypatch.setattr(Config, "DB_HISTORY_FILE", str(history_file))
+    monkeypatch.setattr(models, "loaded_db_file", None)
+    graph = models.load_selected_db(Graph())
+
+    expected_graph = Graph()
+    insert_results_into_rdflib(graph=expected_graph, results_csv=rows_to_csv(rows))
+    assert isomorphic(graph, expected_graph)
+
+
+def test_identical_update_db_reuses_database(mock_sparql_endpoint, tmp_path):
+    """
+    Test that downloading a database identical to a stored one reuses the stored file.
+    """
+    update_args = {
+        "endpoint_url": mock_sparql_endpoint.url,
+        "batch_size": 500,
+        "storage_dir": str(tmp_path / "storage"),
+        "history_file": str(tmp_path / "history.json"),
+    }
+
+    first_filename = update_db(**update_args)
+    second_filename = update_db(**update_args)
+
+    assert second_filename == first_filename
+    assert os.listdir(tmp_path / "storage") == [first_filename]
+
+    with open(tmp_path / "history.json", "r") as f:
+        history_data = json.load(f)
+    assert len(history_data["databases"]) == 1
+    assert history_data["databases"][0]["hash"]
+    assert history_data["current_db"] == first_filename
+
+    # The report of the second run is linked to the reused entry
+    db_entry = history_data["databases"][0]
+    assert len(db_entry["reports"]) == 1
+    assert db_entry["reports"][0] != db_entry["report"]
+    with open(tmp_path / "reports" / db_entry["reports"][0], "r") as f:
+        report = json.load(f)
+    assert report["status"] == "SUCCESS"
+    assert report["db_filename"] == first_filename
+
+
+def test_update_db_report(mock_sparql_endpoint, tmp_path):
+    """
+    Test that `update_db` saves a JSON report of the run, linked from the new history entry.
+    """
+    history_file = tmp_path / "history.json"
+
+    update_db(
+        endpoint_url=mock_sparql_endpoint.url,
+        batch_size=100,
+        storage_dir=str(tmp_path / "storage"),
+        history_file=str(history_file),
+    )
+
+    with open(history_file, "r") as f:
+        db_entry = json.load(f)["databases"][0]
+    with open(tmp_path / "reports" / db_entry["report"], "r") as f:
+        report = json.load(f)
+
+    assert report["status"] == "SUCCESS"
+    assert report["db_filename"] == db_entry["filename"]
+
+    # One entry per batch with data, with all timings recorded
+    num_rows = len(mock_sparql_endpoint.rows)
+    assert len(report["batches"]) == -(-num_rows // 100)
+    for batch in report["batches"]:
+        assert batch["rows"] > 0
+        assert batch["bytes"] > 0
+        assert batch["fetch_seconds"] >= 0
+        assert batch["parse_seconds"] >= 0
+        assert batch["insert_seconds"] >= 0
+        assert batch["rss_mb"] > 0
+
+    assert {"validation", "hashing", "save"} <= set(report["stages"])
+    assert report["totals"]["rows"] == num_rows
+    assert report["totals"]["triples"] == num_rows
+
+
+def test_failed_update_db_report(mock_sparql_endpoint, tmp_path):
+    """
+    Test that a report is also saved for a failed run.
+    """
+    mock_sparql_endpoint.fail_requests = {0}
+
+    update_db(
+        endpoint_url=mock_sparql_endpoint.url,
+        storage_dir=str(tmp_path / "storage"),
+        history_file=str(tmp_path / "history.json"),
+    )
+
+    (report_file,) = os.listdir(tmp_path / "reports")
+    with open(tmp_path / "reports" / report_file, "r") as f:
+        report = json.load(f)
+    assert report["status"] == "FAILURE"
+    assert report["batches"] == []
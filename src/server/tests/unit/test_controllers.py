@@ -1,5 +1,5 @@
 import pytest
-from rdflib import URIRef
+from rdflib import Graph, Literal, RDFS, URIRef
 from app.controllers import (
     get_root_node_info,
     has_children,
@@ -8,7 +8,19 @@ from app.controllers import (
     str_to_bool,
     get_all_node_info,
     get_node_info_with_relations,
+    get_children_batch,
+    get_children_page,
+    get_all_node_info_batch,
+    get_subtree,
+    get_local_hierarchy_to_root,
+    get_ancestors,
+    get_lowest_common_ancestors,
+    get_hierarchy_path,
+    split_uri_pair,
+    parse_fields,
+    extract_within_budget,
 )
+from app.index import get_graph_index
 
 
 def test_uri_check(sample_graph):
@@ -152,6 +164,47 @@ def test_get_children_with_extra_parents(sample_graph):
     ), "Child2's extra parent should be 'Extra Parent'"
 
 
+def test_get_children_batch(sample_graph):
+    """
+    Test get_children_batch returns the same children as get_children, with duplicates and errors handled.
+    """
+    uris = [
+        "http://data.15926.org/dm/Thing",
+        "http://data.15926.org/dm/Child1",
+        "http://data.15926.org/dm/Thing",
+        "http://data.15926.org/dm/NonExistentNode",
+    ]
+    children, errors = get_children_batch(uris, sample_graph, dep=True)
+
+    assert list(children) == uris[:2]
+    for uri in uris[:2]:
+        assert children[uri] == get_children(uri, sample_graph, dep=True)
+    assert list(errors) == ["http://data.15926.org/dm/NonExistentNode"]
+
+
+@pytest.mark.parametrize("dep", [False, True])
+def test_get_children_page(sample_graph, dep):
+    """
+    Test walking the pages of get_children_page returns the same children as get_children.
+    """
+    uri = "http://data.15926.org/dm/Thing"
+    expected = get_children(uri, sample_graph, dep=dep)
+
+    children = []
+    cursor = 0
+    while cursor is not None:
+        page = get_children_page(uri, sample_graph, dep=dep, limit=1, cursor=cursor)
+        assert page["total"] == len(expected)
+        assert len(page["children"]) == 1
+        children.extend(page["children"])
+        cursor = page["next_cursor"]
+
+    assert children == expected
+
+    with pytest.raises(ValueError):
+        get_children_page("http://data.15926.org/dm/NonExistentNode", sample_graph)
+
+
 def test_get_node_info_with_relations(sample_graph):
     """
     Test the get_node_info_with_relations function from controllers.py.
@@ -260,6 +313,277 @@ def test_get_all_node_info_multiple_types(sample_graph):
     assert node_info["definition"] == "Child One is a sample node."
 
 
+def test_get_all_node_info_batch(sample_graph):
+    """
+    Test get_all_node_info_batch returns each node's information and the labels of all referenced URIs.
+    """
+    uris = [
+        "http://data.15926.org/dm/Child1",
+        "http://data.15926.org/dm/Child2",
+        "http://data.15926.org/dm/NonExistentNode",
+    ]
+    nodes, labels, errors = get_all_node_info_batch(uris, sample_graph)
+
+    assert nodes["http://data.15926.org/dm/Child1"] == get_all_node_info(
+        uris[0], sample_graph
+    )
+    assert list(errors) == ["http://data.15926.org/dm/NonExistentNode"]
+
+    # Labels of the nodes, their parents and their types (None if they have no label)
+    assert labels["http://data.15926.org/dm/Child2"] == "Child Two"
+    assert labels["http://data.15926.org/dm/Thing"] == "Thing"
+    assert labels["http://data.15926.org/dm/ExtraParent"] == "Another Parent"
+    assert labels["http://data.15926.org/dm/ChildType"] is None
+
+
+def test_get_subtree(sample_graph):
+    """
+    Test get_subtree returns each node once, with its depth, and one edge per parent-child link.
+    """
+    subtree = get_subtree(
+        "http://data.15926.org/dm/Thing", sample_graph, depth=2, dep=True
+    )
+    nodes = {node["id"]: node for node in subtree["nodes"]}
+
+    assert subtree["truncated"] is False
+    assert len(nodes) == len(subtree["nodes"]) == 6
+    assert nodes["http://data.15926.org/dm/Thing"]["depth"] == 0
+    assert nodes["http://data.15926.org/dm/Child3"]["depth"] == 2
+    assert nodes["http://data.15926.org/dm/Child1"]["dep"] == "2021-03-21Z"
+    assert len(subtree["edges"]) == 5
+    assert {
+        "source": "http://data.15926.org/dm/Child1",
+        "target": "http://data.15926.org/dm/Child3",
+    } in subtree["edges"]
+
+    # Depth 1 only expands the direct children, which keep their has_children flag
+    subtree = get_subtree("http://data.15926.org/dm/Thing", sample_graph, depth=1)
+    nodes = {node["id"]: node for node in subtree["nodes"]}
+    assert set(nodes) == {
+        "http://data.15926.org/dm/Thing",
+        "http://data.15926.org/dm/Child2",
+        "http://data.15926.org/dm/Child4",
+    }
+    assert nodes["http://data.15926.org/dm/Child4"]["has_children"] is False
+
+
+def test_get_subtree_node_budget(sample_graph):
+    """
+    Test get_subtree stops adding nodes once the budget is used up, and only links included nodes.
+    """
+    subtree = get_subtree(
+        "http://data.15926.org/dm/Thing", sample_graph, depth=5, max_nodes=2, dep=True
+    )
+    node_ids = {node["id"] for node in subtree["nodes"]}
+
+    assert subtree["truncated"] is True
+    assert len(node_ids) == 2
+    assert all(
+        edge["source"] in node_ids and edge["target"] in node_ids
+        for edge in subtree["edges"]
+    )
+
+    with pytest.raises(ValueError):
+        get_subtree("http://data.15926.org/dm/NonExistentNode", sample_graph)
+
+
+def test_get_local_hierarchy_to_root(sample_graph):
+    """
+    Test get_local_hierarchy_to_root nests the centre node under its ancestors up to the root.
+    """
+    hierarchy = get_local_hierarchy_to_root(
+        "http://data.15926.org/dm/Child3", sample_graph, dep=True
+    )
+
+    assert hierarchy["id"] == "http://data.15926.org/dm/Thing"
+    (child1,) = hierarchy["children"]
+    assert child1["id"] == "http://data.15926.org/dm/Child1"
+    (centre,) = child1["children"]
+    assert centre == {
+        "id": "http://data.15926.org/dm/Child3",
+        "label": "Child Three",
+        "centre": True,
+        "children": [],
+        "has_children": False,
+    }
+
+    # Multi-parent nodes go up through the first parent by label and list the others
+    hierarchy = get_local_hierarchy_to_root(
+        "http://data.15926.org/dm/Child2", sample_graph
+    )
+    assert hierarchy["id"] == "http://data.15926.org/dm/ExtraParent"
+    assert hierarchy["children"][0]["extra_parents"] == [
+        {"id": "http://data.15926.org/dm/Thing"}
+    ]
+
+    with pytest.raises(ValueError):
+        get_local_hierarchy_to_root(
+            "http://data.15926.org/dm/NonExistentNode", sample_graph
+        )
+
+
+def test_get_local_hierarchy_to_root_cycle():
+    """
+    Test get_local_hierarchy_to_root stops at subclass cycles instead of walking them forever.
+    """
+    graph = Graph()
+    node_a = URIRef("http://data.15926.org/dm/A")
+    node_b = URIRef("http://data.15926.org/dm/B")
+    graph.add((node_a, RDFS.label, Literal("A")))
+    graph.add((node_b, RDFS.label, Literal("B")))
+    graph.add((node_a, RDFS.subClassOf, node_a))
+    graph.add((node_a, RDFS.subClassOf, node_b))
+    graph.add((node_b, RDFS.subClassOf, node_a))
+
+    hierarchy = get_local_hierarchy_to_root(str(node_a), graph)
+
+    assert hierarchy["id"] == str(node_b)
+    assert [child["id"] for child in hierarchy["children"]] == [str(node_a)]
+    assert "extra_parents" not in hierarchy["children"][0]
+
+
+def test_get_ancestors():
+    """
+    Test get_ancestors returns the whole ancestor graph of a multi-parent node and all root paths.
+    """
+    graph = Graph()
+    nodes = {name: URIRef(f"http://data.15926.org/dm/{name}") for name in "ABCDE"}
+    for name, node in nodes.items():
+        graph.add((node, RDFS.label, Literal(name)))
+    graph.add((nodes["B"], RDFS.subClassOf, nodes["A"]))
+    graph.add((nodes["C"], RDFS.subClassOf, nodes["A"]))
+    graph.add((nodes["D"], RDFS.subClassOf, nodes["B"]))
+    graph.add((nodes["D"], RDFS.subClassOf, nodes["C"]))
+    graph.add((nodes["D"], RDFS.subClassOf, nodes["E"]))
+
+    ancestors = get_ancestors(str(nodes["D"]), graph, paths=True)
+
+    assert [node["label"] for node in ancestors["nodes"]] == ["D", "A", "B", "C", "E"]
+    assert ancestors["nodes"][0]["centre"] is True
+    assert ancestors["nodes"][1]["root"] is True
+    assert len(ancestors["edges"]) == 5
+    assert ancestors["paths"] == [
+        [str(nodes["A"]), str(nodes["B"]), str(nodes["D"])],
+        [str(nodes["A"]), str(nodes["C"]), str(nodes["D"])],
+        [str(nodes["E"]), str(nodes["D"])],
+    ]
+    assert ancestors["truncated"] is False
+
+    # The number of paths is capped
+    ancestors = get_ancestors(str(nodes["D"]), graph, paths=True, max_paths=2)
+    assert len(ancestors["paths"]) == 2
+    assert ancestors["truncated"] is True
+
+
+def test_get_ancestors_deprecated(sample_graph):
+    """
+    Test get_ancestors only goes through deprecated parents when they are included.
+    """
+    ancestors = get_ancestors("http://data.15926.org/dm/Child3", sample_graph)
+    assert [node["id"] for node in ancestors["nodes"]] == [
+        "http://data.15926.org/dm/Child3"
+    ]
+    assert "paths" not in ancestors
+
+    ancestors = get_ancestors(
+        "http://data.15926.org/dm/Child3", sample_graph, dep=True, paths=True
+    )
+    assert ancestors["paths"] == [
+        [
+            "http://data.15926.org/dm/Thing",
+            "http://data.15926.org/dm/Child1",
+            "http://data.15926.org/dm/Child3",
+        ]
+    ]
+
+
+def build_diamond_graph():
+    """
+    Build a hierarchy where X and Y both have the parents B and C, which have the parent A.
+    """
+    graph = Graph()
+    nodes = {name: URIRef(f"http://data.15926.org/dm/{name}") for name in "ABCXYZ"}
+    for name, node in nodes.items():
+        graph.add((node, RDFS.label, Literal(name)))
+    for child, parent in ["BA", "CA", "XB", "XC", "YB", "YC", "ZX"]:
+        graph.add((nodes[child], RDFS.subClassOf, nodes[parent]))
+    return graph, {name: str(node) for name, node in nodes.items()}
+
+
+def test_get_lowest_common_ancestors():
+    """
+    Test get_lowest_common_ancestors returns every lowest common ancestor and the paths up to them.
+    """
+    graph, nodes = build_diamond_graph()
+
+    result = get_lowest_common_ancestors(nodes["Z"], nodes["Y"], graph)
+
+    assert sorted(result["lca"]) == [nodes["B"], nodes["C"]]
+    assert {node["id"] for node in result["nodes"]} == {nodes[name] for name in "BCXYZ"}
+    assert {"source": nodes["B"], "target": nodes["Y"]} in result["edges"]
+    assert {"source": nodes["X"], "target": nodes["Z"]} in result["edges"]
+    assert len(result["edges"]) == 5
+
+    # A node descending from the other has it as its lowest common ancestor
+    result = get_lowest_common_ancestors(nodes["Z"], nodes["B"], graph)
+    assert result["lca"] == [nodes["B"]]
+
+    with pytest.raises(ValueError):
+        get_lowest_common_ancestors(nodes["A"], "http://data.15926.org/dm/None", graph)
+
+
+def test_get_hierarchy_path():
+    """
+    Test get_hierarchy_path returns the shortest path going up from the first node and down to the second.
+    """
+    graph, nodes = build_diamond_graph()
+
+    result = get_hierarchy_path(nodes["Z"], nodes["Y"], graph)
+    assert result["path"] == [nodes["Z"], nodes["X"], nodes["B"], nodes["Y"]]
+    assert result["top"] == nodes["B"]
+    assert [node["label"] for node in result["nodes"]] == ["Z", "X", "B", "Y"]
+    assert result["edges"] == [
+        {"source": nodes["X"], "target": nodes["Z"]},
+        {"source": nodes["B"], "target": nodes["X"]},
+        {"source": nodes["B"], "target": nodes["Y"]},
+    ]
+
+    result = get_hierarchy_path(nodes["A"], nodes["Z"], graph)
+    assert result["path"] == [nodes["A"], nodes["B"], nodes["X"], nodes["Z"]]
+
+    result = get_hierarchy_path(nodes["A"], nodes["A"], graph)
+    assert result["path"] == [nodes["A"]]
+    assert result["edges"] == []
+
+
+def test_get_hierarchy_path_deprecated(sample_graph):
+    """
+    Test get_hierarchy_path only goes through deprecated nodes when they are included.
+    """
+    child3 = "http://data.15926.org/dm/Child3"
+    child2 = "http://data.15926.org/dm/Child2"
+
+    assert get_hierarchy_path(child3, child2, sample_graph)["path"] == []
+    assert get_hierarchy_path(child3, child2, sample_graph, dep=True)["path"] == [
+        child3,
+        "http://data.15926.org/dm/Child1",
+        "http://data.15926.org/dm/Thing",
+        child2,
+    ]
+
+
+def test_split_uri_pair():
+    """
+    Test split_uri_pair splits the path of a two-node endpoint at the start of the second URI.
+    """
+    assert split_uri_pair(
+        "http://data.15926.org/dm/A/https://data.15926.org/rdl/B"
+    ) == ("http://data.15926.org/dm/A", "https://data.15926.org/rdl/B")
+
+    with pytest.raises(ValueError):
+        split_uri_pair("http://data.15926.org/dm/A")
+
+
 def test_check_uri_exists(sample_graph):
     """
     Test the check_uri_exists function from controllers.py.
@@ -313,3 +637,89 @@ def test_str_to_bool(input_value, expected_result):
     Parameterized test for the str_to_bool function with various inputs to verify correct behavior.
     """
     assert str_to_bool(input_value) == expected_result
+
+
+def test_sparse_fieldsets(sample_graph, monkeypatch):
+    """
+    Test the controllers only build (and compute) the requested fields of each node.
+    """
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("label, has_children") == {"id", "label", "has_children"}
+    assert parse_fields(["dep"]) == {"id", "dep"}
+
+    root = "http://data.15926.org/dm/Thing"
+    fields = parse_fields("label")
+
+    # The extra parents and child flags are not computed at all
+    index = get_graph_index(sample_graph)
+    monkeypatch.setattr(index, "has_children", None)
+    monkeypatch.setattr(index, "get_parents", None)
+    children = get_children(root, sample_graph, dep=True, fields=fields)
+    assert children == [
+        {"id": "http://data.15926.org/dm/Child4", "label": "Child Four"},
+        {"id": "http://data.15926.org/dm/Child1", "label": "Child One"},
+        {"id": "http://data.15926.org/dm/Child2", "label": "Child Two"},
+    ]
+    monkeypatch.undo()
+
+    children = get_children(
+        root, sample_graph, dep=True, stats=True, fields=parse_fields("dep,depth")
+    )
+    assert children[1] == {
+        "id": "http://data.15926.org/dm/Child1",
+        "dep": "2021-03-21Z",
+        "depth": 1,
+    }
+
+    info = get_all_node_info(root, sample_graph, fields=parse_fields("label,parents"))
+    assert info == {"id": root, "label": "Thing", "parents": []}
+
+    info = get_node_info_with_relations(
+        root, sample_graph, fields=parse_fields("has_children")
+    )
+    assert info == {"id": root, "has_children": True}
+
+
+def test_extract_within_budget():
+    """
+    Test the chunked search finds the same matches as `process.extract`, and stops once its deadline has passed.
+    """
+    import time
+    from rapidfuzz import fuzz, process
+
+    choices = ["Thing", "Child1", "Child2", "Thing2", "Child10", "Nothing", "Child"]
+    expected = process.extract(
+        "Child1", choices, scorer=fuzz.WRatio, limit=3, score_cutoff=0
+    )
+
+    matches, truncated = extract_within_budget(
+        "Child1", choices, fuzz.WRatio, limit=3, score_cutoff=0
+    )
+    assert matches == expected and not truncated
+
+    matches, truncated = extract_within_budget(
+        "Child1",
+        choices,
+        fuzz.WRatio,
+        limit=3,
+        score_cutoff=0,
+        deadline=time.monotonic() + 60,
+        chunk_size=2,
+    )
+    assert matches == expected and not truncated
+
+    # Only the first chunk is scored once the deadline has passed
+    matches, truncated = extract_within_budget(
+        "Child1",
+        choices,
+        fuzz.WRatio,
+        limit=3,
+        score_cutoff=0,
+        deadline=time.monotonic() - 1,
+        chunk_size=2,
+    )
+    assert truncated
+    assert matches == process.extract(
+        "Child1", choices[:2], scorer=fuzz.WRatio, limit=3, score_cutoff=0
+    )
@@ -0,0 +1,235 @@
+import random
+import threading
+from rdflib import Graph, Literal, URIRef, RDFS
+from app.index import GraphIndex, META
+
+
+def build_random_hierarchy(num_nodes=300, seed=0, cycle=True):
+    """
+    Build a random multi-parent hierarchy (with some deprecated nodes and a cycle) for testing.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    nodes = [URIRef(f"http://data.15926.org/dm/Node{i}") for i in range(num_nodes)]
+
+    for i, node in enumerate(nodes):
+        graph.add((node, RDFS.label, Literal(f"Node {i}")))
+        if i > 0:
+            for parent in rng.sample(nodes[:i], k=min(i, rng.choice([1, 1, 2, 3]))):
+                graph.add((node, RDFS.subClassOf, parent))
+        if rng.random() < 0.1:
+            graph.add((node, META.valDeprecationDate, Literal("2021-03-21Z")))
+
+    if cycle:
+        graph.add(
+            (nodes[0], RDFS.subClassOf, nodes[-1])
+        )  # Close a cycle through the root
+    return graph, [str(node) for node in nodes]
+
+
+def test_is_descendant_matches_ancestors():
+    """
+    Test the interval labelling answers descendant checks the same as the ancestor closure.
+    """
+    graph, nodes = build_random_hierarchy()
+    index = GraphIndex(graph)
+    rng = random.Random(1)
+
+    for dep in (False, True):
+        for uri in nodes:
+            ancestors = index.ancestors(uri, dep=dep)
+            for ancestor in rng.sample(nodes, 30) + list(ancestors)[:10]:
+                assert index.is_descendant(uri, ancestor, dep=dep) == (
+                    ancestor in ancestors and ancestor != uri
+                ), (uri, ancestor, dep)
+
+
+def test_is_descendant(sample_graph):
+    """
+    Test descendant checks through first parents, extra parents and deprecated nodes.
+    """
+    index = GraphIndex(sample_graph)
+    thing = "http://data.15926.org/dm/Thing"
+
+    assert index.is_descendant("http://data.15926.org/dm/Child2", thing)
+    assert index.is_descendant(
+        "http://data.15926.org/dm/Child2", "http://data.15926.org/dm/ExtraParent"
+    )
+    assert not index.is_descendant(thing, "http://data.15926.org/dm/Child2")
+    assert not index.is_descendant(thing, thing)
+
+    # Child3 is only linked to Thing through the deprecated Child1
+    assert not index.is_descendant("http://data.15926.org/dm/Child3", thing)
+    assert index.is_descendant("http://data.15926.org/dm/Child3", thing, dep=True)
+
+
+def test_subtree_stats_match_descendants():
+    """
+    Test the precomputed descendant counts match the nodes reached by listing children, from every
+    node (including deprecated ones).
+    """
+    graph, nodes = build_random_hierarchy()
+    index = GraphIndex(graph)
+
+    for dep in (False, True):
+        for uri in nodes:
+            descendants = set()
+            stack = list(index.get_children(uri, dep=dep))
+            while stack:
+                node = stack.pop()
+                if node not in descendants:
+                    descendants.add(node)
+                    stack.extend(index.get_children(node, dep=dep))
+            descendants.discard(uri)  # Not its own descendant through a cycle
+
+            stats = index.subtree_stats(uri, dep=dep)
+            assert stats["descendant_count"] == len(descendants), (uri, dep)
+            assert stats["child_count"] == len(index.get_children(uri, dep=dep))
+
+
+def test_depth_below_parents():
+    """
+    Test the depth of every node is greater than the depth of its parents (without cycles).
+    """
+    graph, nodes = build_random_hierarchy(cycle=False)
+    index = GraphIndex(graph)
+
+    for dep in (False, True):
+        for uri in nodes:
+            parent_depths = [
+                index.depth(parent, dep=dep)
+                for parent in index.get_parents(uri, dep=dep)
+            ]
+            assert index.depth(uri, dep=dep) == 1 + max(parent_depths, default=-1)
+
+
+def test_subtree_stats(sample_graph):
+    """
+    Test the depth, child count and descendant count of the sample nodes, with and without deprecated nodes.
+    """
+    index = GraphIndex(sample_graph)
+    thing = "http://data.15926.org/dm/Thing"
+
+    assert index.subtree_stats(thing) == {
+        "depth": 0,
+        "child_count": 2,
+        "descendant_count": 2,
+    }
+    assert index.subtree_stats(thing, dep=True) == {
+        "depth": 0,
+        "child_count": 3,
+        "descendant_count": 5,
+    }
+    assert index.subtree_stats("http://data.15926.org/dm/Child3", dep=True) == {
+        "depth": 2,
+        "child_count": 0,
+        "descendant_count": 0,
+    }
+
+    # The deprecated Child1 still lists Child3 without deprecated nodes, which is counted below it
+    assert index.subtree_stats("http://data.15926.org/dm/Child1") == {
+        "depth": 1,
+        "child_count": 1,
+        "descendant_count": 1,
+    }
+
+
+def test_adjacency_lists_presorted():
+    """
+    Test the child and parent lists are stored in label order, with and without deprecated nodes.
+    """
+    graph, nodes = build_random_hierarchy()
+    index = GraphIndex(graph)
+
+    def label_key(uri):
+        return index.labels.get(uri) or ""
+
+    for uri in nodes:
+        for dep in (False, True):
+            for neighbours in (
+                index.get_children(uri, dep=dep),
+                index.get_parents(uri, dep=dep),
+            ):
+                assert neighbours == sorted(neighbours, key=label_key)
+                assert dep or not any(index.is_deprecated(x) for x in neighbours)
+
+        # Nodes without deprecated children share the same list
+        children = index.get_children(uri, dep=True)
+        if children and not any(index.is_deprecated(child) for child in children):
+            assert index.get_children(uri) is children
+
+
+def test_adjacency_lists_insertion_order():
+    """
+    Test the child and parent lists are kept in the order of the graph when not ordered by label,
+    and the ordered ancestors are sorted by label.
+    """
+    graph = Graph()
+    parent = URIRef("http://data.15926.org/dm/Parent")
+    children = [URIRef(f"http://data.15926.org/dm/Child{i}") for i in range(5)]
+    graph.add((parent, RDFS.label, Literal("Parent")))
+    for i, child in enumerate(children):
+        graph.add((child, RDFS.label, Literal(f"Child {4 - i}")))
+        graph.add((child, RDFS.subClassOf, parent))
+        graph.add((children[0], RDFS.subClassOf, child))
+    graph.add((children[1], META.valDeprecationDate, Literal("2021-03-21Z")))
+    index = GraphIndex(graph)
+    children = [str(child) for child in children]
+
+    assert index.get_children(str(parent), dep=True, order=False) == children
+    assert index.get_children(str(parent), dep=True) == children[::-1]
+    assert index.get_children(str(parent), order=False) == children[:1] + children[2:]
+    assert index.get_parents(children[0], dep=True, order=False) == [
+        str(parent),
+        *children[1:],
+    ]
+    assert index.get_children_page(
+        str(parent), dep=True, start=1, limit=2, order=False
+    ) == (children[1:3], 3)
+    assert index.ordered_ancestors(children[0], dep=True) == (
+        *children[:0:-1],
+        str(parent),
+    )
+
+
+def test_search_choices(sample_graph):
+    """
+    Test the search choices are the lowercase labels and URIs, mapped to the original URIs.
+    """
+    index = GraphIndex(sample_graph)
+    thing = "http://data.15926.org/dm/Thing"
+
+    choices, uri_map = index.search_choices("ID")
+    assert sorted(choices) == sorted(uri.lower() for uri in index.subjects)
+    assert uri_map[thing.lower()] == thing
+
+    choices, uri_map = index.search_choices("LABEL")
+    assert len(choices) == len(uri_map)
+    assert uri_map[index.labels[thing].lower()] == thing
+    assert all(choice == choice.lower() for choice in choices)
+
+
+def test_ancestors_concurrent_first_use():
+    """
+    Test the ancestor closures computed on first use by concurrent requests match those computed one at a time.
+    """
+    graph, nodes = build_random_hierarchy()
+    expected_index = GraphIndex(graph)
+    expected = {uri: expected_index.ancestors(uri) for uri in nodes}
+
+    index = GraphIndex(graph)
+    results = []
+
+    def compute(uris):
+        results.extend((uri, index.ancestors(uri)) for uri in uris)
+
+    threads = [
+        threading.Thread(target=compute, args=(nodes[i::4][::-1],)) for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == len(nodes)
+    assert all(ancestors == expected[uri] for uri, ancestors in results)
@@ -0,0 +1,37 @@
+import json
+from app import controllers, create_app
+from app.config import TestConfig
+from app.serialisation import OrjsonProvider
+from flask.json.provider import DefaultJSONProvider
+
+
+def test_orjson_provider_matches_default(sample_graph):
+    """
+    Test the orjson provider serialises the controllers' outputs like the default provider.
+    """
+    app = create_app(TestConfig)
+    assert isinstance(app.json, OrjsonProvider)
+
+    outputs = [
+        controllers.get_children("http://data.15926.org/dm/Thing", sample_graph),
+        controllers.get_local_hierarchy_to_root(
+            "http://data.15926.org/dm/Child3", sample_graph, dep=True
+        ),
+        {"label": "Ünïcödé", "count": 3, "missing": None},
+    ]
+
+    with app.app_context():
+        # orjson does not escape non-ASCII characters
+        default = DefaultJSONProvider(app)
+        default.ensure_ascii = False
+
+        for output in outputs:
+            assert json.loads(app.json.dumps(output)) == json.loads(
+                default.dumps(output)
+            )
+            assert app.json.loads(app.json.dumps(output)) == output
+
+            # Sorted keys, indented in debug mode
+            response = app.json.response(output)
+            assert response.mimetype == "application/json"
+            assert response.get_data() == default.response(output).get_data()